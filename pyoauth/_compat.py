@@ -42,7 +42,18 @@ except ImportError:
     except ImportError:
         from cgi import parse_qs
 
+try:
+    # Python 2.7+
+    BUFFER_TYPES = (bytearray, memoryview)
+except NameError:
+    try:
+        # Python 2.6
+        BUFFER_TYPES = (bytearray,)
+    except NameError:
+        BUFFER_TYPES = ()
+
 __all__ = [
+    "BUFFER_TYPES",
     "urlunparse",
     "parse_qs",
     "unquote_plus",
@@ -24,7 +24,7 @@ import logging
 from functools import partial
 from google.appengine.api import urlfetch
 
-from pyoauth.http import ResponseAdapter
+from pyoauth.http import ResponseAdapter, read_body
 from vendor.mom.mom.builtins import b
 
 
@@ -90,6 +90,9 @@ class HttpClient(object):
 
         :param request:
             An instance of type :class:`pyoauth.http.RequestProxy`.
+            urlfetch takes byte strings only, so buffer, file and iterator
+            bodies are read into memory with
+            :func:`pyoauth.http.read_body`.
         :param async_callback:
             ``None`` by default. Unused on App Engine. Useful when your request
             fetching method is asynchronous. Set to a callback function which
@@ -118,7 +121,7 @@ class HttpClient(object):
                                                response.headers))
             http.fetch(
                 url=request.url,
-                body=request.body,
+                body=read_body(request.body),
                 method=request.method,
                 headers=request.headers,
                 callback=adapt_response,
@@ -128,7 +131,7 @@ class HttpClient(object):
 #            try:
             response = urlfetch.fetch(
                 url=request.url,
-                payload=request.body,
+                payload=read_body(request.body),
                 method=request.method,
                 headers=request.headers,
                 deadline=10)
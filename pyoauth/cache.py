@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2011 Yesudeep Mangalapilly <yesudeep@gmail.com>
+# Copyright 2012 Google, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+
+"""
+:module: pyoauth.cache
+:synopsis: Bounded caches used on the signing hot path.
+
+.. autoclass:: LRUCache
+   :members:
+"""
+
+from __future__ import absolute_import
+
+import threading
+
+
+# Indices into a linked-list node.
+_PREV, _NEXT, _KEY, _VALUE = 0, 1, 2, 3
+
+
+class LRUCache(object):
+    """
+    A thread-safe, bounded, least-recently-used cache.
+
+    Entries are kept in a circular doubly-linked list so that lookups,
+    insertions and evictions are all O(1). Hit and miss counters are
+    maintained to help tune ``max_size``.
+
+    :param max_size:
+        Maximum number of entries held by the cache. The least recently
+        used entry is evicted when this limit is exceeded.
+    """
+    def __init__(self, max_size=128):
+        if max_size < 1:
+            raise ValueError("max_size must be a positive integer: got %r" %
+                             max_size)
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._map = {}
+        self._root = []
+        self._root[:] = [self._root, self._root, None, None]
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def max_size(self):
+        """Maximum number of entries held by the cache."""
+        return self._max_size
+
+    @property
+    def hits(self):
+        """Number of lookups that found an entry."""
+        return self._hits
+
+    @property
+    def misses(self):
+        """Number of lookups that did not find an entry."""
+        return self._misses
+
+    def __len__(self):
+        return len(self._map)
+
+    def __contains__(self, key):
+        return key in self._map
+
+    def get(self, key, default=None):
+        """
+        Looks up an entry and marks it as the most recently used.
+
+        :param key:
+            The cache key.
+        :param default:
+            Returned if the key is not found. Default ``None``.
+        :returns:
+            The cached value or ``default``.
+        """
+        self._lock.acquire()
+        try:
+            node = self._map.get(key)
+            if node is None:
+                self._misses += 1
+                return default
+            self._hits += 1
+            # Move the node to the front (most recently used).
+            node[_PREV][_NEXT] = node[_NEXT]
+            node[_NEXT][_PREV] = node[_PREV]
+            root = self._root
+            last = root[_PREV]
+            last[_NEXT] = root[_PREV] = node
+            node[_PREV] = last
+            node[_NEXT] = root
+            return node[_VALUE]
+        finally:
+            self._lock.release()
+
+    def set(self, key, value):
+        """
+        Adds or replaces an entry, evicting the least recently used entry
+        if the cache is full.
+
+        :param key:
+            The cache key.
+        :param value:
+            The value to cache.
+        """
+        self._lock.acquire()
+        try:
+            node = self._map.pop(key, None)
+            if node is not None:
+                node[_PREV][_NEXT] = node[_NEXT]
+                node[_NEXT][_PREV] = node[_PREV]
+            elif len(self._map) >= self._max_size:
+                oldest = self._root[_NEXT]
+                oldest[_PREV][_NEXT] = oldest[_NEXT]
+                oldest[_NEXT][_PREV] = oldest[_PREV]
+                del self._map[oldest[_KEY]]
+            root = self._root
+            last = root[_PREV]
+            node = [last, root, key, value]
+            last[_NEXT] = root[_PREV] = self._map[key] = node
+        finally:
+            self._lock.release()
+
+    def invalidate(self, key):
+        """
+        Removes an entry if present.
+
+        :param key:
+            The cache key.
+        :returns:
+            ``True`` if an entry was removed; ``False`` otherwise.
+        """
+        self._lock.acquire()
+        try:
+            node = self._map.pop(key, None)
+            if node is None:
+                return False
+            node[_PREV][_NEXT] = node[_NEXT]
+            node[_NEXT][_PREV] = node[_PREV]
+            return True
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        """
+        Removes all entries and resets the hit and miss counters.
+        """
+        self._lock.acquire()
+        try:
+            self._map.clear()
+            self._root[:] = [self._root, self._root, None, None]
+            self._hits = 0
+            self._misses = 0
+        finally:
+            self._lock.release()
+
+    def stats(self):
+        """
+        Returns a snapshot of the cache statistics.
+
+        :returns:
+            A dictionary with ``hits``, ``misses``, ``hit_rate`` (the
+            fraction of lookups that found an entry), ``size`` and
+            ``max_size``.
+        """
+        self._lock.acquire()
+        try:
+            lookups = self._hits + self._misses
+            hit_rate = 0.0
+            if lookups:
+                hit_rate = float(self._hits) / lookups
+            return dict(hits=self._hits,
+                        misses=self._misses,
+                        hit_rate=hit_rate,
+                        size=len(self._map),
+                        max_size=self._max_size)
+        finally:
+            self._lock.release()
@@ -52,6 +52,7 @@ OAUTH_AUTH_SCHEME_PATTERN = re.compile(r"(^OAuth[\s]+)", re.IGNORECASE)
 OAUTH_PARAM_REALM = "realm"
 OAUTH_PARAM_PREFIX = "oauth_"
 OAUTH_PARAM_SIGNATURE = "oauth_signature"
+OAUTH_PARAM_BODY_HASH = "oauth_body_hash"
 OAUTH_PARAM_CONSUMER_KEY = "oauth_consumer_key"
 OAUTH_PARAM_CONSUMER_SECRET = "oauth_consumer_secret"
 OAUTH_PARAM_TOKEN_SECRET = "oauth_token_secret"
@@ -70,6 +71,8 @@ OAUTH_VALUE_CALLBACK_OOB = b("oob")
 OAUTH_TEMP_COOKIE_NAME = b("_oauthtempcred")
 
 HMAC_SHA1 = b("HMAC-SHA1")
+HMAC_SHA256 = b("HMAC-SHA256")
+HMAC_SHA512 = b("HMAC-SHA512")
 RSA_SHA1 = b("RSA-SHA1")
 PLAINTEXT = b("PLAINTEXT")
 
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2011 Yesudeep Mangalapilly <yesudeep@gmail.com>
+# Copyright 2012 Google, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+
+"""
+:module: pyoauth.entropy
+:synopsis: Buffered operating-system randomness.
+
+Nonces, verification codes and client secrets each need a few random
+bytes. Reading them from the operating system one value at a time costs a
+system call per value. The pool below reads large blocks instead and
+hands out every byte exactly once.
+
+.. autoclass:: EntropyPool
+   :members:
+.. autodata:: ENTROPY_POOL
+"""
+
+from __future__ import absolute_import
+
+import os
+import threading
+
+from mom.builtins import byte
+
+
+if hasattr(os, "register_at_fork"):
+    # os.getpid() is a system call on current C libraries; count forks
+    # instead where the interpreter can tell us about them.
+    _FORKS = [0]
+
+    def _after_fork_in_child():
+        _FORKS[0] += 1
+
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+    def _process_id():
+        return _FORKS[0]
+else:
+    _process_id = os.getpid
+
+
+class EntropyPool(object):
+    """
+    A thread-safe buffer of random bytes read from :func:`os.urandom`.
+
+    Bytes are read from the operating system ``block_size`` at a time.
+    When fewer than ``low_water`` bytes remain after a read, a background
+    thread reads the next block so that callers rarely wait for the system
+    call. The thread is started on the first such read and then waits to
+    be signalled for the next. Requests larger than ``block_size`` bypass
+    the buffer.
+
+    The buffer is discarded in a child process after :func:`os.fork` so
+    that parent and child never hand out the same bytes.
+
+    :param block_size:
+        Number of bytes read from the operating system at a time.
+        Default 4096.
+    :param low_water:
+        Refill in the background when fewer bytes than this remain.
+        Default a quarter of ``block_size``.
+    :param background:
+        ``False`` to refill only when the buffer runs dry, on the calling
+        thread. Default ``True``.
+    :param urandom:
+        The function that reads random bytes from the operating system.
+        Default :func:`os.urandom`, looked up on every read.
+    """
+    def __init__(self, block_size=4096, low_water=None, background=True,
+                 urandom=None):
+        if block_size < 1:
+            raise ValueError("block_size must be a positive integer: got %r" %
+                             block_size)
+        if low_water is None:
+            low_water = block_size // 4
+        self._block_size = block_size
+        self._low_water = low_water
+        self._background = background
+        self._urandom_func = urandom
+        self._lock = threading.Lock()
+        self._refilled = threading.Condition(self._lock)
+        self._wanted = threading.Event()
+        self._buffer = os.urandom(0)
+        self._offset = 0
+        self._pid = _process_id()
+        self._refilling = False
+        self._thread = None
+        self._refills = 0
+
+    @property
+    def refills(self):
+        """Number of times random bytes were read from the operating system."""
+        return self._refills
+
+    def read(self, count):
+        """
+        Returns random bytes that have not been handed out before.
+
+        :param count:
+            Number of bytes.
+        :returns:
+            Random byte string.
+        """
+        if count > self._block_size:
+            self._lock.acquire()
+            try:
+                self._refills += 1
+            finally:
+                self._lock.release()
+            return self._urandom(count)
+        self._lock.acquire()
+        try:
+            self._check_fork()
+            if len(self._buffer) - self._offset < count:
+                self._append(self._urandom(self._block_size))
+            start = self._offset
+            self._offset = start + count
+            remaining = len(self._buffer) - self._offset
+            if self._background and not self._refilling and \
+               remaining < self._low_water:
+                self._refilling = True
+                if self._thread is None:
+                    thread = threading.Thread(target=self._refill,
+                                              args=(self._wanted,))
+                    thread.daemon = True
+                    thread.start()
+                    self._thread = thread
+                self._wanted.set()
+            return self._buffer[start:self._offset]
+        finally:
+            self._lock.release()
+
+    def join(self):
+        """
+        Waits for a background refill in progress to finish.
+        """
+        self._lock.acquire()
+        try:
+            self._check_fork()
+            while self._refilling:
+                self._refilled.wait()
+        finally:
+            self._lock.release()
+
+    def random_bits(self, n_bits):
+        """
+        Returns the specified number of random bits as a byte string, like
+        :func:`mom.security.random.generate_random_bits`.
+
+        :param n_bits:
+            Number of random bits. If ``n_bits`` is not divisible by 8, the
+            leading byte has the remaining ``n_bits % 8`` random bits and
+            its high bits cleared.
+        :returns:
+            Random byte string.
+        """
+        if n_bits <= 0:
+            raise ValueError("number of bits must be greater than 0.")
+        quotient, remainder = divmod(n_bits, 8)
+        if not remainder:
+            return self.read(quotient)
+        random_bytes = self.read(quotient + 1)
+        return byte(ord(random_bytes[:1]) >> (8 - remainder)) + \
+               random_bytes[1:]
+
+    def random_bits_many(self, count, n_bits):
+        """
+        Returns ``count`` random byte strings of ``n_bits`` bits each, read
+        from the pool at once.
+
+        :param count:
+            Number of byte strings.
+        :param n_bits:
+            Number of random bits in each byte string. See
+            :meth:`random_bits`.
+        :returns:
+            A list of random byte strings.
+        """
+        if n_bits <= 0:
+            raise ValueError("number of bits must be greater than 0.")
+        quotient, remainder = divmod(n_bits, 8)
+        size = quotient + (remainder and 1)
+        random_bytes = self.read(count * size)
+        values = [random_bytes[i:i + size]
+                  for i in range(0, count * size, size)]
+        if remainder:
+            shift = 8 - remainder
+            values = [byte(ord(value[:1]) >> shift) + value[1:]
+                      for value in values]
+        return values
+
+    def _urandom(self, count):
+        """Reads random bytes from the operating system."""
+        return (self._urandom_func or os.urandom)(count)
+
+    def _append(self, random_bytes):
+        """Appends fresh random bytes, dropping those handed out. Locked."""
+        self._buffer = self._buffer[self._offset:] + random_bytes
+        self._offset = 0
+        self._refills += 1
+
+    def _check_fork(self):
+        """Discards the buffer and refill thread after a fork. Locked."""
+        if self._pid != _process_id():
+            # Forked; the parent may hand out the same bytes, and only the
+            # thread that forked survives in the child.
+            self._pid = _process_id()
+            self._buffer = self._buffer[:0]
+            self._offset = 0
+            self._refilling = False
+            self._thread = None
+            self._wanted = threading.Event()
+
+    def _refill(self, wanted):
+        """Background thread loop that reads the next block when signalled."""
+        while True:
+            wanted.wait()
+            wanted.clear()
+            try:
+                random_bytes = self._urandom(self._block_size)
+            except Exception:
+                # The next read that runs dry reads on the calling thread
+                # and raises there.
+                random_bytes = None
+            self._lock.acquire()
+            try:
+                if random_bytes is not None:
+                    self._append(random_bytes)
+                self._refilling = False
+                self._refilled.notify_all()
+            finally:
+                self._lock.release()
+
+
+#: The pool used by the nonce, verification code and client secret
+#: generators in :mod:`pyoauth.oauth1.protocol`.
+ENTROPY_POOL = EntropyPool()
@@ -23,15 +23,35 @@
 Request and Response Adapters
 -----------------------------
 .. autoclass:: RequestAdapter
+   :members: content_length, iter_body, read_body
 .. autoclass:: ResponseAdapter
 
+Request bodies
+--------------
+Request bodies need not be byte strings. :class:`bytearray`,
+:class:`memoryview` and :class:`mmap.mmap` buffers, file objects and
+iterators of byte strings are accepted as well, so that large uploads can
+go from disk to the socket without being copied into one byte string.
+Buffers and files are sent from their current position.
+
+Only the httplib2 adapter hands such bodies to the connection as they are.
+The App Engine and tornado adapters send through urlfetch, which takes
+byte strings only, so they read the whole body into memory with
+:func:`read_body` first.
+
+.. autofunction:: body_length
+.. autofunction:: iter_body
+.. autofunction:: read_body
+
 """
 
 from __future__ import absolute_import
 
-from mom.codec.text import ascii_encode
-from mom.builtins import b
-from pyoauth.constants import HEADER_CONTENT_TYPE_CAPS, SYMBOL_SEMICOLON, SYMBOL_EQUAL
+from mom.codec.text import ascii_encode, utf8_encode_if_unicode
+from mom.builtins import b, is_bytes_or_unicode
+from pyoauth._compat import BUFFER_TYPES
+from pyoauth.constants import HEADER_CONTENT_TYPE_CAPS, SYMBOL_SEMICOLON, \
+    SYMBOL_EQUAL, SYMBOL_EMPTY_BYTES
 
 
 HTTP_METHODS = tuple(map(ascii_encode, ("POST", "GET", "PUT", "DELETE",
@@ -40,6 +60,106 @@ HTTP_METHODS = tuple(map(ascii_encode, ("POST", "GET", "PUT", "DELETE",
 
 CONTENT_TYPE_FORM_URLENCODED = b("application/x-www-form-urlencoded")
 
+# Bytes read from a file body at a time.
+_BODY_CHUNK_SIZE = 65536
+
+
+def body_length(body):
+    """
+    Determines the number of bytes a request body will send.
+
+    :param body:
+        A byte string; a :class:`bytearray`, :class:`memoryview` or
+        :class:`mmap.mmap`; a file object, counted from its current
+        position; or an iterable of byte strings.
+    :returns:
+        The length in bytes, or ``None`` for iterables and files whose
+        size cannot be determined.
+    """
+    if body is None:
+        return 0
+    if is_bytes_or_unicode(body):
+        return len(utf8_encode_if_unicode(body))
+    if isinstance(body, BUFFER_TYPES):
+        return getattr(body, "nbytes", None) or len(body)
+    if hasattr(body, "read"):
+        try:
+            position = body.tell()
+            if hasattr(body, "__len__"):
+                # mmap.mmap
+                size = len(body)
+            else:
+                body.seek(0, 2)
+                size = body.tell()
+                body.seek(position)
+            return max(size - position, 0)
+        except (AttributeError, IOError, OSError, ValueError):
+            return None
+    return None
+
+
+def iter_body(body, chunk_size=_BODY_CHUNK_SIZE):
+    """
+    Yields a request body in chunks without copying buffers.
+
+    :param body:
+        See :func:`body_length`. Buffers are yielded as
+        :class:`memoryview` slices; files are read from their current
+        position.
+    :param chunk_size:
+        Bytes read from a file at a time. Default 64 KiB.
+    :returns:
+        A generator of byte strings or buffers.
+    """
+    if body is None:
+        return
+    if is_bytes_or_unicode(body):
+        yield utf8_encode_if_unicode(body)
+    elif isinstance(body, BUFFER_TYPES):
+        view = memoryview(body)
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size]
+    elif hasattr(body, "read"):
+        read = body.read
+        chunk = read(chunk_size)
+        while chunk:
+            yield chunk
+            chunk = read(chunk_size)
+    else:
+        for chunk in body:
+            yield chunk
+
+
+def read_body(body):
+    """
+    Reads a request body into a byte string for HTTP clients that cannot
+    send anything else.
+
+    Files are moved back to the position they were read from, if they can
+    seek.
+
+    :param body:
+        See :func:`body_length`.
+    :returns:
+        The body as a byte string.
+    """
+    if body is None:
+        return SYMBOL_EMPTY_BYTES
+    if is_bytes_or_unicode(body):
+        return utf8_encode_if_unicode(body)
+    if isinstance(body, BUFFER_TYPES):
+        return bytes(body)
+    position = None
+    if hasattr(body, "read"):
+        try:
+            position = body.tell()
+        except (AttributeError, IOError, OSError, ValueError):
+            pass
+    data = SYMBOL_EMPTY_BYTES.join([bytes(chunk) for chunk in iter_body(body)])
+    if position is not None:
+        body.seek(position)
+    return data
+
 
 class RequestAdapter(object):
     """Adaptor HTTP Request class.
@@ -89,6 +209,27 @@ class RequestAdapter(object):
         """Dictionary of headers."""
         return self._headers
 
+    @property
+    def content_length(self):
+        """
+        Number of bytes in the payload, or ``None`` if it cannot be
+        determined. See :func:`body_length`.
+        """
+        return body_length(self._body)
+
+    def iter_body(self, chunk_size=_BODY_CHUNK_SIZE):
+        """
+        Yields the payload in chunks without copying it. See
+        :func:`iter_body`.
+        """
+        return iter_body(self._body, chunk_size)
+
+    def read_body(self):
+        """
+        Returns the payload as a byte string. See :func:`read_body`.
+        """
+        return read_body(self._body)
+
 
 class ResponseAdapter(object):
     """Adaptor HTTP Response class.
@@ -42,7 +42,17 @@ class HttpClient(object):
         one for your Web framework.
 
         :param request:
-            An instance of type :class:`pyoauth.http.RequestProxy`.
+            An instance of type :class:`pyoauth.http.RequestProxy`. Buffer,
+            memory-mapped file, file object and iterator bodies are handed
+            to the connection as they are, without being copied into a
+            byte string.
+
+            httplib2 sends the same body object again when it retries a
+            request or follows a redirect that keeps the method. File
+            objects and iterators are read only once, so a resent request
+            carries an empty or truncated payload. Use byte strings or
+            buffers when the server may redirect or the connection may have
+            to be retried.
         :param async_callback:
             ``None`` by default. Unused on App Engine. Useful when your request
             fetching method is asynchronous. Set to a callback function which
@@ -27,17 +27,22 @@
 
 from __future__ import absolute_import
 
-from pyoauth.constants import HMAC_SHA1, RSA_SHA1, PLAINTEXT
+from pyoauth.constants import HMAC_SHA1, HMAC_SHA256, HMAC_SHA512, \
+    RSA_SHA1, PLAINTEXT
 from mom.codec.text import utf8_encode
 
 
 # Signature methods.
 
 SIGNATURE_METHOD_HMAC_SHA1 = HMAC_SHA1
+SIGNATURE_METHOD_HMAC_SHA256 = HMAC_SHA256
+SIGNATURE_METHOD_HMAC_SHA512 = HMAC_SHA512
 SIGNATURE_METHOD_RSA_SHA1 = RSA_SHA1
 SIGNATURE_METHOD_PLAINTEXT = PLAINTEXT
 SIGNATURE_METHODS = [
     SIGNATURE_METHOD_HMAC_SHA1,
+    SIGNATURE_METHOD_HMAC_SHA256,
+    SIGNATURE_METHOD_HMAC_SHA512,
     SIGNATURE_METHOD_RSA_SHA1,
     SIGNATURE_METHOD_PLAINTEXT,
 ]
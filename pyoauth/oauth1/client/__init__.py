@@ -21,11 +21,15 @@ from __future__ import absolute_import
 
 import logging
 
+from mom.builtins import is_bytes, is_bytes_or_unicode
 from mom.codec.text import utf8_encode, utf8_decode_if_bytes
 from mom.functional import partition_dict, map_dict
 
+from pyoauth.cache import LRUCache
 from pyoauth.constants import \
     OAUTH_PARAM_VERSION, OAUTH_PARAM_SIGNATURE, OAUTH_PARAM_TOKEN, \
+    OAUTH_PARAM_BODY_HASH, \
+    OAUTH_PARAM_CONSUMER_KEY, \
     OAUTH_PARAM_SIGNATURE_METHOD, HEADER_AUTHORIZATION, HTTP_GET, \
     HEADER_CONTENT_LENGTH_CAPS, HEADER_CONTENT_LENGTH, \
     HEADER_AUTHORIZATION_CAPS, HEADER_CONTENT_TYPE, \
@@ -34,39 +38,149 @@ from pyoauth.constants import \
     OAUTH_VALUE_CALLBACK_CONFIRMED, OAUTH_PARAM_TOKEN_SECRET, \
     HTTP_POST, OAUTH_VALUE_CALLBACK_OOB, OAUTH_PARAM_CALLBACK, \
     HEADER_CONTENT_TYPE_CAPS
-from pyoauth.http import CONTENT_TYPE_FORM_URLENCODED, RequestAdapter
+from pyoauth.http import CONTENT_TYPE_FORM_URLENCODED, RequestAdapter, \
+    body_length
 from pyoauth.error import \
     InvalidAuthorizationHeaderError, InvalidSignatureMethodError, \
     IllegalArgumentError, InvalidHttpRequestError, \
     InvalidContentTypeError, HttpError, InvalidHttpResponseError, \
     SignatureMethodNotSupportedError
-from pyoauth.oauth1 import \
-    SIGNATURE_METHOD_HMAC_SHA1, \
-    SIGNATURE_METHOD_RSA_SHA1, \
-    SIGNATURE_METHOD_PLAINTEXT, Credentials
+from pyoauth.oauth1 import SIGNATURE_METHOD_HMAC_SHA1, Credentials
 from pyoauth.oauth1.protocol import \
-    generate_authorization_header, \
+    AuthorizationHeaderTemplate, \
     generate_base_string, \
     generate_nonce, \
     generate_timestamp, \
+    TIMESTAMP_CLOCK, \
     generate_hmac_sha1_signature, \
-    generate_rsa_sha1_signature, \
-    generate_plaintext_signature
+    generate_hmac_sha1_prefix_signature, \
+    generate_body_hash, \
+    generate_chunked_signature, \
+    spool_body, \
+    _body_position, \
+    FormBodyBaseStringBuilder, \
+    SIGNATURE_METHOD_REGISTRY, \
+    register_signature_method, \
+    unregister_signature_method
 from pyoauth.url import \
-    url_append_query, url_add_query, \
+    url_append_query, \
     query_append, request_query_remove_non_oauth, \
     oauth_url_sanitize, is_valid_callback_url, query_remove_oauth, \
-    parse_qs, query_add
+    ParsedUrl, QueryParams, \
+    parse_qs
 
 
-SIGNATURE_METHOD_MAP = {
-    SIGNATURE_METHOD_HMAC_SHA1: generate_hmac_sha1_signature,
-    SIGNATURE_METHOD_RSA_SHA1: generate_rsa_sha1_signature,
-    SIGNATURE_METHOD_PLAINTEXT: generate_plaintext_signature,
-}
+class _SignatureMethodMap(object):
+    """
+    A view of the signing functions in
+    :data:`pyoauth.oauth1.protocol.SIGNATURE_METHOD_REGISTRY`.
+
+    Assigning a signing function registers it, keeping the verification
+    function of a method that is already registered. Deleting a method
+    unregisters it.
+    """
+    def __getitem__(self, signature_method):
+        return SIGNATURE_METHOD_REGISTRY[signature_method][0]
+
+    def __setitem__(self, signature_method, sign_func):
+        entry = SIGNATURE_METHOD_REGISTRY.get(signature_method, (None, None))
+        register_signature_method(signature_method, sign_func, entry[1])
+
+    def __delitem__(self, signature_method):
+        if not unregister_signature_method(signature_method):
+            raise KeyError(signature_method)
+
+    def __contains__(self, signature_method):
+        return signature_method in SIGNATURE_METHOD_REGISTRY
+
+    def __iter__(self):
+        return iter(SIGNATURE_METHOD_REGISTRY)
+
+    def __len__(self):
+        return len(SIGNATURE_METHOD_REGISTRY)
+
+    def get(self, signature_method, default=None):
+        entry = SIGNATURE_METHOD_REGISTRY.get(signature_method)
+        if entry is None:
+            return default
+        return entry[0]
+
+    def keys(self):
+        return list(SIGNATURE_METHOD_REGISTRY.keys())
+
+    def items(self):
+        return [(signature_method, entry[0])
+                for signature_method, entry in
+                SIGNATURE_METHOD_REGISTRY.items()]
+
+
+# Signing functions used by the clients, indexed by signature method.
+# Changes made here or with
+# :func:`pyoauth.oauth1.protocol.register_signature_method` are the same.
+SIGNATURE_METHOD_MAP = _SignatureMethodMap()
+
+
+def _get_sign_func(signature_method):
+    """
+    Returns the signing function registered for a signature method in
+    :data:`pyoauth.oauth1.protocol.SIGNATURE_METHOD_REGISTRY` or ``None``
+    if the method is not supported.
+    """
+    entry = SIGNATURE_METHOD_REGISTRY.get(signature_method)
+    if entry is None:
+        return None
+    return entry[0]
+
+
+def _is_one_shot_body(body):
+    """
+    Determines whether an entity body can be read only once: an iterator
+    or a file object that cannot seek.
+    """
+    if hasattr(body, "read"):
+        return _body_position(body) is None
+    return hasattr(body, "__iter__") and not hasattr(body, "__len__")
+
+
+# Compiled Authorization header templates indexed by realm and the
+# protocol parameters that stay the same across a client's requests.
+AUTHORIZATION_HEADER_TEMPLATE_CACHE = LRUCache(max_size=256)
+_AUTHORIZATION_HEADER_CONSTANT_PARAMS = (
+    OAUTH_PARAM_CONSUMER_KEY,
+    OAUTH_PARAM_SIGNATURE_METHOD,
+    OAUTH_PARAM_VERSION,
+)
 
 
 class _OAuthClient(object):
+    # Set to ``True`` to sign HMAC-SHA1 requests with HMAC states that have
+    # already been fed the constant prefix of the base string for each
+    # (method, URL) pair. See
+    # :func:`pyoauth.oauth1.protocol.generate_hmac_sha1_prefix_signature`.
+    use_prefix_signing = False
+
+    # The clock that supplies ``oauth_timestamp`` values. Replace it with a
+    # :class:`pyoauth.oauth1.protocol.FrozenClock` for deterministic
+    # timestamps.
+    clock = TIMESTAMP_CLOCK
+
+    # Set to ``True`` to sign entity bodies that are not form-encoded with
+    # the ``oauth_body_hash`` extension. See
+    # :func:`pyoauth.oauth1.protocol.generate_body_hash`.
+    use_body_hash = False
+
+    # Form-encoded entity bodies larger than this many bytes, and file
+    # bodies, are parsed and signed with bounded memory. See
+    # :class:`pyoauth.oauth1.protocol.FormBodyBaseStringBuilder`. Signature
+    # methods registered with a signing function that is neither built in
+    # nor listed in :data:`pyoauth.oauth1.protocol.SHA1_DIGEST_SIGNERS` are
+    # still given the whole base string at once.
+    form_body_stream_threshold = 1 << 20
+
+    # Credentials response bodies larger than this many bytes are parsed
+    # lazily. See :func:`pyoauth.url.parse_qs`.
+    credentials_response_stream_threshold = 1 << 20
+
     def __init__(self, client_credentials, http_client,
                  use_authorization_header=True):
         self._client_credentials = client_credentials
@@ -91,13 +205,13 @@ class _OAuthClient(object):
         Generates a timestamp.
         Override if you need a different method.
         """
-        return generate_timestamp()
+        return generate_timestamp(cls.clock)
 
     @classmethod
     def check_signature_method(cls, signature_method):
         """Override this if you need to check your signature method.
         Should raise an error if the method is not supported."""
-        if signature_method not in SIGNATURE_METHOD_MAP:
+        if _get_sign_func(signature_method) is None:
             raise SignatureMethodNotSupportedError(
                 "OAuth 1.0 does not support the `%r` signature method." % \
                 signature_method
@@ -131,7 +245,7 @@ class _OAuthClient(object):
         :returns:
             A dictionary of protocol parameters.
         """
-        if oauth_signature_method not in SIGNATURE_METHOD_MAP:
+        if _get_sign_func(oauth_signature_method) is None:
             raise InvalidSignatureMethodError(
                 "Invalid signature method specified: %r" % \
                 oauth_signature_method
@@ -174,7 +288,7 @@ class _OAuthClient(object):
         :param method:
             HTTP method.
         :param url:
-            Request URL.
+            Request URL, a byte string or :class:`pyoauth.url.ParsedUrl`.
         :param params:
             Additional query/payload parameters.
         :param body:
@@ -192,6 +306,7 @@ class _OAuthClient(object):
         :returns:
             Request signature.
         """
+        signature_params = QueryParams(params)
         # Take parameters from the body if the Content-Type is specified
         # as ``application/x-www-form-urlencoded``.
         # http://tools.ietf.org/html/rfc5849#section-3.4.1.3.1
@@ -202,18 +317,24 @@ class _OAuthClient(object):
                 except KeyError:
                     content_type = headers[HEADER_CONTENT_TYPE_CAPS]
 
-                if content_type == CONTENT_TYPE_FORM_URLENCODED:
+                if content_type == CONTENT_TYPE_FORM_URLENCODED and \
+                   (not is_bytes_or_unicode(body) or
+                    len(body) > cls.form_body_stream_threshold):
+                    return cls._generate_form_body_signature(
+                        method, url, params, body,
+                        oauth_consumer_secret, oauth_token_secret,
+                        oauth_params)
+                elif content_type == CONTENT_TYPE_FORM_URLENCODED:
                     # These parameters must also be included in the signature.
                     # Ignore OAuth-specific parameters. They must be specified
                     # separately.
-                    body_params = query_remove_oauth(parse_qs(body))
-                    params = query_add(params, body_params)
+                    signature_params.extend(body)
                 else:
                     logging.info(
                         "Entity-body specified but `content-type` header " \
                         "value is not %r: entity-body parameters if " \
-                        "present will not be signed: got body %r" % \
-                        (CONTENT_TYPE_FORM_URLENCODED, body)
+                        "present will not be signed: got body %r",
+                        CONTENT_TYPE_FORM_URLENCODED, body
                     )
             except KeyError:
                 logging.warning(
@@ -221,22 +342,69 @@ class _OAuthClient(object):
                 )
 
         # Make oauth params and sign the request.
-        signature_url = url_add_query(url, query_remove_oauth(params))
+        signature_params.remove_oauth()
+        signature_url = ParsedUrl.parse(url).add_query(signature_params)
         # NOTE: We're not explicitly cleaning up because this method
         # expects oauth params generated by _generate_oauth_params.
         base_string = generate_base_string(method, signature_url, oauth_params)
+        return cls._sign_base_string(method, signature_url, base_string,
+                                     oauth_consumer_secret,
+                                     oauth_token_secret,
+                                     oauth_params)
 
+    @classmethod
+    def _sign_base_string(cls, method, signature_url, base_string,
+                          oauth_consumer_secret, oauth_token_secret,
+                          oauth_params):
+        """
+        Signs a base string with the signature method named in the
+        protocol parameters.
+
+        :param method:
+            HTTP method.
+        :param signature_url:
+            The request URL the base string was built from. Identifies the
+            cached HMAC state when :attr:`use_prefix_signing` is set.
+        :param base_string:
+            Base string, or an iterable of byte strings that make up the
+            base string; see
+            :func:`pyoauth.oauth1.protocol.generate_chunked_signature`.
+        :param oauth_consumer_secret:
+            OAuth client shared secret (consumer secret).
+        :param oauth_token_secret:
+            OAuth token/temporary shared secret if obtained from the OAuth
+            server.
+        :param oauth_params:
+            OAuth parameters generated by
+            :func:`OAuthClient._generate_oauth_params`.
+        :returns:
+            Request signature.
+        """
         signature_method = oauth_params[OAUTH_PARAM_SIGNATURE_METHOD]
         cls.check_signature_method(signature_method)
-        try:
-            sign_func = SIGNATURE_METHOD_MAP[signature_method]
-            return sign_func(base_string,
-                             oauth_consumer_secret,
-                             oauth_token_secret)
-        except KeyError:
+        sign_func = _get_sign_func(signature_method)
+        if sign_func is None:
             raise InvalidSignatureMethodError(
                 "unsupported signature method: %r" % signature_method
             )
+        prefix_key = None
+        if cls.use_prefix_signing and \
+           sign_func is generate_hmac_sha1_signature:
+            prefix_key = (method, signature_url)
+        if not is_bytes(base_string):
+            return generate_chunked_signature(sign_func, base_string,
+                                              oauth_consumer_secret,
+                                              oauth_token_secret,
+                                              prefix_key=prefix_key)
+        if prefix_key is not None:
+            return generate_hmac_sha1_prefix_signature(
+                base_string,
+                oauth_consumer_secret,
+                oauth_token_secret,
+                prefix_key=prefix_key)
+        return sign_func(base_string,
+                         oauth_consumer_secret,
+                         oauth_token_secret)
 
     @classmethod
     def _build_request(cls, method, url, params, body, headers,
@@ -248,7 +416,8 @@ class _OAuthClient(object):
         :param method:
             HTTP method.
         :param url:
-            Request URL
+            Request URL, a byte string or :class:`pyoauth.url.ParsedUrl`.
+            Serialized once, for the returned request.
         :param params:
             Additional query/payload parameters.
             If a `body` argument to this function is specified,
@@ -256,7 +425,10 @@ class _OAuthClient(object):
             If a `body` is not specified and a method other than GET is used
             the parameters will be added to the entity body.
         :param body:
-            Entity body.
+            Entity body. A byte string, buffer, memory-mapped file, file
+            object or iterator of byte strings; see
+            :func:`pyoauth.http.body_length`. ``Content-Length`` is set
+            from the size of buffers and files if missing.
         :param oauth_params:
             Protocol-specific parameters.
         :param realm:
@@ -276,14 +448,15 @@ class _OAuthClient(object):
             )
         if use_authorization_header:
             headers[HEADER_AUTHORIZATION_CAPS] = \
-                generate_authorization_header(oauth_params, realm)
+                cls._generate_authorization_header(oauth_params, realm)
             # Empty oauth params so that they are not included again below.
             oauth_params = None
 
         # OAuth requests can contain payloads.
         if body or method == HTTP_GET:
             # Append params to query string.
-            url = url_append_query(url_add_query(url, params), oauth_params)
+            url = ParsedUrl.parse(url).add_query(params).append_query(
+                oauth_params)
             if body and method == HTTP_GET:
                 raise InvalidHttpRequestError(
                     "HTTP method GET does not take an entity body"
@@ -291,7 +464,11 @@ class _OAuthClient(object):
             if body and \
                HEADER_CONTENT_LENGTH not in headers and \
                HEADER_CONTENT_LENGTH_CAPS not in headers:
-                raise ValueError("You must set the `content-length` header.")
+                length = body_length(body)
+                if length is None:
+                    raise ValueError(
+                        "You must set the `content-length` header.")
+                headers[HEADER_CONTENT_LENGTH] = str(length).encode("ascii")
         else:
             if params or oauth_params:
                 # Append to payload and set content type.
@@ -302,7 +479,115 @@ class _OAuthClient(object):
                 # Zero-length body.
                 body = SYMBOL_EMPTY_BYTES
                 headers[HEADER_CONTENT_LENGTH] = SYMBOL_ZERO
-        return RequestAdapter(method, url, body, headers)
+        return RequestAdapter(method, ParsedUrl.parse(url).geturl(), body,
+                              headers)
+
+    @classmethod
+    def _generate_form_body_signature(cls, method, url, params, body,
+                                      oauth_consumer_secret,
+                                      oauth_token_secret,
+                                      oauth_params):
+        """
+        Calculates a signature for a request with a large or file-like
+        form-encoded entity body without holding its parameters in memory.
+
+        File bodies are moved back to where they were afterwards. Takes the
+        same arguments as :meth:`_generate_signature`.
+
+        :returns:
+            Request signature.
+        """
+        position = None
+        if hasattr(body, "read"):
+            position = _body_position(body)
+        builder = FormBodyBaseStringBuilder(method, url)
+        params = QueryParams(params)
+        params.remove_oauth()
+        chunks = builder.iter_chunks(oauth_params, body, params)
+        try:
+            return cls._sign_base_string(method, url, chunks,
+                                         oauth_consumer_secret,
+                                         oauth_token_secret,
+                                         oauth_params)
+        finally:
+            chunks.close()
+            if position is not None:
+                body.seek(position)
+
+    @classmethod
+    def _add_body_hash(cls, method, params, body, headers, oauth_params):
+        """
+        Adds the ``oauth_body_hash`` protocol parameter for entity bodies
+        that are not form-encoded.
+
+        Files and memory-mapped files are hashed and rewound. Iterators and
+        files that cannot seek are copied to a spooled temporary file while
+        being hashed; ``Content-Length`` is set from the copy if missing.
+
+        :param method:
+            HTTP method.
+        :param params:
+            Additional query/payload parameters.
+        :param body:
+            Entity body.
+        :param headers:
+            Request headers. Updated in place.
+        :param oauth_params:
+            Protocol parameters. Updated in place.
+        :returns:
+            The entity body to send.
+        """
+        if body:
+            content_type = headers.get(HEADER_CONTENT_TYPE,
+                                       headers.get(HEADER_CONTENT_TYPE_CAPS))
+            if content_type == CONTENT_TYPE_FORM_URLENCODED:
+                return body
+        elif params and method != HTTP_GET:
+            # The parameters will make up a form-encoded body.
+            return body
+
+        if _is_one_shot_body(body):
+            body, body_hash, length = spool_body(body)
+            if HEADER_CONTENT_LENGTH not in headers and \
+               HEADER_CONTENT_LENGTH_CAPS not in headers:
+                headers[HEADER_CONTENT_LENGTH] = str(length).encode("ascii")
+        else:
+            body_hash = generate_body_hash(body)
+        oauth_params[OAUTH_PARAM_BODY_HASH] = body_hash
+        return body
+
+    @classmethod
+    def _generate_authorization_header(
+        cls, oauth_params, realm,
+        _cache=AUTHORIZATION_HEADER_TEMPLATE_CACHE):
+        """
+        Builds the Authorization header value from a template compiled once
+        for the realm, consumer key, signature method and version.
+
+        :param oauth_params:
+            Protocol-specific parameters.
+        :param realm:
+            OAuth authorization realm.
+        :returns:
+            Authorization header value identical to that of
+            :func:`pyoauth.oauth1.protocol.generate_authorization_header`.
+        """
+        constant_params = {}
+        key = []
+        oauth_params = dict(oauth_params)
+        for name in _AUTHORIZATION_HEADER_CONSTANT_PARAMS:
+            if name in oauth_params:
+                value = constant_params[name] = oauth_params.pop(name)
+                # Multi-valued parameters are lists, which cannot be hashed.
+                if isinstance(value, list):
+                    value = tuple(value)
+                key.append((name, value))
+        key = (realm, tuple(sorted(key)))
+        template = _cache.get(key)
+        if template is None:
+            template = AuthorizationHeaderTemplate(constant_params, realm)
+            _cache.set(key, template)
+        return template.build(oauth_params)
 
     @classmethod
     def _request(cls,
@@ -329,7 +614,10 @@ class _OAuthClient(object):
             If a `body` is not specified and a method other than GET is used
             the parameters will be added to the entity body.
         :param body:
-            Entity body string.
+            Entity body: a byte string, buffer, memory-mapped file, file
+            object or iterator of byte strings. Form-encoded iterators and
+            files that cannot seek are copied to a spooled temporary file,
+            since they are read once more for the signature.
         :param headers:
             Request headers dictionary.
         :param realm:
@@ -359,10 +647,11 @@ class _OAuthClient(object):
                            kwargs)
 
         # Query/payload parameters must not contain OAuth-specific parameters.
-        params = query_remove_oauth(params) if params else {}
+        params = QueryParams(params)
+        params.remove_oauth()
 
         # The URL must not contain OAuth-specific parameters.
-        url = oauth_url_sanitize(url, force_secure=False)
+        url = ParsedUrl.parse(url).sanitize(force_secure=False)
 
         # Temporary credentials requests don't have ``oauth_token``.
         if auth_credentials:
@@ -383,6 +672,21 @@ class _OAuthClient(object):
             **extra_oauth_params
         )
 
+        if _is_one_shot_body(body) and \
+           headers.get(HEADER_CONTENT_TYPE,
+                       headers.get(HEADER_CONTENT_TYPE_CAPS)) == \
+           CONTENT_TYPE_FORM_URLENCODED:
+            # Form parameters are read once for the signature and once
+            # more to be sent.
+            body, _, length = spool_body(body)
+            if HEADER_CONTENT_LENGTH not in headers and \
+               HEADER_CONTENT_LENGTH_CAPS not in headers:
+                headers[HEADER_CONTENT_LENGTH] = str(length).encode("ascii")
+
+        if cls.use_body_hash:
+            body = cls._add_body_hash(method, params, body, headers,
+                                      oauth_params)
+
         # Sign the request.
         signature = cls._generate_signature(method, url, params, body, headers,
                                             client_credentials.shared_secret,
@@ -597,7 +901,10 @@ class _OAuthClient(object):
                     "Content-Type: expected %r; got %r",
                     CONTENT_TYPE_FORM_URLENCODED, response.content_type)
 
-        params = parse_qs(response.body)
+        body = response.body
+        stream = not is_bytes_or_unicode(body) or \
+                 len(body) > cls.credentials_response_stream_threshold
+        params = parse_qs(body, stream)
         # Ensure the keys to this dictionary are unicode strings in Python 3.x.
         params = map_dict(lambda k, v: (utf8_decode_if_bytes(k), v), params)
         credentials = Credentials(identifier=params[OAUTH_PARAM_TOKEN][0],
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2011 Yesudeep Mangalapilly <yesudeep@gmail.com>
+# Copyright 2012 Google, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+:module: pyoauth.oauth1.pool
+:synopsis: Process-pool RSA-SHA1 signing.
+
+RSA private-key operations are CPU-bound and hold the interpreter lock, so
+a single process can only sign as fast as one core allows. This module
+moves RSA-SHA1 signing into a pool of worker processes. Keys given to the
+pool when it is created are parsed once by every worker as it starts, and
+requests signed with them send only the index of the key to the worker.
+Other keys are sent with every request and parsed at most once per worker
+(see :data:`pyoauth.oauth1.protocol.RSA_KEY_CACHE`).
+
+The pool is opt-in. :meth:`RsaSha1SigningPool.install` replaces the RSA-SHA1
+signing function in :data:`pyoauth.oauth1.protocol.SIGNATURE_METHOD_REGISTRY`,
+so requests signed through :class:`pyoauth.oauth1.client.Client` use it
+without any other code changes. Requests issued concurrently from several
+threads are then signed in parallel. It also adds
+:meth:`RsaSha1SigningPool.sign_digest` to
+:data:`pyoauth.oauth1.protocol.SHA1_DIGEST_SIGNERS`, so form-encoded bodies
+signed in chunks send only their SHA-1 digest to a worker.
+
+Requires the :mod:`multiprocessing` module (Python 2.6+).
+
+.. autoclass:: RsaSha1SigningPool
+   :members:
+"""
+
+from __future__ import absolute_import
+
+from pyoauth.oauth1 import SIGNATURE_METHOD_RSA_SHA1
+from pyoauth.oauth1.protocol import generate_rsa_sha1_signature, \
+    SIGNATURE_METHOD_REGISTRY, SHA1_DIGEST_SIGNERS, _sign_rsa_sha1_digest
+
+
+# Private keys parsed by the worker initializer, in the order they were given
+# to the pool. Only populated in worker processes.
+_WORKER_PRIVATE_KEYS = []
+
+
+def _sign(args):
+    """
+    Signs a base string in a worker process.
+
+    :param args:
+        A tuple of (base string, index of a key parsed by :func:`_warm_up`,
+        private key). Exactly one of the index and the key is ``None``.
+    :returns:
+        RSA-SHA1 signature.
+    """
+    base_string, key_index, client_private_key = args
+    if key_index is not None:
+        client_private_key = _WORKER_PRIVATE_KEYS[key_index]
+    return generate_rsa_sha1_signature(base_string, client_private_key)
+
+
+def _sign_digest(args):
+    """
+    Signs the SHA-1 digest of a base string in a worker process.
+
+    :param args:
+        A tuple of (digest, key index, private key) as for :func:`_sign`.
+    :returns:
+        RSA-SHA1 signature.
+    """
+    digest, key_index, client_private_key = args
+    if key_index is not None:
+        client_private_key = _WORKER_PRIVATE_KEYS[key_index]
+    return _sign_rsa_sha1_digest(digest, client_private_key)
+
+
+def _warm_up(client_private_keys):
+    """
+    Worker initializer that parses the given private keys once.
+
+    :param client_private_keys:
+        A sequence of PEM-encoded RSA private keys.
+    """
+    from pyoauth.oauth1.protocol import _parse_rsa_key, _RSA_PRIVATE_KEY
+
+    _WORKER_PRIVATE_KEYS[:] = [
+        _parse_rsa_key(client_private_key, _RSA_PRIVATE_KEY)
+        for client_private_key in client_private_keys]
+
+
+class RsaSha1SigningPool(object):
+    """
+    A pool of worker processes that calculate RSA-SHA1 signatures.
+
+    :param processes:
+        Number of worker processes. Defaults to the number of CPUs.
+    :param client_private_keys:
+        PEM-encoded RSA private keys each worker should parse on start-up.
+        These keys are never sent to the workers again. Keys not listed
+        here are sent with every request and parsed the first time a worker
+        sees them.
+    """
+    def __init__(self, processes=None, client_private_keys=None):
+        import multiprocessing
+
+        client_private_keys = tuple(client_private_keys or ())
+        self._key_indexes = dict((client_private_key, index)
+                                 for index, client_private_key
+                                 in enumerate(client_private_keys))
+        self._pool = multiprocessing.Pool(processes,
+                                          _warm_up,
+                                          (client_private_keys,))
+        self._installed = None
+
+    def sign(self, base_string, client_private_key, token_shared_secret=None):
+        """
+        Calculates an RSA-SHA1 signature in a worker process.
+
+        Takes the same arguments as the signing functions in
+        :data:`pyoauth.oauth1.protocol.SIGNATURE_METHOD_REGISTRY` and
+        blocks until the signature is available.
+
+        :param base_string:
+            Base string.
+        :param client_private_key:
+            PEM-encoded RSA private key.
+        :param token_shared_secret:
+            Ignored; RSA-SHA1 does not use the token shared secret.
+        :returns:
+            RSA-SHA1 signature.
+        """
+        return self._pool.apply(_sign,
+                                (self._task(base_string, client_private_key),))
+
+    def sign_digest(self, digest, client_private_key,
+                    token_shared_secret=None):
+        """
+        Signs the SHA-1 digest of a base string in a worker process.
+
+        :param digest:
+            SHA-1 digest of the base string.
+        :param client_private_key:
+            PEM-encoded RSA private key.
+        :param token_shared_secret:
+            Ignored; RSA-SHA1 does not use the token shared secret.
+        :returns:
+            RSA-SHA1 signature.
+        """
+        return self._pool.apply(_sign_digest,
+                                (self._task(digest, client_private_key),))
+
+    def sign_many(self, base_strings, client_private_key, chunksize=None):
+        """
+        Calculates RSA-SHA1 signatures for many base strings.
+
+        :param base_strings:
+            An iterable of base strings.
+        :param client_private_key:
+            PEM-encoded RSA private key.
+        :param chunksize:
+            Number of base strings sent to a worker at a time.
+        :returns:
+            A list of signatures in the order of ``base_strings``.
+        """
+        tasks = [self._task(base_string, client_private_key)
+                 for base_string in base_strings]
+        return self._pool.map(_sign, tasks, chunksize)
+
+    def _task(self, data, client_private_key):
+        """
+        Builds the arguments of :func:`_sign` and :func:`_sign_digest`,
+        sending only the index of a key the workers parsed on start-up.
+        """
+        key_index = self._key_indexes.get(client_private_key)
+        if key_index is None:
+            return data, None, client_private_key
+        return data, key_index, None
+
+    def install(self, registry=None, digest_signers=None):
+        """
+        Makes this pool the RSA-SHA1 signer used by the OAuth clients.
+
+        :param registry:
+            The signature method registry to patch. Defaults to
+            :data:`pyoauth.oauth1.protocol.SIGNATURE_METHOD_REGISTRY`.
+        :param digest_signers:
+            The digest signers to add :meth:`sign_digest` to. Defaults to
+            :data:`pyoauth.oauth1.protocol.SHA1_DIGEST_SIGNERS`.
+        """
+        if registry is None:
+            registry = SIGNATURE_METHOD_REGISTRY
+        if digest_signers is None:
+            digest_signers = SHA1_DIGEST_SIGNERS
+        if self._installed is None:
+            entry = registry[SIGNATURE_METHOD_RSA_SHA1]
+            self._installed = (registry, entry, digest_signers)
+            registry[SIGNATURE_METHOD_RSA_SHA1] = (self.sign, entry[1])
+            digest_signers[self.sign] = self.sign_digest
+
+    def uninstall(self):
+        """
+        Restores the RSA-SHA1 signer replaced by :meth:`install`.
+        """
+        if self._installed is not None:
+            registry, entry, digest_signers = self._installed
+            registry[SIGNATURE_METHOD_RSA_SHA1] = entry
+            digest_signers.pop(self.sign, None)
+            self._installed = None
+
+    def close(self):
+        """
+        Uninstalls the pool and waits for the worker processes to exit.
+        """
+        self.uninstall()
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -26,12 +26,52 @@ Nonce, verification code, and timestamp
 .. autofunction:: generate_verification_code
 .. autofunction:: generate_timestamp
 .. autofunction:: generate_client_secret
+.. autofunction:: generate_nonces
+.. autofunction:: generate_verification_codes
+.. autofunction:: generate_client_secrets
+
+Timestamps only change once a second. :func:`generate_timestamp` reads them
+from a clock that formats each second once. A frozen clock makes
+timestamps deterministic in tests and benchmarks.
+
+.. autoclass:: TimestampClock
+   :members:
+.. autoclass:: FrozenClock
+   :members:
+.. autodata:: TIMESTAMP_CLOCK
 
 Base string
 -----------
 .. autofunction:: generate_base_string
 .. autofunction:: generate_base_string_query
 
+:func:`generate_base_string` builds dictionaries for the URL query and
+protocol parameters, merges them and percent-encodes the result twice.
+The builder below produces the same base string from one list of encoded
+pairs, one sort and one output buffer. It can be reused for requests to
+the same method and URL.
+
+.. autoclass:: BaseStringBuilder
+   :members:
+
+Requests to one resource usually differ only in the nonce, the timestamp
+and perhaps a few query parameters. A template keeps the other parameters
+encoded and sorted, and inserts the ones that change by binary search.
+
+.. autoclass:: BaseStringTemplate
+   :members:
+
+Form-encoded entity-body parameters are part of the base string. For
+bodies of many megabytes the builder below parses, encodes and sorts them
+with bounded memory, spilling to temporary files, and hands out the base
+string in chunks for :func:`generate_chunked_signature` to sign.
+
+.. autoclass:: FormBodyBaseStringBuilder
+   :members:
+.. autofunction:: generate_chunked_signature
+.. autodata:: SHA1_DIGEST_SIGNERS
+.. autodata:: FORM_BODY_SORT_MAX_MEMORY
+
 Signatures
 ----------
 The types of signatures currently supported for OAuth 1.0
@@ -52,6 +92,86 @@ preferable because their validity can be determined.
 .. autofunction:: generate_plaintext_signature
 .. autofunction:: verify_hmac_sha1_signature
 .. autofunction:: verify_rsa_sha1_signature
+.. autofunction:: verify_many
+
+HMAC-SHA256 and HMAC-SHA512 are not part of RFC 5849 but are accepted by
+many providers. They derive their keys exactly like HMAC-SHA1.
+
+.. autofunction:: generate_hmac_sha256_signature
+.. autofunction:: generate_hmac_sha512_signature
+.. autofunction:: verify_hmac_sha256_signature
+.. autofunction:: verify_hmac_sha512_signature
+
+Signature methods are looked up in a registry that maps each method name
+to a signing and a verification function. Other methods can be added to
+it.
+
+.. autofunction:: register_signature_method
+.. autofunction:: unregister_signature_method
+.. autofunction:: get_signature_method
+.. autofunction:: verify_signature
+.. autodata:: SIGNATURE_METHOD_REGISTRY
+
+Working out why an HMAC-SHA1 signature failed costs several more HMACs.
+Servers that want those hints without letting bad signatures amplify load
+can use a verifier that diagnoses failures lazily or by sampling.
+
+.. autoclass:: HmacSha1Verifier
+   :members:
+
+HMAC keys are derived from the client and token shared secrets. The keyed
+HMAC state for each pair of secrets is kept in a bounded LRU cache so that
+repeated signing with the same credentials only hashes the base string.
+
+.. autodata:: HMAC_SHA1_KEY_CACHE
+.. autodata:: HMAC_SHA256_KEY_CACHE
+.. autodata:: HMAC_SHA512_KEY_CACHE
+
+For a given endpoint the leading part of the base string -- the method, the
+base string URI and the sorted parameters that precede ``oauth_nonce`` and
+``oauth_timestamp`` -- does not change between requests. The prefix signer
+keeps HMAC states already fed with that prefix and hashes only the rest.
+
+.. autofunction:: generate_hmac_sha1_prefix_signature
+.. autodata:: HMAC_SHA1_PREFIX_CACHE
+
+Parsing PEM-encoded RSA keys and certificates costs more than signing a
+short base string. Parsed keys are cached by the digest of their encoded
+form. The RSA-SHA1 routines also accept already-parsed key objects.
+
+.. autofunction:: invalidate_rsa_key
+.. autodata:: RSA_KEY_CACHE
+
+:func:`generate_rsa_sha1_crt_signature` performs the RSA private-key
+operation itself using the Chinese Remainder Theorem and blinding. Its
+output is identical to that of :func:`generate_rsa_sha1_signature`.
+
+.. autofunction:: generate_rsa_sha1_crt_signature
+
+The SHA-1 and Base64 primitives underneath the signature routines come
+from a crypto backend. The ``"stdlib"`` backend, the default, calls
+:mod:`hashlib` and :mod:`binascii` directly. The ``"mom"`` backend goes
+through the type-checked helpers in :mod:`mom.security.hash` and
+:mod:`mom.codec`. Both produce identical signatures. HMAC states are
+always keyed with :mod:`hmac` from the standard library, whichever backend
+is selected, because they are cached and copied per request; mom's HMAC
+helpers wrap the same module.
+
+.. autofunction:: set_crypto_backend
+.. autofunction:: get_crypto_backend
+.. autodata:: CRYPTO_BACKENDS
+
+Body hash
+---------
+The OAuth Request Body Hash extension signs entity bodies that are not
+form-encoded through an ``oauth_body_hash`` protocol parameter. Bodies are
+hashed in chunks, so large uploads are never held in memory. Files and
+memory-mapped files are rewound afterwards. Iterators can be consumed only
+once, so they are copied to a spooled temporary file while being hashed,
+and the copy is uploaded instead.
+
+.. autofunction:: generate_body_hash
+.. autofunction:: spool_body
 
 Authorization HTTP header creation and parsing
 ----------------------------------------------
@@ -72,6 +192,20 @@ OAuth authorization headers.
 
 .. autofunction:: generate_authorization_header
 .. autofunction:: parse_authorization_header
+
+Clients that send many requests with the same realm, delimiter and
+constant protocol parameters can compile those into a template once.
+
+.. autoclass:: AuthorizationHeaderTemplate
+   :members:
+
+The parser works on the raw bytes of the header and rejects headers that
+are longer than :data:`AUTHORIZATION_HEADER_MAX_LENGTH` bytes or have more
+than :data:`AUTHORIZATION_HEADER_MAX_PARAMS` parameters before doing any
+other work.
+
+.. autodata:: AUTHORIZATION_HEADER_MAX_LENGTH
+.. autodata:: AUTHORIZATION_HEADER_MAX_PARAMS
 """
 
 from __future__ import absolute_import
@@ -82,35 +216,170 @@ try:
 except ImportError:
     pass
 
+try:
+    # Python 2.x
+    import Queue as queue
+except ImportError:
+    import queue
+
+import binascii
+from bisect import insort
+import hashlib
+import heapq
+import hmac
+import logging
+import os
 import re
+import tempfile
+import threading
 import time
 
-from mom.builtins import b
+from mom.builtins import b, is_bytes, is_bytes_or_unicode
 from mom.codec import decimal_encode, \
-    base64_encode, base64_decode, base58_encode
+    base64_encode, base64_decode as _mom_base64_decode, base58_encode
 from mom.codec.text import utf8_encode, utf8_decode_if_bytes, \
     utf8_encode_if_unicode
-from mom.security.hash import hmac_sha1_base64_digest, sha1_digest
-from mom.security.random import \
-    generate_random_bits, \
-    generate_random_hex_string
+from mom.security.hash import sha1_digest as _mom_sha1_digest
+from mom.security.random import generate_random_hex_string
 
 from pyoauth.constants import \
+    HMAC_SHA1, HMAC_SHA256, HMAC_SHA512, RSA_SHA1, PLAINTEXT, \
     SYMBOL_INVERTED_DOUBLE_QUOTE, \
     SYMBOL_EQUAL, \
     OAUTH_AUTH_SCHEME_PATTERN, \
     SYMBOL_EMPTY_BYTES, \
     OAUTH_PARAM_SIGNATURE, \
-    SYMBOL_AMPERSAND, OAUTH_PARAM_REALM
-from pyoauth._compat import urlunparse
+    SYMBOL_AMPERSAND, OAUTH_PARAM_REALM, OAUTH_PARAM_PREFIX
+from pyoauth._compat import BUFFER_TYPES
+from pyoauth.cache import LRUCache
+from pyoauth.entropy import ENTROPY_POOL
 from pyoauth.http import HTTP_METHODS
 from pyoauth.url import percent_encode, percent_decode, \
-    urlencode_sl, urlencode_s, urlparse_normalized, \
-    request_query_remove_non_oauth, query_remove_oauth
+    percent_encode_memoized, parse_qsl, parse_qsl_stream, \
+    request_query_remove_non_oauth, query_partition_oauth, \
+    _urlsplit_normalized
 from pyoauth.error import InvalidHttpMethodError, \
     InvalidUrlError, \
     InvalidOAuthParametersError, \
-    InvalidAuthorizationHeaderError
+    InvalidAuthorizationHeaderError, \
+    InvalidSignatureMethodError
+
+
+class _CryptoBackend(object):
+    """
+    The SHA-1 and Base64 primitives used by the signature routines.
+    """
+    def __init__(self, name, base64_encode, base64_decode, sha1_digest):
+        self.name = name
+        self.base64_encode = base64_encode
+        self.base64_decode = base64_decode
+        self.sha1_digest = sha1_digest
+
+
+def _stdlib_base64_encode(byte_string):
+    """Base64-encodes a byte string without a trailing newline."""
+    return binascii.b2a_base64(byte_string)[:-1]
+
+
+def _stdlib_sha1_digest(byte_string):
+    """SHA-1 digest of a byte string."""
+    return hashlib.sha1(byte_string).digest()
+
+
+#: Crypto backends indexed by name.
+CRYPTO_BACKENDS = {
+    "stdlib": _CryptoBackend("stdlib",
+                             _stdlib_base64_encode,
+                             binascii.a2b_base64,
+                             _stdlib_sha1_digest),
+    "mom": _CryptoBackend("mom",
+                          base64_encode,
+                          _mom_base64_decode,
+                          _mom_sha1_digest),
+}
+_crypto = CRYPTO_BACKENDS["stdlib"]
+
+
+def set_crypto_backend(name):
+    """
+    Selects the crypto backend used by the signature routines.
+
+    :param name:
+        ``"stdlib"`` or ``"mom"``.
+    :returns:
+        The name of the previously selected backend.
+    """
+    global _crypto
+    if name not in CRYPTO_BACKENDS:
+        raise ValueError("unknown crypto backend: %r" % (name,))
+    previous = _crypto.name
+    _crypto = CRYPTO_BACKENDS[name]
+    return previous
+
+
+def get_crypto_backend():
+    """
+    Returns the name of the crypto backend used by the signature routines.
+    """
+    return _crypto.name
+
+
+# Keyed HMAC-SHA1 states indexed by (client secret, token secret).
+HMAC_SHA1_KEY_CACHE = LRUCache(max_size=1024)
+# Keyed HMAC-SHA256 states indexed by (client secret, token secret).
+HMAC_SHA256_KEY_CACHE = LRUCache(max_size=1024)
+# Keyed HMAC-SHA512 states indexed by (client secret, token secret).
+HMAC_SHA512_KEY_CACHE = LRUCache(max_size=1024)
+
+# Digest constructor and keyed-state cache of each HMAC signature method.
+_HMAC_DIGESTS = {
+    HMAC_SHA1: (hashlib.sha1, HMAC_SHA1_KEY_CACHE),
+    HMAC_SHA256: (hashlib.sha256, HMAC_SHA256_KEY_CACHE),
+    HMAC_SHA512: (hashlib.sha512, HMAC_SHA512_KEY_CACHE),
+}
+
+# HMAC-SHA1 states pre-fed with the constant prefix of a base string indexed
+# by (prefix key, client secret, token secret).
+HMAC_SHA1_PREFIX_CACHE = LRUCache(max_size=1024)
+
+# Block size of SHA-1 in bytes, which HMAC pads its key to.
+_SHA1_BLOCK_SIZE = 64
+
+# Parsed RSA key objects indexed by (key type, SHA-1 digest of the encoded key)
+# and CRT keys derived from already-parsed keys indexed by (key type, modulus).
+RSA_KEY_CACHE = LRUCache(max_size=256)
+_RSA_PRIVATE_KEY = "private"
+_RSA_PUBLIC_KEY = "public"
+_RSA_CRT_PRIVATE_KEY = "crt"
+
+# ASN.1 DigestInfo prefix for SHA-1 used by EMSA-PKCS1-v1_5.
+_SHA1_DIGEST_INFO = binascii.unhexlify(b("3021300906052b0e03021a05000414"))
+
+# Encoded names of the protocol parameters whose values change with every
+# request. Everything in the base string before the first of these is
+# constant for a given endpoint and set of credentials.
+_BASE_STRING_VOLATILE_NAMES = (
+    b("oauth_body_hash%3D"),
+    b("oauth_nonce%3D"),
+    b("oauth_timestamp%3D"),
+)
+_BASE_STRING_PARAM_SEPARATOR = b("%26")
+# Percent-encoded name of the parameter left out of the base string.
+_OAUTH_PARAM_SIGNATURE = b(OAUTH_PARAM_SIGNATURE)
+# Authorization header values longer than this many bytes are rejected.
+AUTHORIZATION_HEADER_MAX_LENGTH = 8192
+# Authorization header values with more parameters than this are rejected.
+AUTHORIZATION_HEADER_MAX_PARAMS = 32
+_AUTH_SCHEME_BYTES_PATTERN = re.compile(b(r"^OAuth\s+"), re.IGNORECASE)
+_AUTH_SCHEME_PREFIX = b("oauth ")
+_QUOTE = b('"')
+
+# ``=`` and ``%`` in the base string query after it has been percent-encoded
+# a second time.
+_BASE_STRING_PARAM_EQUAL = b("%3D")
+_BASE_STRING_PERCENT = b("%25")
+_PERCENT = b("%")
+_PLUS = b("+")
 
 
 def generate_nonce(n_bits=64):
@@ -128,7 +397,7 @@ def generate_nonce(n_bits=64):
         decimal-representation unsigned integral number based on the bit size
         specified.
     """
-    return decimal_encode(generate_random_bits(n_bits))
+    return decimal_encode(ENTROPY_POOL.random_bits(n_bits))
 
 
 def generate_client_secret(n_bits=144):
@@ -152,7 +421,7 @@ def generate_client_secret(n_bits=144):
         A base-64-encoded random unsigned-integral consumer secret based
         on the bit size specified.
     """
-    return base64_encode(generate_random_bits(n_bits))
+    return base64_encode(ENTROPY_POOL.random_bits(n_bits))
 
 
 def generate_verification_code(n_bits=64):
@@ -165,7 +434,56 @@ def generate_verification_code(n_bits=64):
         A base58-encoded random unsigned integral human-inputable compact
         verification code.
     """
-    return base58_encode(generate_random_bits(n_bits))
+    return base58_encode(ENTROPY_POOL.random_bits(n_bits))
+
+
+def generate_nonces(count, n_bits=64):
+    """
+    Generates many nonces at once. See :func:`generate_nonce`.
+
+    The random bits for all the nonces are read from the entropy pool in a
+    single call.
+
+    :param count:
+        Number of nonces.
+    :param n_bits:
+        Bit size of each nonce. Default 64.
+    :returns:
+        A list of ``count`` nonces.
+    """
+    return [decimal_encode(value)
+            for value in ENTROPY_POOL.random_bits_many(count, n_bits)]
+
+
+def generate_client_secrets(count, n_bits=144):
+    """
+    Generates many client secrets at once. See :func:`generate_client_secret`.
+
+    :param count:
+        Number of client secrets.
+    :param n_bits:
+        Bit size of each client secret. Default 144.
+    :returns:
+        A list of ``count`` client secrets.
+    """
+    return [base64_encode(value)
+            for value in ENTROPY_POOL.random_bits_many(count, n_bits)]
+
+
+def generate_verification_codes(count, n_bits=64):
+    """
+    Generates many verification codes at once. See
+    :func:`generate_verification_code`.
+
+    :param count:
+        Number of verification codes.
+    :param n_bits:
+        Bit size of each verification code. Default 64.
+    :returns:
+        A list of ``count`` verification codes.
+    """
+    return [base58_encode(value)
+            for value in ENTROPY_POOL.random_bits_many(count, n_bits)]
 
 
 def _generate_hex_verification_code(length=8):
@@ -191,7 +509,81 @@ def _generate_hex_verification_code(length=8):
     return generate_random_hex_string(length)
 
 
-def generate_timestamp():
+class TimestampClock(object):
+    """
+    A clock that returns OAuth timestamps and formats each second only once.
+
+    The formatted timestamp is cached together with the second it
+    represents. The cache is a single tuple that is replaced as a whole, so
+    concurrent callers never see a timestamp paired with the wrong second.
+
+    :param time_func:
+        A function that returns the current time in seconds since the epoch.
+        Default :func:`time.time`.
+    """
+    def __init__(self, time_func=None):
+        self._time_func = time_func or time.time
+        self._cached = (None, None)
+
+    def time(self):
+        """
+        Returns the current time as a whole number of seconds since the epoch.
+        """
+        return int(self._time_func())
+
+    def timestamp(self):
+        """
+        Returns the current time as an OAuth timestamp.
+
+        :returns:
+            Byte string containing a positive integer.
+        """
+        seconds = self.time()
+        cached_seconds, value = self._cached
+        if seconds != cached_seconds:
+            value = b(str(seconds))
+            self._cached = (seconds, value)
+        return value
+
+
+class FrozenClock(TimestampClock):
+    """
+    A clock that only moves when told to.
+
+    :param seconds:
+        The time in seconds since the epoch.
+    """
+    def __init__(self, seconds):
+        TimestampClock.__init__(self, self._now)
+        self._seconds = int(seconds)
+
+    def _now(self):
+        return self._seconds
+
+    def set(self, seconds):
+        """
+        Sets the time.
+
+        :param seconds:
+            The time in seconds since the epoch.
+        """
+        self._seconds = int(seconds)
+
+    def advance(self, seconds=1):
+        """
+        Moves the time forward.
+
+        :param seconds:
+            Number of seconds. Default 1.
+        """
+        self._seconds += int(seconds)
+
+
+#: The clock :func:`generate_timestamp` uses by default.
+TIMESTAMP_CLOCK = TimestampClock()
+
+
+def generate_timestamp(clock=None):
     """
     Generates an OAuth timestamp.
 
@@ -199,10 +591,13 @@ def generate_timestamp():
 
     :see:
         Nonce and Timestamp (http://tools.ietf.org/html/rfc5849#section-3.3)
+    :param clock:
+        The :class:`TimestampClock` to read. Default
+        :data:`TIMESTAMP_CLOCK`.
     :returns:
-        A string containing a positive integer representing time.
+        A byte string containing a positive integer representing time.
     """
-    return str(int(time.time()))
+    return (clock or TIMESTAMP_CLOCK).timestamp()
 
 
 def generate_hmac_sha1_signature(base_string,
@@ -221,9 +616,276 @@ def generate_hmac_sha1_signature(base_string,
     :returns:
         HMAC-SHA1 signature.
     """
-    key = _generate_plaintext_signature(client_shared_secret,
-                                        token_shared_secret)
-    return hmac_sha1_base64_digest(key, base_string)
+    context = _hmac_sha1_context(client_shared_secret, token_shared_secret)
+    context.update(base_string)
+    return _crypto.base64_encode(context.digest())
+
+
+def _hmac_sha1_context(client_shared_secret, token_shared_secret=None,
+                       _cache=HMAC_SHA1_KEY_CACHE):
+    """
+    Returns a fresh HMAC-SHA1 object keyed with the given secrets.
+
+    :param client_shared_secret:
+        Client (consumer) shared secret.
+    :param token_shared_secret:
+        Token/temporary credentials shared secret if available.
+    :returns:
+        A copy of the cached keyed HMAC-SHA1 object, ready to be fed
+        the base string.
+    """
+    return _hmac_context(hashlib.sha1, _cache,
+                         client_shared_secret, token_shared_secret)
+
+
+def _hmac_context(digestmod, cache, client_shared_secret,
+                  token_shared_secret=None):
+    """
+    Returns a fresh HMAC object keyed with the given secrets.
+
+    Setting up the HMAC key schedule is the expensive part of signing short
+    base strings, so the keyed object is cached per pair of secrets and only
+    a copy of it is handed out.
+
+    :param digestmod:
+        The :mod:`hashlib` constructor of the digest.
+    :param cache:
+        The :class:`pyoauth.cache.LRUCache` of keyed objects for the digest.
+    :param client_shared_secret:
+        Client (consumer) shared secret.
+    :param token_shared_secret:
+        Token/temporary credentials shared secret if available.
+    :returns:
+        A copy of the cached keyed HMAC object, ready to be fed the base
+        string.
+    """
+    cache_key = (client_shared_secret, token_shared_secret)
+    context = cache.get(cache_key)
+    if context is None:
+        key = _generate_plaintext_signature(client_shared_secret,
+                                            token_shared_secret)
+        context = hmac.new(key, digestmod=digestmod)
+        cache.set(cache_key, context)
+    return context.copy()
+
+
+def _generate_hmac_signature(signature_method, base_string,
+                             client_shared_secret, token_shared_secret=None):
+    """
+    Calculates an HMAC signature for a base string with the digest of the
+    given HMAC signature method.
+    """
+    digestmod, cache = _HMAC_DIGESTS[signature_method]
+    context = _hmac_context(digestmod, cache,
+                            client_shared_secret, token_shared_secret)
+    context.update(base_string)
+    return _crypto.base64_encode(context.digest())
+
+
+def generate_hmac_sha256_signature(base_string,
+                                   client_shared_secret,
+                                   token_shared_secret=None):
+    """
+    Calculates an HMAC-SHA256 signature for a base string.
+
+    The key is derived from the shared secrets as for HMAC-SHA1.
+
+    :param base_string:
+        Base string.
+    :param client_shared_secret:
+        Client (consumer) shared secret.
+    :param token_shared_secret:
+        Token/temporary credentials shared secret if available.
+    :returns:
+        HMAC-SHA256 signature.
+    """
+    return _generate_hmac_signature(HMAC_SHA256, base_string,
+                                    client_shared_secret, token_shared_secret)
+
+
+def generate_hmac_sha512_signature(base_string,
+                                   client_shared_secret,
+                                   token_shared_secret=None):
+    """
+    Calculates an HMAC-SHA512 signature for a base string.
+
+    The key is derived from the shared secrets as for HMAC-SHA1.
+
+    :param base_string:
+        Base string.
+    :param client_shared_secret:
+        Client (consumer) shared secret.
+    :param token_shared_secret:
+        Token/temporary credentials shared secret if available.
+    :returns:
+        HMAC-SHA512 signature.
+    """
+    return _generate_hmac_signature(HMAC_SHA512, base_string,
+                                    client_shared_secret, token_shared_secret)
+
+
+def verify_hmac_sha256_signature(signature,
+                                 base_string,
+                                 client_shared_secret,
+                                 token_shared_secret=None):
+    """
+    Verifies an HMAC-SHA256 signature for a base string.
+
+    :param signature:
+        The signature to verify.
+    :param base_string:
+        The base string.
+    :param client_shared_secret:
+        Client (consumer) shared secret.
+    :param token_shared_secret:
+        Token/temporary credentials shared secret if available.
+    :returns:
+        A tuple of
+            (whether signature matches (boolean),
+            error message (None if it succeeded)).
+    """
+    if signature == generate_hmac_sha256_signature(base_string,
+                                                   client_shared_secret,
+                                                   token_shared_secret):
+        return True, None
+    return False, "Invalid signature"
+
+
+def verify_hmac_sha512_signature(signature,
+                                 base_string,
+                                 client_shared_secret,
+                                 token_shared_secret=None):
+    """
+    Verifies an HMAC-SHA512 signature for a base string.
+
+    :param signature:
+        The signature to verify.
+    :param base_string:
+        The base string.
+    :param client_shared_secret:
+        Client (consumer) shared secret.
+    :param token_shared_secret:
+        Token/temporary credentials shared secret if available.
+    :returns:
+        A tuple of
+            (whether signature matches (boolean),
+            error message (None if it succeeded)).
+    """
+    if signature == generate_hmac_sha512_signature(base_string,
+                                                   client_shared_secret,
+                                                   token_shared_secret):
+        return True, None
+    return False, "Invalid signature"
+
+
+def generate_hmac_sha1_prefix_signature(base_string,
+                                        client_shared_secret,
+                                        token_shared_secret=None,
+                                        prefix_key=None,
+                                        _cache=HMAC_SHA1_PREFIX_CACHE):
+    """
+    Calculates an HMAC-SHA1 signature for a base string reusing an HMAC state
+    that has already been fed the constant prefix of the base string.
+
+    The result is identical to that of
+    :func:`generate_hmac_sha1_signature`. A cached state is used only if the
+    base string actually begins with the prefix it was fed, so a stale
+    ``prefix_key`` costs a cache refresh, never a wrong signature.
+
+    :see: HMAC-SHA1 (http://tools.ietf.org/html/rfc5849#section-3.4.2)
+    :param base_string:
+        Base string.
+    :param client_shared_secret:
+        Client (consumer) shared secret.
+    :param token_shared_secret:
+        Token/temporary credentials shared secret if available.
+    :param prefix_key:
+        A hashable value that identifies the endpoint, for example the
+        ``(method, url)`` pair used to build the base string. If ``None``,
+        the prefix bytes themselves are used as the key.
+    :returns:
+        HMAC-SHA1 signature.
+    """
+    context = _hmac_sha1_prefix_context(base_string,
+                                        client_shared_secret,
+                                        token_shared_secret,
+                                        prefix_key,
+                                        _cache)
+    return _crypto.base64_encode(context.digest())
+
+
+def _hmac_sha1_prefix_context(base_string,
+                              client_shared_secret,
+                              token_shared_secret,
+                              prefix_key,
+                              _cache=HMAC_SHA1_PREFIX_CACHE):
+    """
+    Returns an HMAC-SHA1 object that has been fed the base string, starting
+    from a cached state that has already been fed its constant prefix. Takes
+    the same arguments as :func:`generate_hmac_sha1_prefix_signature`.
+    """
+    cache_key = (prefix_key, client_shared_secret, token_shared_secret)
+    entry = None
+    if prefix_key is not None:
+        entry = _cache.get(cache_key)
+    if entry is None or not base_string.startswith(entry[0]):
+        prefix_length = _base_string_static_prefix_length(base_string)
+        if not prefix_length:
+            context = _hmac_sha1_context(client_shared_secret,
+                                         token_shared_secret)
+            context.update(base_string)
+            return context
+        prefix = base_string[:prefix_length]
+        if prefix_key is None:
+            cache_key = (prefix, client_shared_secret, token_shared_secret)
+            entry = _cache.get(cache_key)
+        if entry is None or entry[0] != prefix:
+            context = _hmac_sha1_context(client_shared_secret,
+                                         token_shared_secret)
+            context.update(prefix)
+            entry = (prefix, context)
+            _cache.set(cache_key, entry)
+    prefix, context = entry
+    context = context.copy()
+    context.update(base_string[len(prefix):])
+    return context
+
+
+def _base_string_static_prefix_length(base_string):
+    """
+    Determines the length of the part of a base string that precedes the
+    first per-request protocol parameter (``oauth_nonce`` or
+    ``oauth_timestamp``).
+
+    ::
+
+        'GET&http%3A%2F%2Fa.com%2F&a%3D1%26oauth_nonce%3D42...'
+        -> len('GET&http%3A%2F%2Fa.com%2F&a%3D1%26')
+
+    :param base_string:
+        Base string.
+    :returns:
+        The length of the constant prefix or ``0`` if the base string
+        does not contain a per-request parameter.
+    """
+    # The query component follows the second raw "&". Both the method and
+    # the base string URI are percent-encoded and cannot contain one.
+    query_start = base_string.find(SYMBOL_AMPERSAND,
+                                   base_string.find(SYMBOL_AMPERSAND) + 1) + 1
+    if not query_start:
+        return 0
+    prefix_length = 0
+    for name in _BASE_STRING_VOLATILE_NAMES:
+        if base_string.startswith(name, query_start):
+            # The very first parameter: nothing of the query is constant.
+            return query_start
+        index = base_string.find(_BASE_STRING_PARAM_SEPARATOR + name,
+                                 query_start)
+        if index != -1:
+            index += len(_BASE_STRING_PARAM_SEPARATOR)
+            if not prefix_length or index < prefix_length:
+                prefix_length = index
+    return prefix_length
 
 
 def verify_hmac_sha1_signature(signature,
@@ -253,59 +915,340 @@ def verify_hmac_sha1_signature(signature,
             (whether signature matches (boolean),
             error message (None if it succeeded)).
     """
-    key = _generate_plaintext_signature(client_shared_secret,
-                                        token_shared_secret)
-    check_ok = (signature == hmac_sha1_base64_digest(key, base_string))
+    check_ok = (signature == generate_hmac_sha1_signature(base_string,
+                                                          client_shared_secret,
+                                                          token_shared_secret))
     if check_ok:
         err = None
     else:
         err = "Invalid signature"
 
     if not check_ok and debug:
-        # Try to find out why it didn't match.
-        # We need to help the poor human souls on the other
-        # side of this mess who are trying to debug their OAuth clients.
-        # This is not going to detect 100% of the cases, because it is
-        # too easy to screw up on the client side. Anything could be wrong.
-        # We're just trying to find out some common problems.
-
-        # Assume correct base string but detect incorrect signature encoding.
-        key = _generate_plaintext_signature(client_shared_secret,
-                                            token_shared_secret,
-                                            _percent_encode=False)
-        if signature == hmac_sha1_base64_digest(key, base_string):
-            return check_ok, "Invalid signature: signature elements " \
-                       "are not percent-encoded properly"
-
-        # Assume correct base string but detect missing ampersands in signature.
-        if client_shared_secret and not token_shared_secret:
-            key = percent_encode(client_shared_secret) + SYMBOL_AMPERSAND
-            if signature == hmac_sha1_base64_digest(key, base_string):
-                return check_ok, "Invalid signature: missing ampersand `&` " \
-                           "after client shared secret in signature"
-        elif not client_shared_secret and token_shared_secret:
-            key = SYMBOL_AMPERSAND + percent_encode(token_shared_secret)
-            if signature == hmac_sha1_base64_digest(key, base_string):
-                return check_ok, "Invalid signature: missing ampersand `&` "\
-                           "before token secret in signature"
-        elif not client_shared_secret and not token_shared_secret:
-            key = SYMBOL_AMPERSAND
-            if signature == hmac_sha1_base64_digest(key, base_string):
-                return check_ok, "Invalid signature: missing ampersand `&` "\
-                           "without secrets in signature"
-        elif client_shared_secret and token_shared_secret:
-            key = percent_encode(client_shared_secret) + \
-                  SYMBOL_AMPERSAND + percent_encode(token_shared_secret)
-            if signature == hmac_sha1_base64_digest(key, base_string):
-                return check_ok, "Invalid signature: missing ampersand `&` "\
-                           "between signature secrets"
-
-        # Assume incorrect base string
-        return check_ok, "Invalid signature: check base string?"
+        return check_ok, _diagnose_hmac_sha1_signature(signature,
+                                                       base_string,
+                                                       client_shared_secret,
+                                                       token_shared_secret)
 
     return check_ok, err
 
 
+def _diagnose_hmac_sha1_signature(signature,
+                                  base_string,
+                                  client_shared_secret,
+                                  token_shared_secret=None):
+    """
+    Tries to find out why an HMAC-SHA1 signature did not match.
+
+    This recomputes up to three more HMACs, so only call it for failed
+    signatures and keep it off the hot path.
+
+    :param signature:
+        The signature that failed verification.
+    :param base_string:
+        The base string.
+    :param client_shared_secret:
+        Client (consumer) shared secret.
+    :param token_shared_secret:
+        Token/temporary credentials shared secret if available.
+    :returns:
+        A message describing the likely cause.
+    """
+    return _diagnose_with_keys(
+        signature, base_string,
+        _hmac_sha1_diagnosis_keys(client_shared_secret, token_shared_secret))
+
+
+def _hmac_sha1_diagnosis_keys(client_shared_secret, token_shared_secret=None):
+    """
+    Keys HMAC-SHA1 objects with the commonly mistaken variants of the
+    signing key.
+
+    Only the SHA-1 states of the padded keys are kept, which costs two
+    SHA-1 blocks per key. The base string is fed later, and only if a
+    diagnosis is asked for.
+
+    Keyed states can sign any message under their key, so they are as
+    sensitive as the key itself. Variants that equal the real signing key
+    are left out: the signature has already failed to verify with that
+    key, so they explain nothing, and a keyed state for them could forge
+    valid signatures. The states kept sign only with keys that the server
+    does not accept.
+
+    :param client_shared_secret:
+        Client (consumer) shared secret.
+    :param token_shared_secret:
+        Token/temporary credentials shared secret if available.
+    :returns:
+        A list of ``((inner, outer), message)`` pairs, where ``inner`` and
+        ``outer`` are the HMAC-SHA1 hash objects keyed with that variant.
+    """
+    # Try to find out why it didn't match.
+    # We need to help the poor human souls on the other
+    # side of this mess who are trying to debug their OAuth clients.
+    # This is not going to detect 100% of the cases, because it is
+    # too easy to screw up on the client side. Anything could be wrong.
+    # We're just trying to find out some common problems.
+
+    # Assume correct base string but detect incorrect signature encoding.
+    keys = [(_generate_plaintext_signature(client_shared_secret,
+                                           token_shared_secret,
+                                           _percent_encode=False),
+             "Invalid signature: signature elements "
+             "are not percent-encoded properly")]
+
+    # Assume correct base string but detect missing ampersands in signature.
+    if client_shared_secret and not token_shared_secret:
+        keys.append((percent_encode(client_shared_secret) + SYMBOL_AMPERSAND,
+                     "Invalid signature: missing ampersand `&` "
+                     "after client shared secret in signature"))
+    elif not client_shared_secret and token_shared_secret:
+        keys.append((SYMBOL_AMPERSAND + percent_encode(token_shared_secret),
+                     "Invalid signature: missing ampersand `&` "
+                     "before token secret in signature"))
+    elif not client_shared_secret and not token_shared_secret:
+        keys.append((SYMBOL_AMPERSAND,
+                     "Invalid signature: missing ampersand `&` "
+                     "without secrets in signature"))
+    elif client_shared_secret and token_shared_secret:
+        keys.append((percent_encode(client_shared_secret) +
+                     SYMBOL_AMPERSAND + percent_encode(token_shared_secret),
+                     "Invalid signature: missing ampersand `&` "
+                     "between signature secrets"))
+    signing_key = _generate_plaintext_signature(client_shared_secret,
+                                                token_shared_secret)
+    return [(_hmac_sha1_pads(key), message) for key, message in keys
+            if key != signing_key]
+
+
+def _hmac_sha1_pads(key):
+    """
+    Keys the inner and outer SHA-1 hashes of HMAC-SHA1 (RFC 2104).
+
+    :param key:
+        The HMAC key.
+    :returns:
+        A tuple of the inner and outer SHA-1 hash objects.
+    """
+    if len(key) > _SHA1_BLOCK_SIZE:
+        key = hashlib.sha1(key).digest()
+    key = key.ljust(_SHA1_BLOCK_SIZE, b("\x00"))
+    return (hashlib.sha1(key.translate(hmac.trans_36)),
+            hashlib.sha1(key.translate(hmac.trans_5C)))
+
+
+def _diagnose_with_keys(signature, base_string, keys):
+    """
+    Works out why an HMAC-SHA1 signature did not match from the keyed
+    hash objects returned by :func:`_hmac_sha1_diagnosis_keys`.
+
+    :param signature:
+        The signature that failed verification.
+    :param base_string:
+        The base string.
+    :param keys:
+        A list of ``((inner, outer), message)`` pairs.
+    :returns:
+        A message describing the likely cause.
+    """
+    for (inner, outer), message in keys:
+        inner = inner.copy()
+        inner.update(base_string)
+        outer = outer.copy()
+        outer.update(inner.digest())
+        if signature == _crypto.base64_encode(outer.digest()):
+            return message
+
+    # Assume incorrect base string
+    return "Invalid signature: check base string?"
+
+
+class _LazyDiagnosis(object):
+    """
+    Failure message of a signature verification that works out the likely
+    cause only when it is first converted to a string.
+
+    Holds SHA-1 states keyed with the mistaken variants of the signing key
+    (see :func:`_hmac_sha1_diagnosis_keys`), never the shared secrets or a
+    state keyed with the real signing key. The states are dropped once the
+    message has been worked out.
+    """
+    def __init__(self, signature, base_string, keys):
+        self._args = (signature, base_string, keys)
+        self._message = None
+
+    @property
+    def message(self):
+        """The diagnosis message."""
+        if self._message is None:
+            self._message = _diagnose_with_keys(*self._args)
+            self._args = None
+        return self._message
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return "<%s: %r>" % (self.__class__.__name__, self.message)
+
+
+class HmacSha1Verifier(object):
+    """
+    Verifies HMAC-SHA1 signatures with configurable failure diagnostics.
+
+    :meth:`verify` returns the same ``(check_ok, error)`` tuple as
+    :func:`verify_hmac_sha1_signature`. A failed check costs no more than a
+    successful one; the diagnosis depends on ``diagnostics``:
+
+    ``"off"``
+        The error is always ``"Invalid signature"``.
+    ``"lazy"``
+        The error is an object whose string value is the diagnosis. It is
+        worked out only when the error is converted to a string, for
+        example when it is logged.
+    ``"sampled"``
+        The error is ``"Invalid signature"``. One in ``sample_rate``
+        failures is put in a bounded queue and diagnosed by a background
+        thread, which passes the message to ``callback``. Failures that
+        arrive while the queue is full are not diagnosed.
+
+    :param diagnostics:
+        ``"off"``, ``"lazy"`` (default) or ``"sampled"``.
+    :param sample_rate:
+        Diagnose one in this many failures in ``"sampled"`` mode.
+    :param queue_size:
+        Maximum number of failures waiting to be diagnosed.
+    :param callback:
+        Called from the background thread as
+        ``callback(message, signature, base_string)``. Logs a warning
+        by default.
+    """
+    DIAGNOSTICS_OFF = "off"
+    DIAGNOSTICS_LAZY = "lazy"
+    DIAGNOSTICS_SAMPLED = "sampled"
+
+    def __init__(self, diagnostics=DIAGNOSTICS_LAZY, sample_rate=100,
+                 queue_size=100, callback=None):
+        if diagnostics not in (self.DIAGNOSTICS_OFF,
+                               self.DIAGNOSTICS_LAZY,
+                               self.DIAGNOSTICS_SAMPLED):
+            raise ValueError("Unknown diagnostics mode: got `%r`" %
+                             diagnostics)
+        if sample_rate < 1:
+            raise ValueError("sample_rate must be a positive integer: "
+                             "got `%r`" % sample_rate)
+        self._diagnostics = diagnostics
+        self._sample_rate = sample_rate
+        self._failures = 0
+        self._queue_size = queue_size
+        self._queue = queue.Queue(queue_size)
+        self._callback = callback or self._log_diagnosis
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    @property
+    def diagnostics(self):
+        """The diagnostics mode."""
+        return self._diagnostics
+
+    def verify(self, signature, base_string,
+               client_shared_secret, token_shared_secret=None):
+        """
+        Verifies an HMAC-SHA1 signature for a base string.
+
+        :see: HMAC-SHA1 (http://tools.ietf.org/html/rfc5849#section-3.4.2)
+        :param signature:
+            The signature to verify.
+        :param base_string:
+            The base string.
+        :param client_shared_secret:
+            Client (consumer) shared secret.
+        :param token_shared_secret:
+            Token/temporary credentials shared secret if available.
+        :returns:
+            A tuple of
+                (whether signature matches (boolean),
+                error (None if it succeeded)).
+        """
+        if signature == generate_hmac_sha1_signature(base_string,
+                                                     client_shared_secret,
+                                                     token_shared_secret):
+            return True, None
+        if self._diagnostics == self.DIAGNOSTICS_LAZY:
+            return False, _LazyDiagnosis(
+                signature, base_string,
+                _hmac_sha1_diagnosis_keys(client_shared_secret,
+                                          token_shared_secret))
+        if self._diagnostics == self.DIAGNOSTICS_SAMPLED and \
+           self._sample():
+            self._submit((signature, base_string,
+                          _hmac_sha1_diagnosis_keys(client_shared_secret,
+                                                    token_shared_secret)))
+        return False, "Invalid signature"
+
+    def _sample(self):
+        """Counts a failure and tells whether it should be diagnosed."""
+        self._thread_lock.acquire()
+        try:
+            self._failures += 1
+            return self._failures % self._sample_rate == 0
+        finally:
+            self._thread_lock.release()
+
+    def _submit(self, item):
+        """Queues a failure for diagnosis without ever blocking."""
+        self._thread_lock.acquire()
+        try:
+            if self._thread is None:
+                # Every thread has its own queue, so that the sentinel sent
+                # by join() reaches the thread it is meant for.
+                self._queue = queue.Queue(self._queue_size)
+                thread = threading.Thread(target=self._diagnose_queued,
+                                          args=(self._queue,))
+                thread.daemon = True
+                thread.start()
+                self._thread = thread
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                pass
+        finally:
+            self._thread_lock.release()
+
+    def _diagnose_queued(self, items):
+        """Background thread loop that diagnoses queued failures."""
+        while True:
+            item = items.get()
+            if item is None:
+                break
+            try:
+                self._callback(_diagnose_with_keys(*item), item[0], item[1])
+            except Exception:
+                logging.exception("HMAC-SHA1 signature diagnosis failed")
+
+    def join(self):
+        """
+        Waits until every queued failure has been diagnosed and stops the
+        background thread. A later sampled failure starts a new one.
+        """
+        self._thread_lock.acquire()
+        try:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                # The thread drains the queue without the lock, so this
+                # cannot deadlock if the queue is full.
+                self._queue.put(None)
+        finally:
+            self._thread_lock.release()
+        if thread is not None:
+            thread.join()
+
+    @classmethod
+    def _log_diagnosis(cls, message, signature, base_string):
+        """Default diagnosis callback."""
+        logging.warning("%s -- signature `%r` for base string `%r`",
+                        message, signature, base_string)
+
+
 def generate_rsa_sha1_signature(base_string,
                                 client_private_key,
                                 *args, **kwargs):
@@ -317,14 +1260,14 @@ def generate_rsa_sha1_signature(base_string,
     :param base_string:
         Base string.
     :param client_private_key:
-        PEM-encoded RSA private key.
+        PEM-encoded RSA private key or a private key object previously
+        parsed with :func:`mom.security.rsa.parse_private_key`.
     :returns:
         RSA-SHA1 signature.
     """
-    from mom.security.rsa import parse_private_key
-
-    key = parse_private_key(client_private_key)
-    return base64_encode(key.pkcs1_v1_5_sign(sha1_digest(base_string)))
+    key = _parse_rsa_key(client_private_key, _RSA_PRIVATE_KEY)
+    digest = _crypto.sha1_digest(base_string)
+    return _crypto.base64_encode(key.pkcs1_v1_5_sign(digest))
 
 
 def verify_rsa_sha1_signature(signature,
@@ -341,15 +1284,315 @@ def verify_rsa_sha1_signature(signature,
     :param signature:
         RSA-SHA1 OAuth signature.
     :param client_certificate:
-        PEM-encoded X.509 certificate or RSA public key.
+        PEM-encoded X.509 certificate or RSA public key, or a public key
+        object previously parsed with :func:`mom.security.rsa.parse_public_key`.
     :returns:
         ``True`` if verified to be correct; ``False`` otherwise.
     """
-    from mom.security.rsa import parse_public_key
+    key = _parse_rsa_key(client_certificate, _RSA_PUBLIC_KEY)
+    return key.pkcs1_v1_5_verify(_crypto.sha1_digest(base_string),
+                                 _crypto.base64_decode(signature))
+
+
+def verify_many(requests, pool=None):
+    """
+    Verifies the signatures of many requests.
+
+    Requests are grouped by signature method and key so that every HMAC key
+    schedule is set up, and every RSA key parsed, only once per batch.
+    Unlike :func:`verify_hmac_sha1_signature`, no error messages are
+    produced; a malformed signature simply fails verification.
+
+    ::
+
+        verify_many([
+            (signature, base_string, (client_secret, token_secret),
+             SIGNATURE_METHOD_HMAC_SHA1),
+            (signature, base_string, client_certificate,
+             SIGNATURE_METHOD_RSA_SHA1),
+        ]) -> [True, False]
+
+    :param requests:
+        An iterable of ``(signature, base_string, key, signature_method)``
+        tuples. ``key`` is a ``(client_shared_secret, token_shared_secret)``
+        pair for the HMAC methods and PLAINTEXT, and a PEM-encoded X.509
+        certificate, RSA public key or parsed public key for RSA-SHA1.
+        Methods added with :func:`register_signature_method` receive the
+        ``key`` as given.
+    :param pool:
+        Optional thread or process pool (anything with a ``map(func,
+        iterable)`` method, such as :class:`multiprocessing.pool.ThreadPool`)
+        across which RSA-SHA1 verification is spread.
+    :returns:
+        A list of booleans in the order of ``requests``.
+    """
+    requests = list(requests)
+    results = [False] * len(requests)
+    groups = {}
+    for index, (_, _, key, signature_method) in enumerate(requests):
+        if signature_method not in SIGNATURE_METHOD_REGISTRY:
+            raise InvalidSignatureMethodError(
+                "unsupported signature method: %r" % signature_method)
+        if signature_method in _HMAC_DIGESTS or \
+           signature_method == PLAINTEXT or isinstance(key, list):
+            key = tuple(key)
+        group_key = (signature_method, key)
+        if group_key in groups:
+            groups[group_key].append(index)
+        else:
+            groups[group_key] = [index]
+
+    rsa_tasks = []
+    rsa_indices = []
+    for (signature_method, key), indices in groups.items():
+        if signature_method in _HMAC_DIGESTS:
+            digestmod, cache = _HMAC_DIGESTS[signature_method]
+            keyed_context = _hmac_context(digestmod, cache, *key)
+            for index in indices:
+                context = keyed_context.copy()
+                context.update(requests[index][1])
+                results[index] = requests[index][0] == \
+                    _crypto.base64_encode(context.digest())
+        elif signature_method == PLAINTEXT:
+            expected = _generate_plaintext_signature(*key)
+            for index in indices:
+                results[index] = requests[index][0] == expected
+        elif signature_method != RSA_SHA1:
+            verify_func = SIGNATURE_METHOD_REGISTRY[signature_method][1]
+            for index in indices:
+                results[index] = bool(verify_func(requests[index][0],
+                                                  requests[index][1],
+                                                  key))
+        else:
+            if pool is None:
+                # Parse once for the whole group.
+                key = _parse_rsa_key(key, _RSA_PUBLIC_KEY)
+            for index in indices:
+                rsa_tasks.append((requests[index][0], requests[index][1], key))
+                rsa_indices.append(index)
+
+    if rsa_tasks:
+        if pool is None:
+            rsa_results = map(_verify_rsa_sha1, rsa_tasks)
+        else:
+            rsa_results = pool.map(_verify_rsa_sha1, rsa_tasks)
+        for index, result in zip(rsa_indices, rsa_results):
+            results[index] = result
+    return results
+
+
+def _verify_rsa_sha1(args):
+    """
+    Verifies an RSA-SHA1 signature without raising for malformed input.
+
+    :param args:
+        A tuple of (signature, base string, certificate or public key).
+    :returns:
+        ``True`` if verified to be correct; ``False`` otherwise.
+    """
+    signature, base_string, client_certificate = args
+    try:
+        return bool(verify_rsa_sha1_signature(signature,
+                                              base_string,
+                                              client_certificate))
+    except (TypeError, ValueError):
+        return False
+
+
+def invalidate_rsa_key(encoded_key=None):
+    """
+    Removes a parsed RSA key from the key cache. Use this when a client
+    rotates its key or certificate.
+
+    :param encoded_key:
+        PEM-encoded RSA private key, public key or X.509 certificate.
+        If ``None``, all cached keys are removed.
+    :returns:
+        ``True`` if any cached key was removed; ``False`` otherwise.
+    """
+    if encoded_key is None:
+        removed = len(RSA_KEY_CACHE) > 0
+        RSA_KEY_CACHE.clear()
+        return removed
+    digest = _crypto.sha1_digest(utf8_encode_if_unicode(encoded_key))
+    removed_private = RSA_KEY_CACHE.invalidate((_RSA_PRIVATE_KEY, digest))
+    removed_public = RSA_KEY_CACHE.invalidate((_RSA_PUBLIC_KEY, digest))
+    removed_crt = RSA_KEY_CACHE.invalidate((_RSA_CRT_PRIVATE_KEY, digest))
+    return removed_private or removed_public or removed_crt
+
+
+def generate_rsa_sha1_crt_signature(base_string,
+                                    client_private_key,
+                                    *args, **kwargs):
+    """
+    Calculates an RSA-SHA1 OAuth signature using the Chinese Remainder
+    Theorem.
+
+    The CRT exponents are derived once per cached key and the private-key
+    operation is blinded. The result is identical to that of
+    :func:`generate_rsa_sha1_signature`.
+
+    :see: RSA-SHA1 (http://tools.ietf.org/html/rfc5849#section-3.4.3)
+
+    :param base_string:
+        Base string.
+    :param client_private_key:
+        PEM-encoded RSA private key or a private key object previously
+        parsed with :func:`mom.security.rsa.parse_private_key`.
+    :returns:
+        RSA-SHA1 signature.
+    """
+    key = _parse_rsa_key(client_private_key, _RSA_CRT_PRIVATE_KEY)
+    digest = _crypto.sha1_digest(base_string)
+    return _crypto.base64_encode(key.pkcs1_v1_5_sign(digest))
+
+
+def _bytes_to_uint(raw_bytes):
+    """Converts big-endian bytes into an unsigned integer."""
+    return int(binascii.hexlify(raw_bytes) or b("0"), 16)
 
-    key = parse_public_key(client_certificate)
-    return key.pkcs1_v1_5_verify(sha1_digest(base_string),
-                                 base64_decode(signature))
+
+def _uint_to_bytes(number):
+    """Converts an unsigned integer into big-endian bytes without leading
+    zero bytes."""
+    hex_string = "%x" % number
+    if len(hex_string) % 2:
+        hex_string = "0" + hex_string
+    return binascii.unhexlify(hex_string.encode("ascii"))
+
+
+def _inverse_mod(number, modulus):
+    """Calculates the modular multiplicative inverse of a number."""
+    x0, x1, a, m = 1, 0, number % modulus, modulus
+    while m:
+        q = a // m
+        a, m = m, a - q * m
+        x0, x1 = x1, x0 - q * x1
+    if a != 1:
+        raise ValueError("%r has no inverse modulo %r" % (number, modulus))
+    return x0 % modulus
+
+
+class _RsaCrtPrivateKey(object):
+    """
+    RSA private key that signs using CRT exponents and blinding.
+
+    Produces the same signature bytes as the ``pkcs1_v1_5_sign`` method of
+    :mod:`mom.security.rsa` private keys.
+
+    :param key_info:
+        Dictionary with the ``modulus``, ``publicExponent``,
+        ``privateExponent``, ``prime1`` and ``prime2`` key components as
+        returned by the ``key_info`` property of a parsed private key.
+    """
+    def __init__(self, key_info):
+        self._n = n = key_info["modulus"]
+        self._e = key_info["publicExponent"]
+        d = key_info["privateExponent"]
+        self._p = p = key_info["prime1"]
+        self._q = q = key_info["prime2"]
+        self._dp = d % (p - 1)
+        self._dq = d % (q - 1)
+        self._qinv = _inverse_mod(q, p)
+        self._size = len(_uint_to_bytes(n))
+        self._lock = threading.Lock()
+        self._blinding = self._new_blinding()
+
+    def _new_blinding(self):
+        """Generates a fresh (r ** e, r ** -1) blinding pair modulo n."""
+        n = self._n
+        while True:
+            r = _bytes_to_uint(os.urandom(self._size)) % n
+            try:
+                return pow(r, self._e, n), _inverse_mod(r, n)
+            except ValueError:
+                continue
+
+    def _next_blinding(self):
+        """Returns the current blinding pair and squares it for the next
+        operation, which is much cheaper than generating a new one."""
+        n = self._n
+        self._lock.acquire()
+        try:
+            blind, unblind = self._blinding
+            self._blinding = (blind * blind % n, unblind * unblind % n)
+        finally:
+            self._lock.release()
+        return blind, unblind
+
+    def _private_operation(self, message):
+        """Calculates ``message ** d mod n`` via CRT with blinding."""
+        n = self._n
+        blind, unblind = self._next_blinding()
+        blinded = message * blind % n
+        m1 = pow(blinded % self._p, self._dp, self._p)
+        m2 = pow(blinded % self._q, self._dq, self._q)
+        h = self._qinv * (m1 - m2) % self._p
+        signature = (m2 + h * self._q) * unblind % n
+        # Guard against faults in the CRT computation, which would leak
+        # the factors of the modulus.
+        if pow(signature, self._e, n) != message:
+            raise ValueError("RSA CRT signature verification failed")
+        return signature
+
+    def pkcs1_v1_5_sign(self, digest):
+        """
+        Signs a SHA-1 digest using EMSA-PKCS1-v1_5 encoding.
+
+        :param digest:
+            SHA-1 digest byte string.
+        :returns:
+            Signature byte string.
+        """
+        padding = b("\xff") * (self._size - len(_SHA1_DIGEST_INFO) -
+                               len(digest) - 3)
+        encoded = b("\x00\x01") + padding + b("\x00") + \
+                  _SHA1_DIGEST_INFO + digest
+        return _uint_to_bytes(
+            self._private_operation(_bytes_to_uint(encoded)))
+
+
+def _parse_rsa_key(encoded_key, key_type, _cache=RSA_KEY_CACHE):
+    """
+    Parses a PEM-encoded RSA key, reusing a previously parsed key object
+    for the same encoded key.
+
+    :param encoded_key:
+        PEM-encoded key or certificate. Any other object is assumed to be
+        an already-parsed key and is returned as is, except that parsed
+        private keys are converted to CRT keys cached by modulus.
+    :param key_type:
+        ``_RSA_PRIVATE_KEY``, ``_RSA_CRT_PRIVATE_KEY`` or
+        ``_RSA_PUBLIC_KEY``.
+    :returns:
+        Parsed key object.
+    """
+    if not is_bytes_or_unicode(encoded_key):
+        if key_type == _RSA_CRT_PRIVATE_KEY and \
+           not isinstance(encoded_key, _RsaCrtPrivateKey):
+            key_info = encoded_key.key_info
+            cache_key = (key_type, key_info["modulus"])
+            key = _cache.get(cache_key)
+            if key is None:
+                key = _RsaCrtPrivateKey(key_info)
+                _cache.set(cache_key, key)
+            return key
+        return encoded_key
+    cache_key = (key_type,
+                 _crypto.sha1_digest(utf8_encode_if_unicode(encoded_key)))
+    key = _cache.get(cache_key)
+    if key is None:
+        from mom.security.rsa import parse_private_key, parse_public_key
+
+        if key_type == _RSA_PRIVATE_KEY:
+            key = parse_private_key(encoded_key)
+        elif key_type == _RSA_CRT_PRIVATE_KEY:
+            key = _RsaCrtPrivateKey(
+                _parse_rsa_key(encoded_key, _RSA_PRIVATE_KEY).key_info)
+        else:
+            key = parse_public_key(encoded_key)
+        _cache.set(cache_key, key)
+    return key
 
 
 def generate_plaintext_signature(base_string,
@@ -407,6 +1650,303 @@ def _generate_plaintext_signature(client_shared_secret,
                                       token_shared_secret))
 
 
+def _verify_hmac_sha1(signature, base_string, key):
+    """Registry verification function for HMAC-SHA1."""
+    return verify_hmac_sha1_signature(signature, base_string, *key)[0]
+
+
+def _verify_hmac_sha256(signature, base_string, key):
+    """Registry verification function for HMAC-SHA256."""
+    return verify_hmac_sha256_signature(signature, base_string, *key)[0]
+
+
+def _verify_hmac_sha512(signature, base_string, key):
+    """Registry verification function for HMAC-SHA512."""
+    return verify_hmac_sha512_signature(signature, base_string, *key)[0]
+
+
+def _verify_plaintext(signature, base_string, key):
+    """Registry verification function for PLAINTEXT."""
+    return signature == _generate_plaintext_signature(*key)
+
+
+def _verify_rsa_sha1_registry(signature, base_string, key):
+    """Registry verification function for RSA-SHA1."""
+    return _verify_rsa_sha1((signature, base_string, key))
+
+
+#: Signing and verification functions indexed by signature method.
+#: Change it with :func:`register_signature_method` and
+#: :func:`unregister_signature_method`.
+SIGNATURE_METHOD_REGISTRY = {
+    HMAC_SHA1: (generate_hmac_sha1_signature, _verify_hmac_sha1),
+    HMAC_SHA256: (generate_hmac_sha256_signature, _verify_hmac_sha256),
+    HMAC_SHA512: (generate_hmac_sha512_signature, _verify_hmac_sha512),
+    RSA_SHA1: (generate_rsa_sha1_signature, _verify_rsa_sha1_registry),
+    PLAINTEXT: (generate_plaintext_signature, _verify_plaintext),
+}
+
+
+def register_signature_method(signature_method, sign_func, verify_func):
+    """
+    Adds a signature method to the registry or replaces one.
+
+    :func:`verify_many` keeps its batched implementation of the built-in
+    methods even if they are replaced.
+
+    :param signature_method:
+        The ``oauth_signature_method`` value, for example
+        ``b("HMAC-SHA256")``.
+    :param sign_func:
+        A function ``sign_func(base_string, client_key, token_key)`` that
+        returns the signature. ``client_key`` is the client shared secret or
+        private key.
+    :param verify_func:
+        A function ``verify_func(signature, base_string, key)`` that returns
+        ``True`` if the signature is valid. ``key`` is the same as the key
+        in :func:`verify_many` requests.
+    """
+    SIGNATURE_METHOD_REGISTRY[signature_method] = (sign_func, verify_func)
+
+
+def unregister_signature_method(signature_method):
+    """
+    Removes a signature method from the registry.
+
+    :param signature_method:
+        The ``oauth_signature_method`` value.
+    :returns:
+        ``True`` if the method was registered; ``False`` otherwise.
+    """
+    return SIGNATURE_METHOD_REGISTRY.pop(signature_method, None) is not None
+
+
+def get_signature_method(signature_method):
+    """
+    Looks up a signature method in the registry.
+
+    :param signature_method:
+        The ``oauth_signature_method`` value.
+    :returns:
+        A tuple of (signing function, verification function).
+    :raises InvalidSignatureMethodError:
+        If the method is not registered.
+    """
+    try:
+        return SIGNATURE_METHOD_REGISTRY[signature_method]
+    except KeyError:
+        raise InvalidSignatureMethodError(
+            "unsupported signature method: %r" % (signature_method,))
+
+
+def verify_signature(signature, base_string, key, signature_method):
+    """
+    Verifies a signature with any registered signature method.
+
+    :param signature:
+        The signature to verify.
+    :param base_string:
+        The base string.
+    :param key:
+        A ``(client_shared_secret, token_shared_secret)`` pair for the HMAC
+        methods and PLAINTEXT, and a PEM-encoded X.509 certificate, RSA
+        public key or parsed public key for RSA-SHA1.
+    :param signature_method:
+        The ``oauth_signature_method`` value.
+    :returns:
+        ``True`` if verified to be correct; ``False`` otherwise.
+    :raises InvalidSignatureMethodError:
+        If the method is not registered.
+    """
+    verify_func = get_signature_method(signature_method)[1]
+    return bool(verify_func(signature, base_string, key))
+
+
+def generate_chunked_signature(sign_func, chunks,
+                               client_shared_secret, token_shared_secret=None,
+                               prefix_key=None):
+    """
+    Signs a base string given as a sequence of chunks, such as the one
+    produced by :meth:`FormBodyBaseStringBuilder.iter_chunks`.
+
+    The HMAC signature functions of this module feed the chunks to the
+    digest one at a time. Signature functions listed in
+    :data:`SHA1_DIGEST_SIGNERS`, such as RSA-SHA1, are handed only the
+    SHA-1 digest of the chunks. PLAINTEXT signatures do not need the base
+    string at all. Any other signature function is called with the joined
+    base string, which is then held in memory whole.
+
+    :param sign_func:
+        The signature function, for example
+        :func:`generate_hmac_sha1_signature`.
+    :param chunks:
+        An iterable of byte strings that make up the base string.
+    :param client_shared_secret:
+        Client (consumer) shared secret, or the RSA private key for
+        RSA-SHA1.
+    :param token_shared_secret:
+        Token/temporary credentials shared secret if available.
+    :param prefix_key:
+        If specified, HMAC-SHA1 signatures reuse the HMAC state that
+        :func:`generate_hmac_sha1_prefix_signature` caches for this key,
+        fed the constant prefix of the first chunk.
+    :returns:
+        The signature.
+    """
+    if prefix_key is not None and sign_func is generate_hmac_sha1_signature:
+        chunks = iter(chunks)
+        first_chunk = SYMBOL_EMPTY_BYTES
+        for first_chunk in chunks:
+            break
+        context = _hmac_sha1_prefix_context(first_chunk,
+                                            client_shared_secret,
+                                            token_shared_secret,
+                                            prefix_key)
+        for chunk in chunks:
+            context.update(chunk)
+        return _crypto.base64_encode(context.digest())
+    signature_method = _CHUNKED_HMAC_METHODS.get(sign_func)
+    if signature_method is not None:
+        digestmod, cache = _HMAC_DIGESTS[signature_method]
+        context = _hmac_context(digestmod, cache,
+                                client_shared_secret, token_shared_secret)
+        for chunk in chunks:
+            context.update(chunk)
+        return _crypto.base64_encode(context.digest())
+    sign_digest = SHA1_DIGEST_SIGNERS.get(sign_func)
+    if sign_digest is not None:
+        context = hashlib.sha1()
+        for chunk in chunks:
+            context.update(chunk)
+        return sign_digest(context.digest(),
+                           client_shared_secret, token_shared_secret)
+    elif sign_func is generate_plaintext_signature:
+        return _generate_plaintext_signature(client_shared_secret,
+                                             token_shared_secret)
+    return sign_func(SYMBOL_EMPTY_BYTES.join(chunks),
+                     client_shared_secret, token_shared_secret)
+
+
+# Signature functions that generate_chunked_signature() feeds chunk by chunk.
+_CHUNKED_HMAC_METHODS = {
+    generate_hmac_sha1_signature: HMAC_SHA1,
+    generate_hmac_sha256_signature: HMAC_SHA256,
+    generate_hmac_sha512_signature: HMAC_SHA512,
+}
+
+
+def _sign_rsa_sha1_digest(digest, client_private_key, *args, **kwargs):
+    """Signs the SHA-1 digest of a base string with RSA-SHA1."""
+    key = _parse_rsa_key(client_private_key, _RSA_PRIVATE_KEY)
+    return _crypto.base64_encode(key.pkcs1_v1_5_sign(digest))
+
+
+def _sign_rsa_sha1_crt_digest(digest, client_private_key, *args, **kwargs):
+    """Signs the SHA-1 digest of a base string with RSA-SHA1 using CRT."""
+    key = _parse_rsa_key(client_private_key, _RSA_CRT_PRIVATE_KEY)
+    return _crypto.base64_encode(key.pkcs1_v1_5_sign(digest))
+
+
+#: Functions ``sign_digest(digest, client_key, token_key)`` that sign the
+#: SHA-1 digest of a base string, indexed by the signature function they
+#: stand in for. :func:`generate_chunked_signature` hashes the chunks itself
+#: and passes only the digest to these, so that replacement signers such as
+#: :class:`pyoauth.oauth1.pool.RsaSha1SigningPool` keep memory bounded too.
+SHA1_DIGEST_SIGNERS = {
+    generate_rsa_sha1_signature: _sign_rsa_sha1_digest,
+    generate_rsa_sha1_crt_signature: _sign_rsa_sha1_crt_digest,
+}
+
+
+# Bytes read from a file-like body at a time while hashing it.
+_BODY_HASH_CHUNK_SIZE = 65536
+# Spooled bodies larger than this many bytes move to a temporary file.
+BODY_SPOOL_MAX_MEMORY = 1 << 20
+
+
+def generate_body_hash(body, chunk_size=_BODY_HASH_CHUNK_SIZE,
+                       digestmod=hashlib.sha1):
+    """
+    Calculates the ``oauth_body_hash`` value of an entity body.
+
+    :see: OAuth Request Body Hash
+        (http://oauth.googlecode.com/svn/spec/ext/body_hash/1.0/oauth-bodyhash.html)
+    :param body:
+        A byte string, :class:`bytearray` or :class:`memoryview`; a file
+        object or :class:`mmap.mmap`, read from its current position and
+        then moved back to it; or an iterable of byte strings, which is
+        consumed.
+    :param chunk_size:
+        Bytes read from a file-like body at a time. Default 64 KiB.
+    :param digestmod:
+        The :mod:`hashlib` constructor of the digest. Default SHA-1, as
+        required for HMAC-SHA1 and RSA-SHA1 signatures.
+    :returns:
+        Base64-encoded digest of the body.
+    """
+    context = digestmod()
+    if hasattr(body, "read"):
+        position = _body_position(body)
+        read = body.read
+        chunk = read(chunk_size)
+        while chunk:
+            context.update(chunk)
+            chunk = read(chunk_size)
+        if position is not None:
+            body.seek(position)
+    elif is_bytes_or_unicode(body) or isinstance(body, BUFFER_TYPES):
+        context.update(utf8_encode_if_unicode(body))
+    else:
+        for chunk in body:
+            context.update(chunk)
+    return _crypto.base64_encode(context.digest())
+
+
+def spool_body(body, max_memory=BODY_SPOOL_MAX_MEMORY,
+               chunk_size=_BODY_HASH_CHUNK_SIZE, digestmod=hashlib.sha1):
+    """
+    Copies a body that can only be read once into a spooled temporary
+    file and calculates its ``oauth_body_hash`` value on the way.
+
+    :param body:
+        An iterable of byte strings or a file object that cannot seek, such
+        as a pipe or socket.
+    :param max_memory:
+        The copy is kept in memory up to this many bytes and moved to a
+        temporary file beyond. Default 1 MiB.
+    :param chunk_size:
+        Bytes read from a file object at a time. Default 64 KiB.
+    :param digestmod:
+        The :mod:`hashlib` constructor of the digest. Default SHA-1.
+    :returns:
+        A tuple of (copy rewound to its start, body hash, length in bytes).
+    """
+    if hasattr(body, "read"):
+        read = body.read
+        body = iter(lambda: read(chunk_size), SYMBOL_EMPTY_BYTES)
+    context = digestmod()
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    length = 0
+    for chunk in body:
+        context.update(chunk)
+        spool.write(chunk)
+        length += len(chunk)
+    spool.seek(0)
+    return spool, _crypto.base64_encode(context.digest()), length
+
+
+def _body_position(body):
+    """
+    Returns the position of a file-like body or ``None`` if it cannot seek.
+    """
+    try:
+        position = body.tell()
+        body.seek(position)
+        return position
+    except (AttributeError, IOError, OSError, ValueError):
+        return None
+
+
 def generate_base_string(method, url, oauth_params):
     """
     Calculates a signature base string based on the URL, method, and
@@ -421,9 +1961,10 @@ def generate_base_string(method, url, oauth_params):
     :param method:
         HTTP request method.
     :param url:
-        The URL. If this includes a query string, query parameters are first
-        extracted and encoded as well. All protocol-specific parameters
-        will be ignored from the query string.
+        The URL, a byte string or :class:`pyoauth.url.ParsedUrl`. If this
+        includes a query string, query parameters are first extracted and
+        encoded as well. All protocol-specific parameters will be ignored
+        from the query string.
     :param oauth_params:
         Protocol-specific parameters must be specified in this dictionary.
         All non-protocol parameters will be ignored.
@@ -442,18 +1983,14 @@ def generate_base_string(method, url, oauth_params):
         raise InvalidOAuthParametersError("Dictionary required: got `%r`" %
                                           oauth_params)
 
-    scheme, netloc, path, matrix_params, query, _ = urlparse_normalized(url)
+    normalized, query, _ = _urlsplit_normalized(url)
     query_string = generate_base_string_query(query, oauth_params)
-    normalized_url = urlunparse((
-        scheme,
-        netloc,
-        path,
-        matrix_params,
-        None,
-        None
-    ))
-    return SYMBOL_AMPERSAND.join(map(percent_encode,
-                           (method_normalized, normalized_url, query_string)))
+    normalized_url = normalized[-1]
+    # The endpoint URL recurs from request to request; the query string
+    # includes the nonce and never does.
+    return SYMBOL_AMPERSAND.join((percent_encode(method_normalized),
+                                  percent_encode_memoized(normalized_url),
+                                  percent_encode(query_string)))
 
 
 def generate_base_string_query(url_query, oauth_params):
@@ -475,30 +2012,398 @@ def generate_base_string_query(url_query, oauth_params):
     :returns:
         Normalized string of query parameters.
     """
-    url_query = query_remove_oauth(url_query)
-    oauth_params = request_query_remove_non_oauth(oauth_params)
+    _, pairs = query_partition_oauth(url_query, oauth=False, memoize=True)
+    _encode_oauth_params(oauth_params, pairs)
+    pairs.sort()
+    return SYMBOL_AMPERSAND.join([name + SYMBOL_EQUAL + value
+                                  for name, value in pairs])
+
+
+def _encode_oauth_params(oauth_params, pairs, include_signature=False):
+    """
+    Percent-encodes protocol parameters and appends them to ``pairs``.
 
-    query_d = {}
-    query_d.update(url_query)
-    query_d.update(oauth_params)
+    Applies the same checks as
+    :func:`pyoauth.url.request_query_remove_non_oauth`.
+
+    :param oauth_params:
+        Protocol parameters dictionary or query string.
+    :param pairs:
+        The list of percent-encoded ``(name, value)`` pairs to extend.
+    :param include_signature:
+        ``True`` to include ``oauth_signature``. Default ``False``.
+    """
+    oauth_pairs, _ = query_partition_oauth(oauth_params, non_oauth=False,
+                                           memoize=True)
+    if include_signature:
+        pairs.extend(oauth_pairs)
+    else:
+        pairs.extend([pair for pair in oauth_pairs
+                      if pair[0] != _OAUTH_PARAM_SIGNATURE])
+
+
+class BaseStringBuilder(object):
+    """
+    Builds signature base strings for requests to one method and URL.
 
-    # Now encode the parameters, while ignoring 'oauth_signature' and obviously,
-    # the secrets from the entire list of parameters.
-    def allow_func(name, _):
-        """Allows only protocol parameters that must be included into
-        the signature.
+    The method and URL are validated, normalized and percent-encoded, and
+    the URL query parameters are parsed and encoded, once. :meth:`build`
+    then encodes the protocol parameters, sorts all parameter pairs once and
+    writes the base string into a single buffer. The result is identical to
+    that of :func:`generate_base_string`.
 
-        :param name:
-            The name of the parameter.
+    :see: Signature base string
+    (http://tools.ietf.org/html/rfc5849#section-3.4.1)
+    :param method:
+        HTTP request method.
+    :param url:
+        The URL, a byte string or :class:`pyoauth.url.ParsedUrl`. If this
+        includes a query string, query parameters are included in the base
+        string. All protocol-specific parameters will be ignored from the
+        query string.
+    """
+    def __init__(self, method, url):
+        allowed_methods = HTTP_METHODS
+        method_normalized = method.upper()
+        if method_normalized not in allowed_methods:
+            raise InvalidHttpMethodError(
+                "Method must be one of the HTTP methods %s: "\
+                "got `%s` instead" % (allowed_methods, method))
+        if not url:
+            raise InvalidUrlError("URL must be specified: got `%r`" % url)
+
+        normalized, query, _ = _urlsplit_normalized(url)
+        normalized_url = normalized[-1]
+        self._prefix = percent_encode(method_normalized) + \
+                       SYMBOL_AMPERSAND + \
+                       percent_encode_memoized(normalized_url) + \
+                       SYMBOL_AMPERSAND
+        self._query_pairs = []
+        self._encode_query_params(parse_qsl(query), self._query_pairs)
+
+    @classmethod
+    def _encode_query_params(cls, query_params, pairs):
+        """
+        Percent-encodes URL query parameters, leaving out protocol
+        parameters, and appends them to ``pairs``.
+
+        :param query_params:
+            An iterable of ``(name, value)`` pairs.
+        :param pairs:
+            The list of percent-encoded ``(name, value)`` pairs to extend.
+        """
+        for name, value in query_params:
+            if utf8_decode_if_bytes(name).startswith(OAUTH_PARAM_PREFIX):
+                logging.warning(
+                    "Protocol parameter ignored from URL query parameters: "
+                    "`%r`", utf8_decode_if_bytes(name))
+                continue
+            # Query values may differ from request to request; names and
+            # the endpoint are what recur.
+            pairs.append((percent_encode_memoized(name),
+                          percent_encode(value)))
+
+    @classmethod
+    def _query_items(cls, query_params):
+        """
+        Flattens a query parameter dictionary into ``(name, value)`` pairs.
+
+        :param query_params:
+            Query parameter dictionary. Values may be sequences.
+        :returns:
+            A generator of ``(name, value)`` pairs.
+        """
+        for name, value in query_params.items():
+            if isinstance(value, list) or isinstance(value, tuple):
+                for item in value:
+                    yield name, item
+            else:
+                yield name, value
+
+    def build(self, oauth_params):
+        """
+        Calculates the signature base string.
+
+        :param oauth_params:
+            Protocol-specific parameters must be specified in this
+            dictionary. All non-protocol parameters will be ignored.
+        :returns:
+            Base string.
+        """
+        if not isinstance(oauth_params, dict):
+            raise InvalidOAuthParametersError("Dictionary required: got `%r`" %
+                                              oauth_params)
+        pairs = self._query_pairs[:]
+        _encode_oauth_params(oauth_params, pairs)
+        pairs.sort()
+        return self._write(self._prefix, pairs)
+
+    @classmethod
+    def _write(cls, prefix, pairs):
+        """
+        Writes the base string for sorted, percent-encoded pairs.
+
+        The base string query is ``name=value`` pairs joined by ``&`` and
+        percent-encoded once more. Encoded names and values only contain
+        unreserved characters and ``%``, so encoding them again only turns
+        ``%`` into ``%25``.
+
+        :param prefix:
+            The percent-encoded method and URL followed by ``&``.
+        :param pairs:
+            Sorted, percent-encoded ``(name, value)`` pairs.
         :returns:
-            ``True`` if the parameter can be included; ``False`` otherwise.
+            Base string.
         """
-        return name not in (OAUTH_PARAM_SIGNATURE,
-                            #OAUTH_PARAM_CONSUMER_SECRET, # Sanitized above.
-                            #OAUTH_PARAM_TOKEN_SECRET,    # Sanitized above.
-                            )
-    query = urlencode_s(query_d, allow_func)
-    return query
+        base_string = bytearray(prefix)
+        separator = SYMBOL_EMPTY_BYTES
+        for name, value in pairs:
+            base_string += separator
+            base_string += name.replace(_PERCENT, _BASE_STRING_PERCENT)
+            base_string += _BASE_STRING_PARAM_EQUAL
+            base_string += value.replace(_PERCENT, _BASE_STRING_PERCENT)
+            separator = _BASE_STRING_PARAM_SEPARATOR
+        return bytes(base_string)
+
+
+class BaseStringTemplate(BaseStringBuilder):
+    """
+    Builds signature base strings for repeated requests to one resource.
+
+    The URL query parameters and the protocol parameters that do not
+    change between requests (consumer key, token, signature method,
+    version) are encoded and sorted once. :meth:`build` inserts the
+    parameters that change, typically ``oauth_nonce`` and
+    ``oauth_timestamp``, by binary search instead of sorting every
+    parameter again. The result is identical to that of
+    :func:`generate_base_string` given all of the parameters.
+
+    :param method:
+        HTTP request method.
+    :param url:
+        The URL. If this includes a query string, query parameters are
+        included in the base string. All protocol-specific parameters
+        will be ignored from the query string.
+    :param oauth_params:
+        Protocol parameters that are the same for every request. All
+        non-protocol parameters will be ignored. Default ``None``.
+    """
+    def __init__(self, method, url, oauth_params=None):
+        super(BaseStringTemplate, self).__init__(method, url)
+        pairs = []
+        if oauth_params is not None:
+            if not isinstance(oauth_params, dict):
+                raise InvalidOAuthParametersError(
+                    "Dictionary required: got `%r`" % oauth_params)
+            _encode_oauth_params(oauth_params, pairs)
+        self._oauth_names = frozenset([name for name, _ in pairs])
+        self._query_pairs.extend(pairs)
+        self._query_pairs.sort()
+
+    def build(self, oauth_params=None, query_params=None):
+        """
+        Calculates the signature base string.
+
+        :param oauth_params:
+            Protocol parameters for this request only, for example
+            ``oauth_nonce`` and ``oauth_timestamp``. They must not repeat
+            the protocol parameters given to the template. All non-protocol
+            parameters will be ignored. Default ``None``.
+        :param query_params:
+            Additional URL query parameters for this request only, as a
+            dictionary. All protocol parameters will be ignored.
+            Default ``None``.
+        :returns:
+            Base string.
+        """
+        pairs = []
+        if oauth_params is not None:
+            if not isinstance(oauth_params, dict):
+                raise InvalidOAuthParametersError(
+                    "Dictionary required: got `%r`" % oauth_params)
+            _encode_oauth_params(oauth_params, pairs)
+            for name, value in pairs:
+                if name in self._oauth_names:
+                    raise InvalidOAuthParametersError(
+                        "Multiple protocol parameter values found %r=%r" \
+                        % (name, value))
+        if query_params:
+            self._encode_query_params(self._query_items(query_params), pairs)
+
+        sorted_pairs = self._query_pairs[:]
+        for pair in pairs:
+            insort(sorted_pairs, pair)
+        return self._write(self._prefix, sorted_pairs)
+
+
+#: Approximate bytes of encoded form-body parameters held in memory before
+#: they are sorted and written to a temporary file.
+FORM_BODY_SORT_MAX_MEMORY = 4 << 20
+# Rough per-pair overhead of a tuple of two byte strings, in bytes.
+_PAIR_OVERHEAD = 128
+# Base string bytes written out at a time by FormBodyBaseStringBuilder.
+_BASE_STRING_CHUNK_SIZE = 65536
+_NEWLINE = b("\n")
+
+
+class _ExternalPairSorter(object):
+    """
+    Sorts percent-encoded ``(name, value)`` pairs with bounded memory.
+
+    Pairs are buffered until they take up about ``max_memory`` bytes. The
+    buffer is then sorted and written to a temporary file as one
+    ``name=value`` line per pair; percent-encoded names and values contain
+    neither ``=`` nor line breaks. The sorted runs are merged when read.
+
+    :param max_memory:
+        Approximate number of bytes of pairs buffered in memory.
+    """
+    def __init__(self, max_memory=FORM_BODY_SORT_MAX_MEMORY):
+        self._max_memory = max_memory
+        self._pairs = []
+        self._size = 0
+        self._runs = []
+
+    @property
+    def runs(self):
+        """Number of sorted runs written to temporary files."""
+        return len(self._runs)
+
+    def add(self, name, value):
+        """
+        Adds a percent-encoded pair.
+        """
+        self._pairs.append((name, value))
+        self._size += len(name) + len(value) + _PAIR_OVERHEAD
+        if self._size >= self._max_memory:
+            self._spill()
+
+    def _spill(self):
+        """Writes the buffered pairs to a temporary file as a sorted run."""
+        self._pairs.sort()
+        run = tempfile.TemporaryFile()
+        write = run.write
+        for name, value in self._pairs:
+            write(name + SYMBOL_EQUAL + value + _NEWLINE)
+        run.seek(0)
+        self._runs.append(run)
+        self._pairs = []
+        self._size = 0
+
+    @classmethod
+    def _read_run(cls, run):
+        """Reads the pairs back from a sorted run."""
+        for line in run:
+            name, _, value = line[:-1].partition(SYMBOL_EQUAL)
+            yield name, value
+
+    def __iter__(self):
+        """
+        Yields all the pairs in sorted order.
+        """
+        self._pairs.sort()
+        if not self._runs:
+            return iter(self._pairs)
+        runs = [self._read_run(run) for run in self._runs]
+        runs.append(iter(self._pairs))
+        return heapq.merge(*runs)
+
+    def close(self):
+        """
+        Removes the temporary files.
+        """
+        for run in self._runs:
+            run.close()
+        self._runs = []
+        self._pairs = []
+        self._size = 0
+
+
+class FormBodyBaseStringBuilder(BaseStringBuilder):
+    """
+    Builds signature base strings for requests with large form-encoded
+    entity bodies.
+
+    The body is parsed a chunk at a time. Its parameters are percent-encoded
+    as they are read and sorted externally: they are kept in memory up to
+    ``max_memory`` bytes and spill to temporary files beyond. The base
+    string is produced as a sequence of chunks that can be fed to a digest
+    without ever being joined, so memory use does not grow with the body.
+    The base string is identical to that of :func:`generate_base_string`
+    for the URL with the body parameters added to its query.
+
+    :param method:
+        HTTP request method.
+    :param url:
+        The URL. If this includes a query string, query parameters are
+        included in the base string. All protocol-specific parameters
+        will be ignored from the query string.
+    :param max_memory:
+        Approximate number of bytes of encoded parameters kept in memory
+        while sorting. Default 4 MiB.
+    """
+    def __init__(self, method, url, max_memory=FORM_BODY_SORT_MAX_MEMORY):
+        super(FormBodyBaseStringBuilder, self).__init__(method, url)
+        self._max_memory = max_memory
+
+    def iter_chunks(self, oauth_params, body, query_params=None):
+        """
+        Calculates the signature base string in chunks.
+
+        :param oauth_params:
+            Protocol-specific parameters must be specified in this
+            dictionary. All non-protocol parameters will be ignored.
+        :param body:
+            The form-encoded entity body; anything accepted by
+            :func:`pyoauth.url.parse_qsl_stream`. Protocol parameters in
+            the body are ignored with a warning, once per name.
+        :param query_params:
+            Additional query parameter dictionary, if any. Protocol
+            parameters are ignored.
+        :returns:
+            A generator of byte strings that make up the base string.
+        """
+        if not isinstance(oauth_params, dict):
+            raise InvalidOAuthParametersError("Dictionary required: got `%r`" %
+                                              oauth_params)
+        pairs = self._query_pairs[:]
+        if query_params:
+            self._encode_query_params(self._query_items(query_params), pairs)
+        _encode_oauth_params(oauth_params, pairs)
+
+        sorter = _ExternalPairSorter(self._max_memory)
+        try:
+            add = sorter.add
+            for name, value in pairs:
+                add(name, value)
+            prefix = b(OAUTH_PARAM_PREFIX)
+            ignored = set()
+            for name, value in parse_qsl_stream(body):
+                if name.startswith(prefix):
+                    # Logged once per name, like QueryParams.remove_oauth.
+                    if name not in ignored:
+                        ignored.add(name)
+                        logging.warning(
+                            "Protocol parameter ignored from URL query "
+                            "parameters: `%r`", utf8_decode_if_bytes(name))
+                    continue
+                add(percent_encode(name), percent_encode(value))
+
+            chunk = bytearray(self._prefix)
+            separator = SYMBOL_EMPTY_BYTES
+            for name, value in sorter:
+                chunk += separator
+                chunk += name.replace(_PERCENT, _BASE_STRING_PERCENT)
+                chunk += _BASE_STRING_PARAM_EQUAL
+                chunk += value.replace(_PERCENT, _BASE_STRING_PERCENT)
+                separator = _BASE_STRING_PARAM_SEPARATOR
+                if len(chunk) >= _BASE_STRING_CHUNK_SIZE:
+                    yield bytes(chunk)
+                    chunk = bytearray()
+            if chunk:
+                yield bytes(chunk)
+        finally:
+            sorter.close()
 
 
 def generate_authorization_header(oauth_params,
@@ -536,8 +2441,9 @@ def generate_authorization_header(oauth_params,
                 SYMBOL_INVERTED_DOUBLE_QUOTE + param_delimiter
     else:
         value = b("OAuth ")
-    oauth_params = request_query_remove_non_oauth(oauth_params)
-    normalized_param_pairs = urlencode_sl(oauth_params)
+    normalized_param_pairs = []
+    _encode_oauth_params(oauth_params, normalized_param_pairs,
+                         include_signature=True)
     value += param_delimiter.join([k +
                                    SYMBOL_EQUAL +
                                    SYMBOL_INVERTED_DOUBLE_QUOTE +
@@ -547,9 +2453,94 @@ def generate_authorization_header(oauth_params,
     return value
 
 
+class AuthorizationHeaderTemplate(object):
+    """
+    Builds Authorization header values for one client configuration.
+
+    The realm, the delimiter and the protocol parameters that are the same
+    in every request (consumer key, signature method, version) are encoded
+    into header fragments once. :meth:`build` encodes only the remaining
+    parameters and merges them in. The result is identical to that of
+    :func:`generate_authorization_header` given all of the parameters.
+
+    :param oauth_params:
+        Protocol parameters that are the same in every header. All
+        non-protocol parameters will be ignored. Default ``None``.
+    :param realm:
+        If specified, the realm is included into the Authorization header.
+        The realm is never percent-encoded according to the OAuth spec.
+    :param param_delimiter:
+        The delimiter used to separate header value parameters.
+        According to the Specification, this must be a comma ",". However,
+        certain services like Yahoo! use "&" instead. Comma is default.
+    """
+    def __init__(self, oauth_params=None, realm=None, param_delimiter=","):
+        self._param_delimiter = utf8_encode_if_unicode(param_delimiter)
+        if realm:
+            self._prefix = b('OAuth realm="') + \
+                           utf8_encode_if_unicode(realm) + \
+                           SYMBOL_INVERTED_DOUBLE_QUOTE + \
+                           self._param_delimiter
+        else:
+            self._prefix = b("OAuth ")
+        pairs = []
+        if oauth_params is not None:
+            if not isinstance(oauth_params, dict):
+                raise InvalidOAuthParametersError(
+                    "Dictionary required: got `%r`" % oauth_params)
+            _encode_oauth_params(oauth_params, pairs, include_signature=True)
+        self._fragments = sorted(self._fragment(name, value)
+                                 for name, value in pairs)
+        self._oauth_names = frozenset([name for name, _ in pairs])
+
+    @classmethod
+    def _fragment(cls, name, value):
+        """
+        Formats a percent-encoded pair as a header parameter.
+
+        :returns:
+            A tuple of (name, value, ``name="value"``) that sorts like the
+            pair does.
+        """
+        return (name, value,
+                name + SYMBOL_EQUAL + SYMBOL_INVERTED_DOUBLE_QUOTE +
+                value + SYMBOL_INVERTED_DOUBLE_QUOTE)
+
+    def build(self, oauth_params=None):
+        """
+        Builds the Authorization header value.
+
+        :param oauth_params:
+            Protocol parameters for this request only, for example
+            ``oauth_token``, ``oauth_nonce``, ``oauth_timestamp`` and
+            ``oauth_signature``. They must not repeat the protocol parameters
+            given to the template. All non-protocol parameters will be
+            ignored. Default ``None``.
+        :returns:
+            A properly formatted Authorization header value.
+        """
+        fragments = self._fragments[:]
+        if oauth_params is not None:
+            if not isinstance(oauth_params, dict):
+                raise InvalidOAuthParametersError(
+                    "Dictionary required: got `%r`" % oauth_params)
+            pairs = []
+            _encode_oauth_params(oauth_params, pairs, include_signature=True)
+            for name, value in pairs:
+                if name in self._oauth_names:
+                    raise InvalidOAuthParametersError(
+                        "Multiple protocol parameter values found %r=%r" \
+                        % (name, value))
+                insort(fragments, self._fragment(name, value))
+        return self._prefix + self._param_delimiter.join(
+            [fragment for _, _, fragment in fragments])
+
+
 def parse_authorization_header(header_value,
                                param_delimiter=',',
-                               strict=True):
+                               strict=True,
+                               max_length=AUTHORIZATION_HEADER_MAX_LENGTH,
+                               max_params=AUTHORIZATION_HEADER_MAX_PARAMS):
     """
     Parses the OAuth Authorization header.
 
@@ -574,19 +2565,26 @@ def parse_authorization_header(header_value,
         The authorization header value must be on a single line.
         The param delimiter MUST be a comma.
         When ``False``, the parser is a bit lenient.
+    :param max_length:
+        Header values longer than this many bytes are rejected.
+        ``None`` for no limit. Default 8192.
+    :param max_params:
+        Header values with more parameters than this are rejected.
+        ``None`` for no limit. Default 32.
     :returns:
         A tuple of (Dictionary of parameter name value pairs, realm).
 
         realm will be ``None`` if the authorization header does not have
         a ``realm`` parameter.
     """
-    header_value = utf8_decode_if_bytes(header_value)
     realm = None
     params = {}
     for name, value \
         in _parse_authorization_header_l(header_value,
                                         param_delimiter=param_delimiter,
-                                        strict=strict):
+                                        strict=strict,
+                                        max_length=max_length,
+                                        max_params=max_params):
         # We do keep track of multiple values because they will be
         # detected by the sanitization below and flagged as an error
         # in the Authorization header value.
@@ -611,7 +2609,9 @@ def parse_authorization_header(header_value,
 
 def _parse_authorization_header_l(header,
                                   param_delimiter=",",
-                                  strict=True):
+                                  strict=True,
+                                  max_length=AUTHORIZATION_HEADER_MAX_LENGTH,
+                                  max_params=AUTHORIZATION_HEADER_MAX_PARAMS):
     """
     Parses the OAuth Authorization header preserving the order of the
     parameters as in the header value.
@@ -623,7 +2623,8 @@ def _parse_authorization_header_l(header,
 
     :see: Authorization Header http://tools.ietf.org/html/rfc5849#section-3.5.1
     :param header:
-        Header value. Non protocol parameters will be ignored.
+        Header value as bytes, a buffer such as a ``memoryview``, or text.
+        Non protocol parameters will be ignored.
     :param param_delimiter:
         The delimiter used to separate header value parameters.
         According to the Specification, this must be a comma ",". However,
@@ -637,22 +2638,48 @@ def _parse_authorization_header_l(header,
         The authorization header value must be on a single line.
         The param delimiter MUST be a comma.
         When ``False``, the parser is a bit lenient.
+    :param max_length:
+        Header values longer than this many bytes are rejected.
+        ``None`` for no limit.
+    :param max_params:
+        Header values with more parameters than this are rejected.
+        ``None`` for no limit.
     :returns:
         A list of parameter name value pairs in order of appearance.
     """
+    if not is_bytes_or_unicode(header):
+        # memoryview, bytearray or other buffers.
+        header = bytes(header)
+    header = utf8_encode_if_unicode(header)
+    if max_length is not None and len(header) > max_length:
+        raise InvalidAuthorizationHeaderError(
+            "`Authorization` header value is longer than %d bytes" %
+            max_length)
+    delimiter = utf8_encode_if_unicode(param_delimiter)
+    if not delimiter:
+        raise ValueError("The param delimiter must not be empty")
     if strict:
-        if "\n" in header:
+        if b("\n") in header:
             raise ValueError("Header value must be on a single line: got `%r`" %
                              header)
-        if param_delimiter != ",":
+        if delimiter != b(","):
             raise ValueError("The param delimiter must be a comma: got `%r`" %
                              param_delimiter)
     header = _authorization_header_strip_scheme(header.strip())
+
+    # Scan the parameters left to right; each one is sliced out once and
+    # nothing is decoded until it has been checked.
     decoded_pairs = []
-    for param in (p.strip() for p in header.split(param_delimiter)):
+    length = len(header)
+    start = 0
+    while start <= length:
+        end = header.find(delimiter, start)
+        if end == -1:
+            end = length
+        param = header[start:end].strip()
         if not param:
             # Having a trailing param delimiter can trigger this branch.
-            if header.endswith(param_delimiter):
+            if header.endswith(delimiter):
                 raise InvalidAuthorizationHeaderError(
                     "Malformed `Authorization` header value -- "\
                     "found trailing `%r` character" % param_delimiter)
@@ -662,7 +2689,12 @@ def _parse_authorization_header_l(header,
                 raise InvalidAuthorizationHeaderError(
                     "Consecutive `%r` delimiter characters in header "\
                     "(blank parameter field): `%r`" % (param_delimiter, header))
+        if max_params is not None and len(decoded_pairs) == max_params:
+            raise InvalidAuthorizationHeaderError(
+                "`Authorization` header value has more than %d parameters" %
+                max_params)
         decoded_pairs.append(_authorization_header_parse_param(param))
+        start = end + len(delimiter)
     return decoded_pairs
 
 
@@ -676,14 +2708,18 @@ def _authorization_header_strip_scheme(header,
          'OAuth realm="example.com",...' -> 'realm="example.com",...'
 
     :param header:
-        Header string.
+        Header bytes or string.
     :returns:
         The header without the authorization scheme.
     """
-    if not header.lower().startswith("oauth "):
+    if is_bytes(header):
+        prefix, pattern = _AUTH_SCHEME_PREFIX, _AUTH_SCHEME_BYTES_PATTERN
+    else:
+        prefix, pattern = "oauth ", _pattern
+    if not header[:len(prefix)].lower() == prefix:
         raise ValueError("Authorization scheme must be `OAuth`: got `%r`" %
                          header)
-    return re.sub(_pattern, "", header, 1)
+    return header[pattern.match(header).end():]
 
 
 def _authorization_header_parse_param(param):
@@ -697,13 +2733,14 @@ def _authorization_header_parse_param(param):
     The ``realm`` parameter, if present, will not be percent-decoded.
 
     :param param:
-        The parameter (name=value) pair string.
+        The parameter (name=value) pair bytes or string.
     :returns:
         A tuple of (percent-decoded name, percent-decoded value)
     """
+    param = utf8_encode_if_unicode(param)
     # Split into a name, value pair.
     try:
-        name, value = param.split("=", 1)
+        name, value = param.split(SYMBOL_EQUAL, 1)
     except ValueError:
         raise InvalidAuthorizationHeaderError("bad parameter field: `%r`" %
                                               param)
@@ -718,8 +2755,8 @@ def _authorization_header_parse_param(param):
             "bad parameter value: `%r` -- missing quotes?" % param)
 
     # Value must be quoted between " characters.
-    if value[0] != '"' or \
-       value[-1] != '"':
+    if value[:1] != _QUOTE or \
+       value[-1:] != _QUOTE:
         raise InvalidAuthorizationHeaderError(
             "missing quotes around parameter value: `%r` "\
             "-- values must be quoted using (\")" % param)
@@ -732,15 +2769,31 @@ def _authorization_header_parse_param(param):
 
     # Names and values must be percent-decoded except for the ``realm``
     # parameter.
-    name = percent_decode(name)
+    name = _authorization_header_decode(name)
     if name.lower() == "realm":
         # "realm" is case-insensitive.
         # The realm parameter value is a simple quoted string.
         # It is neither percent-encoded nor percent-decoded in OAuth.
         name = "realm"
+        value = value.decode("utf-8")
     else:
         # Percent decode if the parameter is not ``realm``.
-        value = percent_decode(value)
+        value = _authorization_header_decode(value)
 
     # Hooray! You made it.
     return name, value
+
+
+def _authorization_header_decode(value):
+    """
+    Percent-decodes an Authorization header parameter name or value.
+
+    :param value:
+        Bytes.
+    :returns:
+        Decoded string. Values without ``%`` or ``+`` are only UTF-8
+        decoded.
+    """
+    if value.find(_PERCENT) == -1 and value.find(_PLUS) == -1:
+        return value.decode("utf-8")
+    return percent_decode(value)
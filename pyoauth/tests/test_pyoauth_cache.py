@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2011 Yesudeep Mangalapilly <yesudeep@gmail.com>
+# Copyright 2012 Google, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+
+import threading
+import unittest2
+
+from pyoauth.cache import LRUCache
+
+
+class Test_LRUCache(unittest2.TestCase):
+    def test_get_returns_default_when_missing(self):
+        cache = LRUCache(2)
+        self.assertEqual(cache.get("a"), None)
+        self.assertEqual(cache.get("a", 5), 5)
+
+    def test_set_and_get(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertTrue("a" in cache)
+        self.assertEqual(len(cache), 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        # Touch "a" so that "b" becomes the oldest entry.
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertTrue("a" in cache)
+        self.assertFalse("b" in cache)
+        self.assertTrue("c" in cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_replacing_does_not_evict(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("a", 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get("a"), 3)
+        self.assertEqual(cache.get("b"), 2)
+
+    def test_hits_and_misses(self):
+        cache = LRUCache(2)
+        cache.get("a")
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("a")
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.stats(),
+                         dict(hits=2, misses=1, hit_rate=2.0 / 3,
+                              size=1, max_size=2))
+
+    def test_hit_rate_without_lookups(self):
+        self.assertEqual(LRUCache(2).stats()["hit_rate"], 0.0)
+
+    def test_invalidate(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        self.assertTrue(cache.invalidate("a"))
+        self.assertFalse(cache.invalidate("a"))
+        self.assertFalse("a" in cache)
+        cache.set("b", 2)
+        cache.set("c", 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_clear(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.hits, 0)
+        self.assertEqual(cache.misses, 0)
+
+    def test_ValueError_when_max_size_is_not_positive(self):
+        self.assertRaises(ValueError, LRUCache, 0)
+
+    def test_concurrent_access_stays_bounded(self):
+        cache = LRUCache(16)
+        def worker(offset):
+            for i in range(1000):
+                cache.set((offset, i % 32), i)
+                cache.get((offset, (i + 1) % 32))
+        threads = [threading.Thread(target=worker, args=(n,))
+                   for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(cache), 16)
+        self.assertEqual(cache.hits + cache.misses, 4000)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2011 Yesudeep Mangalapilly <yesudeep@gmail.com>
+# Copyright 2012 Google, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+
+import os
+import threading
+import unittest2
+
+from pyoauth.entropy import EntropyPool
+
+
+class _CountingUrandom(object):
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, count):
+        self._lock.acquire()
+        try:
+            if count:
+                self.calls += 1
+        finally:
+            self._lock.release()
+        return os.urandom(count)
+
+
+class Test_EntropyPool(unittest2.TestCase):
+    def test_read_length(self):
+        pool = EntropyPool(64, background=False)
+        self.assertEqual(len(pool.read(8)), 8)
+        self.assertEqual(len(pool.read(64)), 64)
+        self.assertEqual(len(pool.read(100)), 100)
+
+    def test_reads_blocks(self):
+        urandom = _CountingUrandom()
+        pool = EntropyPool(64, background=False, urandom=urandom)
+        for _ in range(8):
+            pool.read(8)
+        self.assertEqual(urandom.calls, 1)
+        pool.read(8)
+        self.assertEqual(urandom.calls, 2)
+        self.assertEqual(pool.refills, 2)
+
+    def test_large_reads_bypass_pool(self):
+        urandom = _CountingUrandom()
+        pool = EntropyPool(64, background=False, urandom=urandom)
+        pool.read(8)
+        pool.read(65)
+        self.assertEqual(urandom.calls, 2)
+        # The buffered bytes are still used.
+        pool.read(56)
+        self.assertEqual(urandom.calls, 2)
+
+    def test_bytes_are_handed_out_once(self):
+        stream = [bytes(bytearray(range(256)))]
+
+        def urandom(count):
+            value, stream[0] = stream[0][:count], stream[0][count:]
+            return value
+
+        pool = EntropyPool(16, background=False, urandom=urandom)
+        values = [pool.read(4) for _ in range(8)]
+        self.assertEqual(bytes(bytearray().join(values)),
+                         bytes(bytearray(range(32))))
+
+    def test_background_refill(self):
+        urandom = _CountingUrandom()
+        pool = EntropyPool(64, low_water=32, urandom=urandom)
+        pool.read(40)
+        pool.join()
+        self.assertEqual(urandom.calls, 2)
+        # 24 buffered + 64 refilled bytes; 32 remain, so no refill starts.
+        pool.read(56)
+        self.assertEqual(urandom.calls, 2)
+
+    def test_background_refills_share_one_thread(self):
+        urandom = _CountingUrandom()
+        pool = EntropyPool(64, low_water=32, urandom=urandom)
+        pool.read(40)
+        pool.join()
+        thread = pool._thread
+        for _ in range(3):
+            pool.read(64)
+            pool.join()
+        self.assertTrue(pool._thread is thread)
+        self.assertTrue(thread.is_alive())
+        self.assertEqual(urandom.calls, 5)
+
+    def test_concurrent_reads_are_unique(self):
+        pool = EntropyPool(256, low_water=128)
+        results = []
+        lock = threading.Lock()
+
+        def worker():
+            values = [pool.read(8) for _ in range(500)]
+            lock.acquire()
+            try:
+                results.extend(values)
+            finally:
+                lock.release()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 2000)
+        self.assertEqual(len(set(results)), 2000)
+
+    def test_random_bits(self):
+        pool = EntropyPool(64, background=False)
+        self.assertEqual(len(pool.random_bits(64)), 8)
+        for _ in range(100):
+            value = pool.random_bits(12)
+            self.assertEqual(len(value), 2)
+            self.assertTrue(ord(value[:1]) < 16)
+        self.assertRaises(ValueError, pool.random_bits, 0)
+
+    def test_random_bits_many(self):
+        urandom = _CountingUrandom()
+        pool = EntropyPool(1024, background=False, urandom=urandom)
+        values = pool.random_bits_many(100, 64)
+        self.assertEqual(len(values), 100)
+        self.assertEqual(len(set(values)), 100)
+        self.assertTrue(all(len(value) == 8 for value in values))
+        self.assertEqual(urandom.calls, 1)
+
+    def test_invalid_block_size(self):
+        self.assertRaises(ValueError, EntropyPool, 0)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2011 Yesudeep Mangalapilly <yesudeep@gmail.com>
+# Copyright 2012 Google, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+
+import io
+import mmap
+import tempfile
+import unittest2
+
+from mom.builtins import b
+
+from pyoauth.http import RequestAdapter, body_length, iter_body, read_body
+
+
+class Test_body_length(unittest2.TestCase):
+    def test_bytes_and_buffers(self):
+        self.assertEqual(body_length(None), 0)
+        self.assertEqual(body_length(b("abc")), 3)
+        self.assertEqual(body_length(bytearray(b("abcd"))), 4)
+        self.assertEqual(body_length(memoryview(b("abcde"))[1:]), 4)
+
+    def test_files_from_current_position(self):
+        body = io.BytesIO(b("abcdef"))
+        body.seek(2)
+        self.assertEqual(body_length(body), 4)
+        self.assertEqual(body.tell(), 2)
+
+        f = tempfile.TemporaryFile()
+        try:
+            f.write(b("x") * 100)
+            f.seek(10)
+            self.assertEqual(body_length(f), 90)
+            self.assertEqual(f.tell(), 10)
+            f.flush()
+            mapped = mmap.mmap(f.fileno(), 0)
+            try:
+                mapped.seek(40)
+                self.assertEqual(body_length(mapped), 60)
+            finally:
+                mapped.close()
+        finally:
+            f.close()
+
+    def test_unknown_for_iterators(self):
+        self.assertEqual(body_length(iter([b("a")])), None)
+
+
+class Test_iter_body(unittest2.TestCase):
+    def test_buffers_are_sliced_not_copied(self):
+        data = bytearray(b("abcdefg"))
+        chunks = list(iter_body(data, 3))
+        self.assertTrue(all(isinstance(c, memoryview) for c in chunks))
+        self.assertEqual([bytes(c) for c in chunks],
+                         [b("abc"), b("def"), b("g")])
+        data[0:1] = b("z")
+        self.assertEqual(bytes(chunks[0]), b("zbc"))
+
+    def test_files_and_iterators(self):
+        self.assertEqual(list(iter_body(io.BytesIO(b("abcde")), 2)),
+                         [b("ab"), b("cd"), b("e")])
+        self.assertEqual(list(iter_body(iter([b("a"), b("b")]))),
+                         [b("a"), b("b")])
+        self.assertEqual(list(iter_body(b("abc"))), [b("abc")])
+
+
+class Test_read_body(unittest2.TestCase):
+    def test_reads_and_rewinds_files(self):
+        body = io.BytesIO(b("abcdef"))
+        body.seek(1)
+        self.assertEqual(read_body(body), b("bcdef"))
+        self.assertEqual(body.tell(), 1)
+
+    def test_buffers_and_iterators(self):
+        self.assertEqual(read_body(memoryview(b("abc"))), b("abc"))
+        self.assertEqual(read_body(iter([b("a"), b("bc")])), b("abc"))
+        self.assertEqual(read_body(None), b(""))
+
+
+class Test_RequestAdapter_body(unittest2.TestCase):
+    def test_content_length_and_chunks(self):
+        body = io.BytesIO(b("abcdef"))
+        request = RequestAdapter(b("POST"), b("http://example.com/"), body, {})
+        self.assertTrue(request.body is body)
+        self.assertEqual(request.content_length, 6)
+        self.assertEqual(b("").join(request.iter_body(4)), b("abcdef"))
+        body.seek(0)
+        self.assertEqual(request.read_body(), b("abcdef"))
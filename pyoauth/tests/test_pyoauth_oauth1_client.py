@@ -17,6 +17,7 @@
 # under the License.
 
 
+import io
 import unittest2
 
 from mom.builtins import b
@@ -40,9 +41,15 @@ from pyoauth.error import InvalidSignatureMethodError, \
     SignatureMethodNotSupportedError
 from pyoauth.http import ResponseAdapter, RequestAdapter, \
     CONTENT_TYPE_FORM_URLENCODED
-from pyoauth.oauth1 import Credentials, SIGNATURE_METHOD_HMAC_SHA1
-from pyoauth.oauth1.client import _OAuthClient, Client
-from pyoauth.oauth1.protocol import parse_authorization_header
+from pyoauth.oauth1 import Credentials, SIGNATURE_METHOD_HMAC_SHA1, \
+    SIGNATURE_METHOD_HMAC_SHA256, SIGNATURE_METHOD_HMAC_SHA512
+from pyoauth.oauth1.client import _OAuthClient, Client, \
+    SIGNATURE_METHOD_MAP
+from pyoauth.oauth1.protocol import parse_authorization_header, \
+    generate_authorization_header, FrozenClock, generate_base_string, \
+    generate_hmac_sha256_signature, generate_hmac_sha512_signature, \
+    get_signature_method, register_signature_method, \
+    unregister_signature_method, HMAC_SHA1_PREFIX_CACHE
 from pyoauth.url import percent_decode
 from pyoauth.tests.constants import TEST_CONSUMER_KEY, TEST_NONCE, \
     TEST_TIMESTAMP, TEST_EXTRA_PARAM_VALUE, TEST_IGNORE_THIS_TEXT, \
@@ -89,6 +96,11 @@ class Test__OAuthClient_generate_timestamp(unittest2.TestCase):
         self.assertTrue(len(_OAuthClient.generate_timestamp()) > 0,
                     "Timestamp is an empty string.")
 
+    def test_uses_client_clock(self):
+        class _FrozenClient(_OAuthClient):
+            clock = FrozenClock(1191242096)
+        self.assertEqual(_FrozenClient.generate_timestamp(), b("1191242096"))
+
 class Test__OAuthClient__generate_oauth_params(unittest2.TestCase):
     def test_generates_oauth_params(self):
         args_no_token = dict(
@@ -206,6 +218,120 @@ class Test__OAuthClient__generate_signature(unittest2.TestCase):
             oauth_params=oauth_params,
         ), utf8_encode(percent_decode(RFC_RESOURCE_REQUEST_SIGNATURE_ENCODED)))
 
+    def test_prefix_signing_generates_same_signature(self):
+        class PrefixSigningClient(_OAuthClient):
+            use_prefix_signing = True
+
+        oauth_params = dict(
+            oauth_consumer_key=RFC_CLIENT_IDENTIFIER,
+            oauth_token=RFC_TOKEN_IDENTIFIER,
+            oauth_signature_method=SIGNATURE_METHOD_HMAC_SHA1,
+            oauth_timestamp=RFC_TIMESTAMP_3,
+            oauth_nonce=RFC_NONCE_3,
+        )
+        for _ in range(2):
+            self.assertEqual(PrefixSigningClient._generate_signature(
+                HTTP_GET,
+                RFC_RESOURCE_FULL_URL,
+                params=None,
+                body=None,
+                headers=None,
+                oauth_consumer_secret=RFC_CLIENT_SECRET,
+                oauth_token_secret=RFC_TOKEN_SECRET,
+                oauth_params=oauth_params,
+            ), utf8_encode(
+                percent_decode(RFC_RESOURCE_REQUEST_SIGNATURE_ENCODED)))
+
+    def test_signs_with_registered_signature_methods(self):
+        for signature_method, sign_func in (
+            (SIGNATURE_METHOD_HMAC_SHA256, generate_hmac_sha256_signature),
+            (SIGNATURE_METHOD_HMAC_SHA512, generate_hmac_sha512_signature)):
+            _OAuthClient.check_signature_method(signature_method)
+            oauth_params = dict(
+                oauth_consumer_key=RFC_CLIENT_IDENTIFIER,
+                oauth_token=RFC_TOKEN_IDENTIFIER,
+                oauth_signature_method=signature_method,
+                oauth_timestamp=RFC_TIMESTAMP_3,
+                oauth_nonce=RFC_NONCE_3,
+            )
+            base_string = generate_base_string(HTTP_GET,
+                                               RFC_RESOURCE_FULL_URL,
+                                               oauth_params)
+            self.assertEqual(_OAuthClient._generate_signature(
+                HTTP_GET,
+                RFC_RESOURCE_FULL_URL,
+                params=None,
+                body=None,
+                headers=None,
+                oauth_consumer_secret=RFC_CLIENT_SECRET,
+                oauth_token_secret=RFC_TOKEN_SECRET,
+                oauth_params=oauth_params,
+            ), sign_func(base_string, RFC_CLIENT_SECRET, RFC_TOKEN_SECRET))
+
+    def test_signs_with_replaced_built_in_signature_method(self):
+        oauth_params = dict(
+            oauth_consumer_key=RFC_CLIENT_IDENTIFIER,
+            oauth_token=RFC_TOKEN_IDENTIFIER,
+            oauth_signature_method=SIGNATURE_METHOD_HMAC_SHA1,
+            oauth_timestamp=RFC_TIMESTAMP_3,
+            oauth_nonce=RFC_NONCE_3,
+        )
+        sign_func, verify_func = get_signature_method(
+            SIGNATURE_METHOD_HMAC_SHA1)
+        register_signature_method(
+            SIGNATURE_METHOD_HMAC_SHA1,
+            lambda base_string, client_key, token_key: b("replaced"),
+            verify_func)
+        try:
+            self.assertEqual(SIGNATURE_METHOD_MAP[SIGNATURE_METHOD_HMAC_SHA1](
+                b(""), None, None), b("replaced"))
+            self.assertEqual(_OAuthClient._generate_signature(
+                HTTP_GET,
+                RFC_RESOURCE_FULL_URL,
+                params=None,
+                body=None,
+                headers=None,
+                oauth_consumer_secret=RFC_CLIENT_SECRET,
+                oauth_token_secret=RFC_TOKEN_SECRET,
+                oauth_params=oauth_params,
+            ), b("replaced"))
+
+            unregister_signature_method(SIGNATURE_METHOD_HMAC_SHA1)
+            self.assertFalse(
+                SIGNATURE_METHOD_HMAC_SHA1 in SIGNATURE_METHOD_MAP)
+            self.assertRaises(SignatureMethodNotSupportedError,
+                              _OAuthClient.check_signature_method,
+                              SIGNATURE_METHOD_HMAC_SHA1)
+        finally:
+            register_signature_method(SIGNATURE_METHOD_HMAC_SHA1,
+                                      sign_func, verify_func)
+        _OAuthClient.check_signature_method(SIGNATURE_METHOD_HMAC_SHA1)
+
+    def test_assigning_into_signature_method_map_registers(self):
+        sign_func, verify_func = get_signature_method(
+            SIGNATURE_METHOD_HMAC_SHA1)
+        replaced = lambda base_string, client_key, token_key: b("replaced")
+        try:
+            SIGNATURE_METHOD_MAP[SIGNATURE_METHOD_HMAC_SHA1] = replaced
+            self.assertEqual(get_signature_method(SIGNATURE_METHOD_HMAC_SHA1),
+                             (replaced, verify_func))
+
+            SIGNATURE_METHOD_MAP[b("X-CUSTOM")] = replaced
+            self.assertEqual(get_signature_method(b("X-CUSTOM")),
+                             (replaced, None))
+            _OAuthClient.check_signature_method(b("X-CUSTOM"))
+
+            del SIGNATURE_METHOD_MAP[b("X-CUSTOM")]
+            self.assertRaises(SignatureMethodNotSupportedError,
+                              _OAuthClient.check_signature_method,
+                              b("X-CUSTOM"))
+            self.assertRaises(KeyError, SIGNATURE_METHOD_MAP.__delitem__,
+                              b("X-CUSTOM"))
+        finally:
+            unregister_signature_method(b("X-CUSTOM"))
+            register_signature_method(SIGNATURE_METHOD_HMAC_SHA1,
+                                      sign_func, verify_func)
+
 
     def test_error_when_headers_or_content_type_missing_body_specified(self):
         oauth_params = dict(
@@ -408,6 +534,22 @@ class Test__OAuthClient_misc(unittest2.TestCase):
         self.assertEqual(credentials, self.token_credentials)
 
 
+    def test_parse_token_credentials_response_streamed(self):
+        headers = {
+            HEADER_CONTENT_TYPE: CONTENT_TYPE_FORM_URLENCODED,
+        }
+        response = ResponseAdapter(200, HTTP_REASON_OK,
+                                   RFC_TOKEN_CREDENTIALS_RESPONSE,
+                                   headers=headers)
+        expected = _OAuthClient.parse_token_credentials_response(response)
+
+        class StreamingClient(_OAuthClient):
+            credentials_response_stream_threshold = 0
+        self.assertEqual(
+            StreamingClient.parse_token_credentials_response(response),
+            expected)
+        self.assertEqual(expected[0], self.token_credentials)
+
     def test__parse_credentials_response(self):
         headers = {
             HEADER_CONTENT_TYPE: CONTENT_TYPE_FORM_URLENCODED,
@@ -653,6 +795,41 @@ class Test__OAuthClient__build_request(unittest2.TestCase):
             }, oauth_params,
                           OAUTH_REALM, False)
 
+class Test__OAuthClient__generate_authorization_header(unittest2.TestCase):
+    def test_same_as_generate_authorization_header(self):
+        for token, nonce in ((None, b("wIjqoS")),
+                             (b("nnch734d00sl2jdk"), b("kllo9940pd9333jh"))):
+            oauth_params = dict(
+                oauth_consumer_key=b("dpf43f3p2l4k3l03"),
+                oauth_signature_method=SIGNATURE_METHOD_HMAC_SHA1,
+                oauth_version=b("1.0"),
+                oauth_timestamp=b("137131200"),
+                oauth_nonce=nonce,
+                oauth_signature=b("74KNZJeDHnMBp0EMJ9ZHt/XKycU="),
+            )
+            if token:
+                oauth_params["oauth_token"] = token
+            for realm in (None, OAUTH_REALM):
+                self.assertEqual(
+                    _OAuthClient._generate_authorization_header(oauth_params,
+                                                                realm),
+                    generate_authorization_header(oauth_params, realm))
+
+    def test_list_valued_constant_params(self):
+        oauth_params = dict(
+            oauth_consumer_key=[b("dpf43f3p2l4k3l03")],
+            oauth_signature_method=SIGNATURE_METHOD_HMAC_SHA1,
+            oauth_version=[b("1.0")],
+            oauth_nonce=b("wIjqoS"),
+        )
+        # Twice, so that the second call uses the cached template.
+        for _ in range(2):
+            self.assertEqual(
+                _OAuthClient._generate_authorization_header(oauth_params,
+                                                            OAUTH_REALM),
+                generate_authorization_header(oauth_params, OAUTH_REALM))
+
+
 class Test__OAuthClient__request(unittest2.TestCase):
     def test__request_data(self):
         expected = RequestAdapter(
@@ -767,6 +944,167 @@ oauth_signature="MdpQcU8iPSUjWoN%2FUDMsK2sui9I%3D"'''),
                       oauth_something=[1, 2, 3])
 
 
+class Test__OAuthClient_body_hash(unittest2.TestCase):
+    body = b('{"photos": ["vacation.jpg"]}')
+    body_hash = b("YcgiWzBQhyD13vTAiM15G7ynYbU=")
+
+    class BodyHashClient(_OAuthClient):
+        use_body_hash = True
+
+    def setUp(self):
+        self.client_credentials = Credentials(RFC_CLIENT_IDENTIFIER,
+                                              RFC_CLIENT_SECRET)
+
+    def _request(self, method, body=None, headers=None, params=None):
+        request = self.BodyHashClient._request(
+            self.client_credentials, method, RFC_RESOURCE_URI,
+            params=params, body=body, headers=headers)
+        oauth_params, _ = parse_authorization_header(
+            request.headers[HEADER_AUTHORIZATION_CAPS])
+        return request, oauth_params
+
+    def test_hashes_and_rewinds_file_body(self):
+        body = io.BytesIO(self.body)
+        request, oauth_params = self._request(HTTP_POST, body, {
+            HEADER_CONTENT_TYPE: b("application/json"),
+            HEADER_CONTENT_LENGTH: b(str(len(self.body))),
+        })
+        self.assertEqual(utf8_encode(oauth_params["oauth_body_hash"][0]),
+                         self.body_hash)
+        self.assertTrue(request.body is body)
+        self.assertEqual(body.tell(), 0)
+
+    def test_spools_iterator_body(self):
+        chunks = iter([self.body[:10], self.body[10:]])
+        request, oauth_params = self._request(HTTP_POST, chunks, {
+            HEADER_CONTENT_TYPE: b("application/json"),
+        })
+        self.assertEqual(utf8_encode(oauth_params["oauth_body_hash"][0]),
+                         self.body_hash)
+        self.assertEqual(request.body.read(), self.body)
+        self.assertEqual(request.headers[HEADER_CONTENT_LENGTH],
+                         b(str(len(self.body))))
+
+    def test_hashes_empty_body(self):
+        _, oauth_params = self._request(HTTP_GET)
+        self.assertEqual(utf8_encode(oauth_params["oauth_body_hash"][0]),
+                         b("2jmj7l5rSw0yVb/vlWAYkK/YBwk="))
+
+    def test_skips_form_bodies(self):
+        _, oauth_params = self._request(HTTP_POST,
+                                        params={"a": b("b")})
+        self.assertFalse("oauth_body_hash" in oauth_params)
+        _, oauth_params = self._request(HTTP_POST, b("a=b"), {
+            HEADER_CONTENT_TYPE: CONTENT_TYPE_FORM_URLENCODED,
+            HEADER_CONTENT_LENGTH: b("3"),
+        })
+        self.assertFalse("oauth_body_hash" in oauth_params)
+
+    def test_off_by_default(self):
+        request = _OAuthClient._request(
+            self.client_credentials, HTTP_POST, RFC_RESOURCE_URI,
+            body=self.body, headers={
+                HEADER_CONTENT_TYPE: b("application/json"),
+                HEADER_CONTENT_LENGTH: b(str(len(self.body))),
+            })
+        oauth_params, _ = parse_authorization_header(
+            request.headers[HEADER_AUTHORIZATION_CAPS])
+        self.assertFalse("oauth_body_hash" in oauth_params)
+
+
+class Test__OAuthClient_request_bodies(unittest2.TestCase):
+    body = b('{"photos": ["vacation.jpg"]}')
+    headers = {HEADER_CONTENT_TYPE: b("application/json")}
+
+    def setUp(self):
+        self.client_credentials = Credentials(RFC_CLIENT_IDENTIFIER,
+                                              RFC_CLIENT_SECRET)
+
+    def _request(self, body, headers):
+        return _OAuthClient._request(self.client_credentials, HTTP_POST,
+                                     RFC_RESOURCE_URI, body=body,
+                                     headers=dict(headers))
+
+    def test_content_length_from_buffer_and_file(self):
+        view = memoryview(self.body)
+        request = self._request(view, self.headers)
+        self.assertTrue(request.body is view)
+        self.assertEqual(request.headers[HEADER_CONTENT_LENGTH],
+                         b(str(len(self.body))))
+
+        body = io.BytesIO(self.body)
+        body.seek(2)
+        request = self._request(body, self.headers)
+        self.assertTrue(request.body is body)
+        self.assertEqual(request.headers[HEADER_CONTENT_LENGTH],
+                         b(str(len(self.body) - 2)))
+
+    def test_iterator_requires_content_length(self):
+        self.assertRaises(ValueError, self._request,
+                          iter([self.body]), self.headers)
+        headers = dict(self.headers)
+        headers[HEADER_CONTENT_LENGTH] = b(str(len(self.body)))
+        chunks = iter([self.body])
+        self.assertTrue(self._request(chunks, headers).body is chunks)
+
+    def test_form_encoded_iterator_is_spooled(self):
+        form = b("a=1&b=2")
+        request = self._request(
+            iter([form[:3], form[3:]]),
+            {HEADER_CONTENT_TYPE: CONTENT_TYPE_FORM_URLENCODED})
+        self.assertEqual(request.read_body(), form)
+        self.assertEqual(request.headers[HEADER_CONTENT_LENGTH],
+                         b(str(len(form))))
+
+
+class Test__OAuthClient_form_body_streaming(unittest2.TestCase):
+    body = b("&").join([b("p%d=v+%d") % (i % 13, i) for i in range(200)]) + \
+           b("&oauth_nonce=ignored")
+    headers = {HEADER_CONTENT_TYPE: CONTENT_TYPE_FORM_URLENCODED}
+
+    class StreamingClient(_OAuthClient):
+        form_body_stream_threshold = 0
+
+    def setUp(self):
+        self.oauth_params = dict(
+            oauth_consumer_key=RFC_CLIENT_IDENTIFIER,
+            oauth_token=RFC_TOKEN_IDENTIFIER,
+            oauth_signature_method=SIGNATURE_METHOD_HMAC_SHA1,
+            oauth_timestamp=RFC_TIMESTAMP_3,
+            oauth_nonce=RFC_NONCE_3,
+            oauth_version=OAUTH_VERSION_1,
+        )
+
+    def _sign(self, client_class, body):
+        return client_class._generate_signature(
+            HTTP_POST, RFC_RESOURCE_FULL_URL, {"extra": b("1")}, body,
+            self.headers, RFC_CLIENT_SECRET, RFC_TOKEN_SECRET,
+            self.oauth_params)
+
+    def test_same_signature_as_parsing_the_body(self):
+        self.assertEqual(self._sign(self.StreamingClient, self.body),
+                         self._sign(_OAuthClient, self.body))
+
+    def test_prefix_signing(self):
+        class PrefixSigningStreamingClient(self.StreamingClient):
+            use_prefix_signing = True
+
+        HMAC_SHA1_PREFIX_CACHE.clear()
+        expected = self._sign(_OAuthClient, self.body)
+        for _ in range(2):
+            self.assertEqual(self._sign(PrefixSigningStreamingClient,
+                                        self.body), expected)
+        self.assertEqual(len(HMAC_SHA1_PREFIX_CACHE), 1)
+        self.assertEqual(HMAC_SHA1_PREFIX_CACHE.hits, 1)
+
+    def test_signs_and_rewinds_file_body(self):
+        body = io.BytesIO(b("xx") + self.body)
+        body.seek(2)
+        self.assertEqual(self._sign(_OAuthClient, body),
+                         self._sign(_OAuthClient, self.body))
+        self.assertEqual(body.tell(), 2)
+
+
 class Test_Client_fetch_temporary_credentials(unittest2.TestCase):
     def setUp(self):
         self.client_credentials = Credentials(
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2011 Yesudeep Mangalapilly <yesudeep@gmail.com>
+# Copyright 2012 Google, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+
+import unittest2
+
+from mom.builtins import b
+from mom.codec import base64_encode
+from mom.security.hash import sha1_digest
+
+from pyoauth.oauth1 import SIGNATURE_METHOD_RSA_SHA1
+from pyoauth.oauth1.client import _OAuthClient, SIGNATURE_METHOD_MAP
+from pyoauth.oauth1.pool import RsaSha1SigningPool
+from pyoauth.oauth1.protocol import generate_rsa_sha1_signature, \
+    generate_chunked_signature, SIGNATURE_METHOD_REGISTRY
+from pyoauth.tests.constants import RFC_CLIENT_IDENTIFIER, \
+    RFC_RESOURCE_FULL_URL, RFC_NONCE_3, RFC_TIMESTAMP_3
+from pyoauth.constants import HTTP_GET
+
+
+class FakePrivateKey(object):
+    """Picklable stand-in for a parsed private key."""
+    def pkcs1_v1_5_sign(self, digest):
+        return b("signed:") + digest
+
+
+class Test_RsaSha1SigningPool(unittest2.TestCase):
+    def setUp(self):
+        self.pool = RsaSha1SigningPool(processes=2)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_sign_matches_generate_rsa_sha1_signature(self):
+        base_string = b("GET&http%3A%2F%2Fexample.com%2F&a%3Db")
+        self.assertEqual(self.pool.sign(base_string, FakePrivateKey()),
+                         generate_rsa_sha1_signature(base_string,
+                                                     FakePrivateKey()))
+
+    def test_sign_many_preserves_order(self):
+        base_strings = [b("GET&http%3A%2F%2Fexample.com%2F&n%3D") +
+                        b(str(i)) for i in range(50)]
+        self.assertEqual(
+            self.pool.sign_many(base_strings, FakePrivateKey(), chunksize=3),
+            [base64_encode(b("signed:") + sha1_digest(base_string))
+             for base_string in base_strings])
+
+    def test_sign_rejects_unexpected_arguments(self):
+        base_string = b("GET&http%3A%2F%2Fexample.com%2F&a%3Db")
+        self.assertRaises(TypeError, self.pool.sign, base_string,
+                          FakePrivateKey(), None, b("unexpected"))
+        self.assertRaises(TypeError, self.pool.sign, base_string,
+                          FakePrivateKey(), unexpected=True)
+
+    def test_start_up_keys_are_sent_by_index(self):
+        base_string = b("GET&http%3A%2F%2Fexample.com%2F&a%3Db")
+        key = FakePrivateKey()
+        pool = RsaSha1SigningPool(processes=1,
+                                  client_private_keys=[FakePrivateKey(), key])
+        try:
+            self.assertEqual(pool._task(base_string, key),
+                             (base_string, 1, None))
+            self.assertEqual(pool.sign(base_string, key),
+                             generate_rsa_sha1_signature(base_string, key))
+            self.assertEqual(pool.sign_many([base_string], key),
+                             [generate_rsa_sha1_signature(base_string, key)])
+        finally:
+            pool.close()
+
+    def test_install_and_uninstall(self):
+        registry = {SIGNATURE_METHOD_RSA_SHA1: (None, len)}
+        digest_signers = {}
+        self.pool.install(registry, digest_signers)
+        self.assertEqual(registry[SIGNATURE_METHOD_RSA_SHA1],
+                         (self.pool.sign, len))
+        self.assertEqual(digest_signers,
+                         {self.pool.sign: self.pool.sign_digest})
+        self.pool.uninstall()
+        self.assertEqual(registry[SIGNATURE_METHOD_RSA_SHA1], (None, len))
+        self.assertEqual(digest_signers, {})
+
+    def test_chunked_signature_sends_only_the_digest(self):
+        chunks = [b("POST&http%3A%2F%2Fexample.com%2F&"), b("a%3D") * 1000]
+        expected = generate_rsa_sha1_signature(b("").join(chunks),
+                                               FakePrivateKey())
+        tasks = []
+        apply = self.pool._pool.apply
+
+        def spy(func, args):
+            tasks.append(args[0])
+            return apply(func, args)
+
+        self.pool._pool.apply = spy
+        self.pool.install()
+        try:
+            self.assertEqual(generate_chunked_signature(self.pool.sign,
+                                                        iter(chunks),
+                                                        FakePrivateKey()),
+                             expected)
+        finally:
+            self.pool.uninstall()
+            del self.pool._pool.apply
+        self.assertEqual(len(tasks), 1)
+        self.assertEqual(tasks[0][0], sha1_digest(b("").join(chunks)))
+
+    def test_client_signs_through_installed_pool(self):
+        oauth_params = dict(
+            oauth_consumer_key=RFC_CLIENT_IDENTIFIER,
+            oauth_signature_method=SIGNATURE_METHOD_RSA_SHA1,
+            oauth_timestamp=RFC_TIMESTAMP_3,
+            oauth_nonce=RFC_NONCE_3,
+        )
+        expected = _OAuthClient._generate_signature(
+            HTTP_GET, RFC_RESOURCE_FULL_URL, None, None, None,
+            FakePrivateKey(), None, oauth_params)
+        entry = SIGNATURE_METHOD_REGISTRY[SIGNATURE_METHOD_RSA_SHA1]
+        self.pool.install()
+        try:
+            self.assertEqual(SIGNATURE_METHOD_MAP[SIGNATURE_METHOD_RSA_SHA1],
+                             self.pool.sign)
+            self.assertEqual(_OAuthClient._generate_signature(
+                HTTP_GET, RFC_RESOURCE_FULL_URL, None, None, None,
+                FakePrivateKey(), None, oauth_params), expected)
+        finally:
+            self.pool.uninstall()
+        self.assertEqual(SIGNATURE_METHOD_MAP[SIGNATURE_METHOD_RSA_SHA1],
+                         generate_rsa_sha1_signature)
+        self.assertEqual(SIGNATURE_METHOD_REGISTRY[SIGNATURE_METHOD_RSA_SHA1],
+                         entry)
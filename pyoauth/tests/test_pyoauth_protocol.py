@@ -17,19 +17,29 @@
 # under the License.
 
 
+import base64
+import hashlib
+import io
+import mmap
+import random
+import tempfile
+import threading
 import unittest2
 
 from mom.builtins import is_bytes_or_unicode, is_bytes, b
 from mom.codec import bytes_to_integer, base64_decode
 from mom.codec.text import utf8_encode, utf8_decode
+from mom.security.hash import hmac_sha1_base64_digest
 
 from pyoauth.constants import HTTP_POST, HTTP_GET, OAUTH_VERSION_1, \
     OAUTH_PARAM_CONSUMER_SECRET, OAUTH_PARAM_TOKEN_SECRET, \
     OAUTH_PARAM_SIGNATURE, OAUTH_PARAM_REALM, OAUTH_PARAM_NONCE, \
     OAUTH_PARAM_TIMESTAMP, OAUTH_PARAM_CONSUMER_KEY, \
-    OAUTH_PARAM_SIGNATURE_METHOD, OAUTH_PARAM_VERSION, OAUTH_PARAM_TOKEN
+    OAUTH_PARAM_SIGNATURE_METHOD, OAUTH_PARAM_VERSION, OAUTH_PARAM_TOKEN, \
+    OAUTH_PARAM_BODY_HASH, OAUTH_PARAM_VERIFIER
 from pyoauth.oauth1 import SIGNATURE_METHOD_HMAC_SHA1, \
-    SIGNATURE_METHOD_RSA_SHA1, SIGNATURE_METHOD_PLAINTEXT
+    SIGNATURE_METHOD_RSA_SHA1, SIGNATURE_METHOD_PLAINTEXT, \
+    SIGNATURE_METHOD_HMAC_SHA256, SIGNATURE_METHOD_HMAC_SHA512
 
 from pyoauth.tests.constants import constants, \
     RFC_REALM, RFC_TEMP_URI, RFC_CLIENT_SECRET, \
@@ -40,13 +50,17 @@ from pyoauth.tests.constants import constants, \
     RFC_TIMESTAMP_2, RFC_OAUTH_VERIFIER, \
     RFC_TEMPORARY_IDENTIFIER, RFC_TEMPORARY_SECRET, \
     RFC_NONCE_3, RFC_TIMESTAMP_3, RFC_TEMP_REQUEST_SIGNATURE, \
-    RFC_TOKEN_REQUEST_SIGNATURE, RFC_RESOURCE_REQUEST_SIGNATURE
+    RFC_TOKEN_REQUEST_SIGNATURE, RFC_RESOURCE_REQUEST_SIGNATURE, \
+    BAD_SIGNATURE, BAD_SIGNATURE_METHOD
 
 from pyoauth.error import \
     InvalidOAuthParametersError, \
     InvalidAuthorizationHeaderError, \
     InvalidHttpMethodError, \
-    InvalidUrlError
+    InvalidUrlError, \
+    InvalidSignatureMethodError, \
+    InsecureOAuthParametersError
+from pyoauth.url import ParsedUrl, PERCENT_ENCODE_CACHE
 from pyoauth.oauth1.protocol import parse_authorization_header, \
     generate_base_string_query, \
     generate_authorization_header, \
@@ -54,13 +68,30 @@ from pyoauth.oauth1.protocol import parse_authorization_header, \
     _generate_hex_verification_code, \
     generate_timestamp, \
     generate_hmac_sha1_signature, \
+    verify_hmac_sha1_signature, \
     generate_rsa_sha1_signature, \
     verify_rsa_sha1_signature, \
     generate_plaintext_signature, \
     generate_base_string, \
     _generate_plaintext_signature, \
     generate_nonce, _authorization_header_strip_scheme, \
-    _authorization_header_parse_param, generate_client_secret
+    _authorization_header_parse_param, generate_client_secret, \
+    HMAC_SHA1_KEY_CACHE, HMAC_SHA1_PREFIX_CACHE, \
+    generate_hmac_sha1_prefix_signature, _base_string_static_prefix_length, \
+    RSA_KEY_CACHE, invalidate_rsa_key, generate_rsa_sha1_crt_signature, \
+    _RsaCrtPrivateKey, _inverse_mod, _uint_to_bytes, _bytes_to_uint, \
+    _parse_rsa_key, _RSA_CRT_PRIVATE_KEY, \
+    verify_many, HmacSha1Verifier, BaseStringBuilder, BaseStringTemplate, \
+    AuthorizationHeaderTemplate, generate_nonces, generate_client_secrets, \
+    generate_verification_codes, generate_verification_code, \
+    TimestampClock, FrozenClock, CRYPTO_BACKENDS, set_crypto_backend, \
+    get_crypto_backend, generate_hmac_sha256_signature, \
+    generate_hmac_sha512_signature, verify_hmac_sha256_signature, \
+    verify_hmac_sha512_signature, HMAC_SHA256_KEY_CACHE, \
+    SIGNATURE_METHOD_REGISTRY, register_signature_method, \
+    unregister_signature_method, get_signature_method, verify_signature, \
+    generate_body_hash, spool_body, FormBodyBaseStringBuilder, \
+    generate_chunked_signature, _ExternalPairSorter
 
 
 class Test_generate_nonce(unittest2.TestCase):
@@ -78,6 +109,23 @@ class Test_generate_nonce(unittest2.TestCase):
         self.assertTrue(value >= 0 and value < (1 << 64)) # 2**64
 
 
+class Test_generate_nonces(unittest2.TestCase):
+    def test_count_and_uniqueness(self):
+        nonces = generate_nonces(100)
+        self.assertEqual(len(nonces), 100)
+        self.assertEqual(len(set(nonces)), 100)
+
+    def test_range(self):
+        for nonce in generate_nonces(100, 64):
+            self.assertTrue(is_bytes(nonce))
+            value = int(nonce)
+            self.assertTrue(value >= 0 and value < (1 << 64))
+
+    def test_odd_bit_size(self):
+        for nonce in generate_nonces(100, 12):
+            self.assertTrue(int(nonce) < (1 << 12))
+
+
 class Test_generate_client_secret(unittest2.TestCase):
     def test_uniqueness(self):
         self.assertNotEqual(generate_client_secret(), generate_client_secret())
@@ -92,6 +140,24 @@ class Test_generate_client_secret(unittest2.TestCase):
             self.assertTrue(value >= 0 and value < (1 << n_bits)) # 2**n_bits
 
 
+class Test_generate_client_secrets(unittest2.TestCase):
+    def test_range(self):
+        secrets = generate_client_secrets(50)
+        self.assertEqual(len(set(secrets)), 50)
+        for secret in secrets:
+            value = bytes_to_integer(base64_decode(secret))
+            self.assertTrue(value >= 0 and value < (1 << 144))
+
+
+class Test_generate_verification_codes(unittest2.TestCase):
+    def test_count_and_uniqueness(self):
+        codes = generate_verification_codes(50)
+        self.assertEqual(len(set(codes)), 50)
+        self.assertTrue(all(is_bytes(code) for code in codes))
+        self.assertNotEqual(generate_verification_code(),
+                            generate_verification_code())
+
+
 class Test_generate_verification_code(unittest2.TestCase):
     def test_length(self):
         default_length = 8
@@ -131,6 +197,67 @@ class Test_generate_timestamp(unittest2.TestCase):
         self.assertTrue(len(generate_timestamp()) > 0,
                     "Timestamp is an empty string.")
 
+    def test_uses_clock(self):
+        self.assertEqual(generate_timestamp(FrozenClock(1191242096)),
+                         b("1191242096"))
+
+
+class Test_TimestampClock(unittest2.TestCase):
+    def test_formats_once_per_second(self):
+        now = [1191242096.1]
+        clock = TimestampClock(lambda: now[0])
+        first = clock.timestamp()
+        self.assertEqual(first, b("1191242096"))
+        now[0] = 1191242096.9
+        self.assertTrue(clock.timestamp() is first)
+
+    def test_second_boundary(self):
+        now = [1191242096.999]
+        clock = TimestampClock(lambda: now[0])
+        self.assertEqual(clock.timestamp(), b("1191242096"))
+        now[0] = 1191242097.0
+        self.assertEqual(clock.timestamp(), b("1191242097"))
+        self.assertEqual(clock.time(), 1191242097)
+
+    def test_concurrent_timestamps_match_time(self):
+        now = [1191242096.0]
+        clock = TimestampClock(lambda: now[0])
+        errors = []
+
+        def worker():
+            for _ in range(2000):
+                seconds = int(now[0])
+                value = int(clock.timestamp())
+                # The clock never goes back and never runs ahead of the
+                # source it was read from.
+                if value < seconds or value > int(now[0]):
+                    errors.append((seconds, value))
+
+        def ticker():
+            for _ in range(2000):
+                now[0] += 0.5
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        threads.append(threading.Thread(target=ticker))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+
+class Test_FrozenClock(unittest2.TestCase):
+    def test_set_and_advance(self):
+        clock = FrozenClock(1191242096)
+        self.assertEqual(clock.timestamp(), b("1191242096"))
+        self.assertEqual(clock.timestamp(), b("1191242096"))
+        clock.advance()
+        self.assertEqual(clock.timestamp(), b("1191242097"))
+        clock.advance(10)
+        self.assertEqual(clock.timestamp(), b("1191242107"))
+        clock.set(1318467427)
+        self.assertEqual(clock.timestamp(), b("1318467427"))
+
 
 class Test_generate_hmac_sha1_signature(unittest2.TestCase):
     _examples = (
@@ -202,6 +329,265 @@ class Test_generate_hmac_sha1_signature(unittest2.TestCase):
                              token_shared_secret
                          ))
 
+    def test_keyed_state_is_cached_per_secrets(self):
+        HMAC_SHA1_KEY_CACHE.clear()
+        base_string = b("POST&http%3A%2F%2Fexample.com%2F&a%3Db")
+        first = generate_hmac_sha1_signature(base_string,
+                                             RFC_CLIENT_SECRET,
+                                             RFC_TOKEN_SECRET)
+        second = generate_hmac_sha1_signature(base_string,
+                                              RFC_CLIENT_SECRET,
+                                              RFC_TOKEN_SECRET)
+        self.assertEqual(first, second)
+        self.assertEqual(HMAC_SHA1_KEY_CACHE.misses, 1)
+        self.assertEqual(HMAC_SHA1_KEY_CACHE.hits, 1)
+        # A different pair of secrets must not reuse the cached state.
+        self.assertNotEqual(first,
+                            generate_hmac_sha1_signature(base_string,
+                                                         RFC_CLIENT_SECRET,
+                                                         RFC_TEMPORARY_SECRET))
+        self.assertEqual(HMAC_SHA1_KEY_CACHE.misses, 2)
+
+    def test_verify_uses_cached_state(self):
+        base_string = b("GET&http%3A%2F%2Fexample.com%2F&a%3Db")
+        signature = generate_hmac_sha1_signature(base_string,
+                                                 RFC_CLIENT_SECRET,
+                                                 RFC_TOKEN_SECRET)
+        self.assertEqual(verify_hmac_sha1_signature(signature,
+                                                    base_string,
+                                                    RFC_CLIENT_SECRET,
+                                                    RFC_TOKEN_SECRET),
+                         (True, None))
+        self.assertEqual(verify_hmac_sha1_signature(signature,
+                                                    base_string + b("x"),
+                                                    RFC_CLIENT_SECRET,
+                                                    RFC_TOKEN_SECRET),
+                         (False, "Invalid signature"))
+
+
+class Test_HmacSha1Verifier(unittest2.TestCase):
+    base_string = b("GET&http%3A%2F%2Fexample.com%2F&a%3Db")
+
+    def setUp(self):
+        self.signature = generate_hmac_sha1_signature(self.base_string,
+                                                      RFC_CLIENT_SECRET,
+                                                      RFC_TOKEN_SECRET)
+        # Signed with an un-encoded key; see the debug tests in
+        # verify_hmac_sha1_signature.
+        self.bad_signature = generate_hmac_sha1_signature(self.base_string,
+                                                          RFC_CLIENT_SECRET)
+
+    def test_valid_signature(self):
+        for mode in ("off", "lazy", "sampled"):
+            verifier = HmacSha1Verifier(mode)
+            self.assertEqual(verifier.verify(self.signature,
+                                             self.base_string,
+                                             RFC_CLIENT_SECRET,
+                                             RFC_TOKEN_SECRET),
+                             (True, None))
+
+    def test_off(self):
+        verifier = HmacSha1Verifier(HmacSha1Verifier.DIAGNOSTICS_OFF)
+        self.assertEqual(verifier.verify(self.bad_signature,
+                                         self.base_string,
+                                         RFC_CLIENT_SECRET,
+                                         RFC_TOKEN_SECRET),
+                         (False, "Invalid signature"))
+
+    def test_lazy_matches_debug_message(self):
+        verifier = HmacSha1Verifier()
+        check_ok, error = verifier.verify(self.bad_signature,
+                                          self.base_string,
+                                          RFC_CLIENT_SECRET,
+                                          RFC_TOKEN_SECRET)
+        self.assertFalse(check_ok)
+        self.assertEqual(str(error),
+                         verify_hmac_sha1_signature(self.bad_signature,
+                                                    self.base_string,
+                                                    RFC_CLIENT_SECRET,
+                                                    RFC_TOKEN_SECRET,
+                                                    debug=True)[1])
+        self.assertEqual(error.message, str(error))
+
+    def test_lazy_does_not_keep_secrets(self):
+        verifier = HmacSha1Verifier()
+        error = verifier.verify(self.bad_signature, self.base_string,
+                                RFC_CLIENT_SECRET, RFC_TOKEN_SECRET)[1]
+        pending = [error.__dict__]
+        while pending:
+            value = pending.pop()
+            if isinstance(value, dict):
+                pending.extend(value.values())
+            elif isinstance(value, (tuple, list)):
+                pending.extend(value)
+            elif is_bytes(value):
+                self.assertFalse(RFC_CLIENT_SECRET in value)
+                self.assertFalse(RFC_TOKEN_SECRET in value)
+        self.assertTrue(str(error).startswith("Invalid signature: "))
+
+    def test_lazy_keeps_no_state_keyed_with_the_signing_key(self):
+        verifier = HmacSha1Verifier()
+        message = b("any message")
+        for secrets in ((b("secret"), None),
+                        (b("secret"), b("token")),
+                        (None, b("token")),
+                        (RFC_CLIENT_SECRET, RFC_TOKEN_SECRET)):
+            error = verifier.verify(BAD_SIGNATURE, self.base_string,
+                                    *secrets)[1]
+            forged = generate_hmac_sha1_signature(message, *secrets)
+            for (inner, outer), _ in error._args[2]:
+                inner = inner.copy()
+                inner.update(message)
+                outer = outer.copy()
+                outer.update(inner.digest())
+                self.assertNotEqual(base64_encode(outer.digest()), forged)
+
+    def test_sampled_restarts_after_join(self):
+        messages = []
+        verifier = HmacSha1Verifier(HmacSha1Verifier.DIAGNOSTICS_SAMPLED,
+                                    sample_rate=1,
+                                    callback=lambda *args: messages.append(args))
+        for _ in range(2):
+            verifier.verify(self.bad_signature, self.base_string,
+                            RFC_CLIENT_SECRET, RFC_TOKEN_SECRET)
+            verifier.join()
+        self.assertEqual(len(messages), 2)
+
+    def test_sampled(self):
+        messages = []
+        verifier = HmacSha1Verifier(HmacSha1Verifier.DIAGNOSTICS_SAMPLED,
+                                    sample_rate=3,
+                                    callback=lambda *args: messages.append(args))
+        for _ in range(7):
+            self.assertEqual(verifier.verify(self.bad_signature,
+                                             self.base_string,
+                                             RFC_CLIENT_SECRET,
+                                             RFC_TOKEN_SECRET),
+                             (False, "Invalid signature"))
+        verifier.join()
+        self.assertEqual(len(messages), 2)
+        message, signature, base_string = messages[0]
+        self.assertTrue(message.startswith("Invalid signature: "))
+        self.assertEqual(signature, self.bad_signature)
+        self.assertEqual(base_string, self.base_string)
+
+    def test_sampled_queue_full_drops_failures(self):
+        verifier = HmacSha1Verifier(HmacSha1Verifier.DIAGNOSTICS_SAMPLED,
+                                    sample_rate=1, queue_size=1,
+                                    callback=lambda *args: None)
+        # Fill the queue without a consumer; further failures must not block.
+        verifier._thread = object()
+        for _ in range(5):
+            verifier.verify(self.bad_signature, self.base_string,
+                            RFC_CLIENT_SECRET, RFC_TOKEN_SECRET)
+        self.assertEqual(verifier._queue.qsize(), 1)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, HmacSha1Verifier, "verbose")
+        self.assertRaises(ValueError, HmacSha1Verifier,
+                          HmacSha1Verifier.DIAGNOSTICS_SAMPLED, 0)
+
+
+class Test_generate_hmac_sha1_prefix_signature(unittest2.TestCase):
+    def setUp(self):
+        HMAC_SHA1_PREFIX_CACHE.clear()
+
+    def test_matches_generate_hmac_sha1_signature(self):
+        for example in Test_generate_hmac_sha1_signature._examples:
+            base_string = generate_base_string(example["method"],
+                                               example["url"],
+                                               example["oauth_params"])
+            for prefix_key in (None, (example["method"], example["url"])):
+                # Twice, so that the second call uses the cached state.
+                for _ in range(2):
+                    self.assertEqual(example[OAUTH_PARAM_SIGNATURE],
+                                     generate_hmac_sha1_prefix_signature(
+                                         base_string,
+                                         example[OAUTH_PARAM_CONSUMER_SECRET],
+                                         example[OAUTH_PARAM_TOKEN_SECRET],
+                                         prefix_key=prefix_key))
+
+    def test_reuses_prefix_across_nonces(self):
+        url = b("http://example.com/photos?size=original")
+        for nonce in (b("a"), b("b"), b("c")):
+            oauth_params = dict(oauth_consumer_key=RFC_CLIENT_IDENTIFIER,
+                                oauth_nonce=nonce,
+                                oauth_timestamp=RFC_TIMESTAMP_1)
+            base_string = generate_base_string(HTTP_GET, url, oauth_params)
+            self.assertEqual(
+                generate_hmac_sha1_prefix_signature(base_string,
+                                                    RFC_CLIENT_SECRET,
+                                                    RFC_TOKEN_SECRET,
+                                                    prefix_key=url),
+                generate_hmac_sha1_signature(base_string,
+                                             RFC_CLIENT_SECRET,
+                                             RFC_TOKEN_SECRET))
+        self.assertEqual(HMAC_SHA1_PREFIX_CACHE.misses, 1)
+        self.assertEqual(HMAC_SHA1_PREFIX_CACHE.hits, 2)
+
+    def test_reuses_prefix_across_body_hashes(self):
+        url = b("http://example.com/photos")
+        for body in (b("a"), b("b"), b("c")):
+            oauth_params = dict(oauth_body_hash=generate_body_hash(body),
+                                oauth_consumer_key=RFC_CLIENT_IDENTIFIER,
+                                oauth_nonce=body,
+                                oauth_timestamp=RFC_TIMESTAMP_1)
+            base_string = generate_base_string(b("PUT"), url, oauth_params)
+            self.assertEqual(
+                generate_hmac_sha1_prefix_signature(base_string,
+                                                    RFC_CLIENT_SECRET,
+                                                    RFC_TOKEN_SECRET,
+                                                    prefix_key=url),
+                generate_hmac_sha1_signature(base_string,
+                                             RFC_CLIENT_SECRET,
+                                             RFC_TOKEN_SECRET))
+        self.assertEqual(len(HMAC_SHA1_PREFIX_CACHE), 1)
+        self.assertEqual(HMAC_SHA1_PREFIX_CACHE.misses, 1)
+        self.assertEqual(HMAC_SHA1_PREFIX_CACHE.hits, 2)
+
+    def test_stale_prefix_key_is_refreshed(self):
+        oauth_params = dict(oauth_consumer_key=RFC_CLIENT_IDENTIFIER,
+                            oauth_nonce=RFC_NONCE_1,
+                            oauth_timestamp=RFC_TIMESTAMP_1)
+        for url in (b("http://example.com/a"), b("http://example.com/b")):
+            base_string = generate_base_string(HTTP_GET, url, oauth_params)
+            self.assertEqual(
+                generate_hmac_sha1_prefix_signature(base_string,
+                                                    RFC_CLIENT_SECRET,
+                                                    prefix_key="same key"),
+                generate_hmac_sha1_signature(base_string, RFC_CLIENT_SECRET))
+
+    def test_base_string_without_nonce(self):
+        base_string = generate_base_string(HTTP_GET,
+                                           b("http://example.com/?a=b"),
+                                           {})
+        self.assertEqual(
+            generate_hmac_sha1_prefix_signature(base_string,
+                                                RFC_CLIENT_SECRET),
+            generate_hmac_sha1_signature(base_string, RFC_CLIENT_SECRET))
+        self.assertEqual(len(HMAC_SHA1_PREFIX_CACHE), 0)
+
+
+class Test__base_string_static_prefix_length(unittest2.TestCase):
+    def test_prefix_ends_before_first_volatile_param(self):
+        base_string = b("GET&http%3A%2F%2Fa.com%2F&"
+                        "a%3D1%26oauth_nonce%3D42%26oauth_timestamp%3D1")
+        self.assertEqual(
+            base_string[:_base_string_static_prefix_length(base_string)],
+            b("GET&http%3A%2F%2Fa.com%2F&a%3D1%26"))
+
+    def test_volatile_param_first(self):
+        base_string = b("GET&http%3A%2F%2Fa.com%2F&"
+                        "oauth_nonce%3D42%26oauth_timestamp%3D1")
+        self.assertEqual(
+            base_string[:_base_string_static_prefix_length(base_string)],
+            b("GET&http%3A%2F%2Fa.com%2F&"))
+
+    def test_ignores_url_and_double_encoded_values(self):
+        base_string = b("GET&http%3A%2F%2Fa.com%2Fx%26oauth_nonce%3D&"
+                        "a%3D%2526oauth_nonce%253D1")
+        self.assertEqual(_base_string_static_prefix_length(base_string), 0)
+
 
 class Test_generate_and_verify_rsa_sha1_signature(unittest2.TestCase):
     def setUp(self):
@@ -286,6 +672,469 @@ yF8iY2ZZ/5D1ilgeijhV/vBka5twt399mXwaYdCwFYE="),
                 base_string,
                 public_key))
 
+    def test_parsed_keys_are_cached_and_invalidated(self):
+        invalidate_rsa_key()
+        example = self._examples[0]
+        base_string = generate_base_string(example["method"],
+                                           example["url"],
+                                           example["oauth_params"])
+        for _ in range(3):
+            self.assertEqual(example[OAUTH_PARAM_SIGNATURE],
+                             generate_rsa_sha1_signature(
+                                 base_string, example["private_key"]))
+            self.assertTrue(verify_rsa_sha1_signature(
+                example[OAUTH_PARAM_SIGNATURE],
+                base_string,
+                example["certificate"]))
+        self.assertEqual(RSA_KEY_CACHE.misses, 2)
+        self.assertEqual(RSA_KEY_CACHE.hits, 4)
+
+        self.assertTrue(invalidate_rsa_key(example["private_key"]))
+        self.assertFalse(invalidate_rsa_key(example["private_key"]))
+        self.assertEqual(len(RSA_KEY_CACHE), 1)
+        self.assertTrue(invalidate_rsa_key())
+        self.assertEqual(len(RSA_KEY_CACHE), 0)
+
+    def test_crt_signature_matches_generate_rsa_sha1_signature(self):
+        for example in self._examples:
+            base_string = generate_base_string(example["method"],
+                                               example["url"],
+                                               example["oauth_params"])
+            # Several times, so that the blinding factors are updated.
+            for _ in range(3):
+                self.assertEqual(
+                    generate_rsa_sha1_crt_signature(base_string,
+                                                    example["private_key"]),
+                    generate_rsa_sha1_signature(base_string,
+                                                example["private_key"]))
+            self.assertEqual(
+                generate_rsa_sha1_crt_signature(base_string,
+                                                example["private_key"]),
+                example[OAUTH_PARAM_SIGNATURE])
+
+    def test_accepts_parsed_key_objects(self):
+        class FakeKey(object):
+            def pkcs1_v1_5_sign(self, digest):
+                return digest
+
+            def pkcs1_v1_5_verify(self, digest, signature_bytes):
+                return digest == signature_bytes
+
+        base_string = b("GET&http%3A%2F%2Fexample.com%2F&a%3Db")
+        signature = generate_rsa_sha1_signature(base_string, FakeKey())
+        self.assertTrue(verify_rsa_sha1_signature(signature,
+                                                  base_string,
+                                                  FakeKey()))
+        self.assertFalse(verify_rsa_sha1_signature(signature,
+                                                   base_string + b("x"),
+                                                   FakeKey()))
+
+
+class _FakeRsaKey(object):
+    """Stand-in for a parsed RSA key whose signature is the digest."""
+    def pkcs1_v1_5_sign(self, digest):
+        return digest
+
+    def pkcs1_v1_5_verify(self, digest, signature_bytes):
+        return digest == signature_bytes
+
+
+class Test_verify_many(unittest2.TestCase):
+    def setUp(self):
+        self.base_strings = [b("GET&http%3A%2F%2Fexample.com%2F&n%3D") +
+                             b(str(i)) for i in range(10)]
+
+    def test_hmac_sha1_results_in_order(self):
+        secrets = (RFC_CLIENT_SECRET, RFC_TOKEN_SECRET)
+        other_secrets = (RFC_CLIENT_SECRET, None)
+        requests = []
+        expected = []
+        for i, base_string in enumerate(self.base_strings):
+            key = secrets if i % 2 else other_secrets
+            signature = generate_hmac_sha1_signature(base_string, *key)
+            if i % 3 == 0:
+                # Corrupt every third signature.
+                signature = BAD_SIGNATURE
+            requests.append((signature, base_string, key,
+                             SIGNATURE_METHOD_HMAC_SHA1))
+            expected.append(i % 3 != 0)
+        self.assertEqual(verify_many(requests), expected)
+
+    def test_mixed_methods(self):
+        secrets = (RFC_CLIENT_SECRET, RFC_TOKEN_SECRET)
+        base_string = self.base_strings[0]
+        requests = [
+            (generate_plaintext_signature(base_string, *secrets),
+             base_string, secrets, SIGNATURE_METHOD_PLAINTEXT),
+            (BAD_SIGNATURE, base_string, secrets, SIGNATURE_METHOD_PLAINTEXT),
+            (generate_hmac_sha1_signature(base_string, *secrets),
+             base_string, secrets, SIGNATURE_METHOD_HMAC_SHA1),
+            (generate_rsa_sha1_signature(base_string, _FakeRsaKey()),
+             base_string, _FakeRsaKey(), SIGNATURE_METHOD_RSA_SHA1),
+            (BAD_SIGNATURE, base_string, _FakeRsaKey(),
+             SIGNATURE_METHOD_RSA_SHA1),
+        ]
+        self.assertEqual(verify_many(requests),
+                         [True, False, True, True, False])
+
+    def test_rsa_sha1_with_pool(self):
+        from multiprocessing.pool import ThreadPool
+
+        key = _FakeRsaKey()
+        requests = [(generate_rsa_sha1_signature(base_string, key),
+                     base_string, key, SIGNATURE_METHOD_RSA_SHA1)
+                    for base_string in self.base_strings]
+        requests[4] = (requests[3][0],) + requests[4][1:]
+        pool = ThreadPool(2)
+        try:
+            results = verify_many(requests, pool=pool)
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual(results, [i != 4 for i in range(10)])
+
+    def test_empty(self):
+        self.assertEqual(verify_many([]), [])
+
+    def test_InvalidSignatureMethodError_when_unknown_method(self):
+        self.assertRaises(InvalidSignatureMethodError, verify_many,
+                          [(BAD_SIGNATURE, self.base_strings[0],
+                            (RFC_CLIENT_SECRET, None), BAD_SIGNATURE_METHOD)])
+
+
+class Test_generate_and_verify_hmac_sha2_signatures(unittest2.TestCase):
+    base_string = b("GET&http%3A%2F%2Fphotos.example.net%2Fphotos&"
+                    "file%3Dvacation.jpg%26oauth_consumer_key%3D"
+                    "dpf43f3p2l4k3l03%26oauth_nonce%3Dkllo9940pd9333jh%26"
+                    "oauth_signature_method%3DHMAC-SHA1%26oauth_timestamp%3D"
+                    "1191242096%26oauth_token%3Dnnch734d00sl2jdk%26"
+                    "oauth_version%3D1.0%26size%3Doriginal")
+    sha256_signature = b("0gCtTYQAxqCKhIE0sltgx7UgHkAs10vrpuYE7xpRBnE=")
+    sha512_signature = b("gBVfbUzGSfMEYIR09OrlLdmvyHsZOHxquCzEAblZY3b4ycWEp2v"
+                         "mFO4FMlSowJfsc7QZODjKLsqjjvtd+xkeEQ==")
+
+    def test_hmac_sha256(self):
+        self.assertEqual(generate_hmac_sha256_signature(self.base_string,
+                                                        RFC_CLIENT_SECRET,
+                                                        RFC_TOKEN_SECRET),
+                         self.sha256_signature)
+        self.assertEqual(verify_hmac_sha256_signature(self.sha256_signature,
+                                                      self.base_string,
+                                                      RFC_CLIENT_SECRET,
+                                                      RFC_TOKEN_SECRET),
+                         (True, None))
+        self.assertEqual(verify_hmac_sha256_signature(self.sha256_signature,
+                                                      self.base_string,
+                                                      RFC_CLIENT_SECRET),
+                         (False, "Invalid signature"))
+
+    def test_hmac_sha512(self):
+        self.assertEqual(generate_hmac_sha512_signature(self.base_string,
+                                                        RFC_CLIENT_SECRET,
+                                                        RFC_TOKEN_SECRET),
+                         self.sha512_signature)
+        self.assertTrue(verify_hmac_sha512_signature(self.sha512_signature,
+                                                     self.base_string,
+                                                     RFC_CLIENT_SECRET,
+                                                     RFC_TOKEN_SECRET)[0])
+
+    def test_keyed_state_is_cached(self):
+        HMAC_SHA256_KEY_CACHE.clear()
+        for _ in range(3):
+            generate_hmac_sha256_signature(self.base_string,
+                                           RFC_CLIENT_SECRET,
+                                           RFC_TOKEN_SECRET)
+        self.assertEqual(HMAC_SHA256_KEY_CACHE.misses, 1)
+        self.assertEqual(HMAC_SHA256_KEY_CACHE.hits, 2)
+
+    def test_verify_many(self):
+        secrets = (RFC_CLIENT_SECRET, RFC_TOKEN_SECRET)
+        self.assertEqual(verify_many([
+            (self.sha256_signature, self.base_string, secrets,
+             SIGNATURE_METHOD_HMAC_SHA256),
+            (self.sha512_signature, self.base_string, secrets,
+             SIGNATURE_METHOD_HMAC_SHA512),
+            (self.sha256_signature, self.base_string, secrets,
+             SIGNATURE_METHOD_HMAC_SHA512),
+        ]), [True, True, False])
+
+
+class Test_signature_method_registry(unittest2.TestCase):
+    def tearDown(self):
+        unregister_signature_method(b("REVERSED"))
+
+    def test_builtin_methods(self):
+        for signature_method in (SIGNATURE_METHOD_HMAC_SHA1,
+                                 SIGNATURE_METHOD_HMAC_SHA256,
+                                 SIGNATURE_METHOD_HMAC_SHA512,
+                                 SIGNATURE_METHOD_RSA_SHA1,
+                                 SIGNATURE_METHOD_PLAINTEXT):
+            self.assertTrue(signature_method in SIGNATURE_METHOD_REGISTRY)
+        self.assertRaises(InvalidSignatureMethodError,
+                          get_signature_method, BAD_SIGNATURE_METHOD)
+
+    def test_verify_signature(self):
+        base_string = b("GET&http%3A%2F%2Fexample.com%2F&a%3Db")
+        secrets = (RFC_CLIENT_SECRET, RFC_TOKEN_SECRET)
+        for signature_method in (SIGNATURE_METHOD_HMAC_SHA1,
+                                 SIGNATURE_METHOD_HMAC_SHA256,
+                                 SIGNATURE_METHOD_HMAC_SHA512,
+                                 SIGNATURE_METHOD_PLAINTEXT):
+            sign_func = get_signature_method(signature_method)[0]
+            signature = sign_func(base_string, *secrets)
+            self.assertTrue(verify_signature(signature, base_string, secrets,
+                                             signature_method))
+            self.assertFalse(verify_signature(BAD_SIGNATURE, base_string,
+                                              secrets, signature_method))
+        signature = generate_rsa_sha1_signature(base_string, _FakeRsaKey())
+        self.assertTrue(verify_signature(signature, base_string,
+                                         _FakeRsaKey(),
+                                         SIGNATURE_METHOD_RSA_SHA1))
+        self.assertRaises(InvalidSignatureMethodError, verify_signature,
+                          BAD_SIGNATURE, base_string, secrets,
+                          BAD_SIGNATURE_METHOD)
+
+    def test_register_and_unregister(self):
+        def sign(base_string, client_shared_secret, token_shared_secret=None):
+            return base_string[::-1]
+
+        def verify(signature, base_string, key):
+            return signature == base_string[::-1]
+
+        register_signature_method(b("REVERSED"), sign, verify)
+        self.assertEqual(get_signature_method(b("REVERSED")), (sign, verify))
+        self.assertTrue(verify_signature(b("cba"), b("abc"), None,
+                                         b("REVERSED")))
+        self.assertEqual(verify_many([
+            (b("cba"), b("abc"), [RFC_CLIENT_SECRET], b("REVERSED")),
+            (b("abc"), b("abc"), [RFC_CLIENT_SECRET], b("REVERSED")),
+        ]), [True, False])
+        self.assertTrue(unregister_signature_method(b("REVERSED")))
+        self.assertFalse(unregister_signature_method(b("REVERSED")))
+        self.assertRaises(InvalidSignatureMethodError,
+                          verify_many,
+                          [(b("cba"), b("abc"), None, b("REVERSED"))])
+
+
+_BODY = b("{\"photos\": [") + b("1, ") * 50000 + b("2]}")
+_BODY_HASH = base64.b64encode(hashlib.sha1(_BODY).digest())
+
+
+class Test_generate_body_hash(unittest2.TestCase):
+    def test_empty_body(self):
+        self.assertEqual(generate_body_hash(b("")),
+                         b("2jmj7l5rSw0yVb/vlWAYkK/YBwk="))
+
+    def test_bytes_and_buffers(self):
+        self.assertEqual(generate_body_hash(_BODY), _BODY_HASH)
+        self.assertEqual(generate_body_hash(bytearray(_BODY)),
+                         _BODY_HASH)
+        self.assertEqual(generate_body_hash(memoryview(_BODY)),
+                         _BODY_HASH)
+
+    def test_file_is_rewound(self):
+        body = io.BytesIO(b("skipped") + _BODY)
+        body.seek(len(b("skipped")))
+        self.assertEqual(generate_body_hash(body, chunk_size=4096),
+                         _BODY_HASH)
+        self.assertEqual(body.tell(), len(b("skipped")))
+        self.assertEqual(body.read(), _BODY)
+
+    def test_mmap(self):
+        temp = tempfile.TemporaryFile()
+        try:
+            temp.write(_BODY)
+            temp.flush()
+            mapped = mmap.mmap(temp.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                self.assertEqual(generate_body_hash(mapped), _BODY_HASH)
+                self.assertEqual(mapped.tell(), 0)
+            finally:
+                mapped.close()
+        finally:
+            temp.close()
+
+    def test_iterator(self):
+        chunks = iter([_BODY[:1000], _BODY[1000:]])
+        self.assertEqual(generate_body_hash(chunks), _BODY_HASH)
+
+    def test_digestmod(self):
+        self.assertEqual(generate_body_hash(_BODY,
+                                            digestmod=hashlib.sha256),
+                         base64.b64encode(hashlib.sha256(_BODY).digest()))
+
+
+class Test_spool_body(unittest2.TestCase):
+    def test_spools_iterator(self):
+        chunks = (_BODY[i:i + 1000] for i in range(0, len(_BODY), 1000))
+        spool, body_hash, length = spool_body(chunks, max_memory=4096)
+        try:
+            self.assertEqual(body_hash, _BODY_HASH)
+            self.assertEqual(length, len(_BODY))
+            self.assertEqual(spool.tell(), 0)
+            self.assertEqual(spool.read(), _BODY)
+        finally:
+            spool.close()
+
+    def test_spools_file(self):
+        spool, body_hash, length = spool_body(io.BytesIO(b("abc")),
+                                              chunk_size=2)
+        try:
+            self.assertEqual(body_hash, generate_body_hash(b("abc")))
+            self.assertEqual(length, 3)
+            self.assertEqual(spool.read(), b("abc"))
+        finally:
+            spool.close()
+
+
+class Test_crypto_backends(unittest2.TestCase):
+    def setUp(self):
+        self._backend = get_crypto_backend()
+        HMAC_SHA1_KEY_CACHE.clear()
+        HMAC_SHA1_PREFIX_CACHE.clear()
+
+    def tearDown(self):
+        set_crypto_backend(self._backend)
+
+    def _run_with_each_backend(self, func):
+        results = {}
+        for name in CRYPTO_BACKENDS:
+            set_crypto_backend(name)
+            results[name] = func()
+        self.assertEqual(len(set(results.values())), 1, results)
+        return results[self._backend]
+
+    def test_select_backend(self):
+        self.assertEqual(get_crypto_backend(), "stdlib")
+        self.assertEqual(set_crypto_backend("mom"), "stdlib")
+        self.assertEqual(get_crypto_backend(), "mom")
+        self.assertRaises(ValueError, set_crypto_backend, "openssl")
+        self.assertEqual(get_crypto_backend(), "mom")
+
+    def test_hmac_sha1_signatures(self):
+        for example in Test_generate_hmac_sha1_signature._examples:
+            base_string = generate_base_string(example["method"],
+                                               example["url"],
+                                               example["oauth_params"])
+            secrets = (example[OAUTH_PARAM_CONSUMER_SECRET],
+                       example[OAUTH_PARAM_TOKEN_SECRET])
+            signature = example[OAUTH_PARAM_SIGNATURE]
+            self.assertEqual(self._run_with_each_backend(
+                lambda: generate_hmac_sha1_signature(base_string, *secrets)),
+                signature)
+            self.assertEqual(self._run_with_each_backend(
+                lambda: generate_hmac_sha1_prefix_signature(base_string,
+                                                            *secrets)),
+                signature)
+            self.assertEqual(self._run_with_each_backend(
+                lambda: verify_hmac_sha1_signature(signature, base_string,
+                                                   *secrets)),
+                (True, None))
+            self.assertEqual(self._run_with_each_backend(
+                lambda: tuple(verify_many([
+                    (signature, base_string, secrets,
+                     SIGNATURE_METHOD_HMAC_SHA1),
+                    (BAD_SIGNATURE, base_string, secrets,
+                     SIGNATURE_METHOD_HMAC_SHA1),
+                ]))),
+                (True, False))
+
+    def test_hmac_sha1_diagnosis(self):
+        base_string = b("GET&http%3A%2F%2Fexample.com%2F&a%3Db")
+        client_shared_secret = b("kd94hf93/k423kf44")
+        # Signed with a key whose secret is not percent-encoded.
+        signature = hmac_sha1_base64_digest(client_shared_secret + b("&"),
+                                            base_string)
+        self.assertEqual(self._run_with_each_backend(
+            lambda: verify_hmac_sha1_signature(signature, base_string,
+                                               client_shared_secret,
+                                               debug=True)[1]),
+            "Invalid signature: signature elements "
+            "are not percent-encoded properly")
+
+    def test_rsa_sha1_signatures(self):
+        base_string = b("GET&http%3A%2F%2Fexample.com%2F&a%3Db")
+        signature = self._run_with_each_backend(
+            lambda: generate_rsa_sha1_signature(base_string, _FakeRsaKey()))
+        self.assertTrue(self._run_with_each_backend(
+            lambda: verify_rsa_sha1_signature(signature, base_string,
+                                              _FakeRsaKey())))
+        self.assertFalse(self._run_with_each_backend(
+            lambda: verify_rsa_sha1_signature(signature, base_string + b("x"),
+                                              _FakeRsaKey())))
+
+    def test_rsa_sha1_example(self):
+        rsa_test = Test_generate_and_verify_rsa_sha1_signature(
+            "test_valid_signature")
+        rsa_test.setUp()
+        for example in rsa_test._examples:
+            base_string = generate_base_string(example["method"],
+                                               example["url"],
+                                               example["oauth_params"])
+            signature = example[OAUTH_PARAM_SIGNATURE]
+            self.assertEqual(self._run_with_each_backend(
+                lambda: generate_rsa_sha1_signature(base_string,
+                                                    example["private_key"])),
+                signature)
+            self.assertEqual(self._run_with_each_backend(
+                lambda: generate_rsa_sha1_crt_signature(
+                    base_string, example["private_key"])),
+                signature)
+            self.assertTrue(self._run_with_each_backend(
+                lambda: verify_rsa_sha1_signature(signature, base_string,
+                                                  example["certificate"])))
+
+    def test_plaintext_signature(self):
+        self.assertEqual(self._run_with_each_backend(
+            lambda: generate_plaintext_signature(b(""), RFC_CLIENT_SECRET,
+                                                 RFC_TOKEN_SECRET)),
+            generate_plaintext_signature(b(""), RFC_CLIENT_SECRET,
+                                         RFC_TOKEN_SECRET))
+
+
+class Test__rsa_crt_helpers(unittest2.TestCase):
+    def test_uint_bytes_round_trip(self):
+        for number in (1, 255, 256, 65537, (1 << 1024) - 1):
+            self.assertEqual(_bytes_to_uint(_uint_to_bytes(number)), number)
+        self.assertEqual(_uint_to_bytes(256), b("\x01\x00"))
+        self.assertEqual(_bytes_to_uint(b("\x00\x00\x01")), 1)
+
+    def test_inverse_mod(self):
+        self.assertEqual(_inverse_mod(3, 11), 4)
+        self.assertEqual(_inverse_mod(10, 17) * 10 % 17, 1)
+        self.assertRaises(ValueError, _inverse_mod, 6, 9)
+
+    def test_crt_private_operation_matches_plain_exponentiation(self):
+        # Toy key: p = 1000003, q = 999983.
+        p, q, e = 1000003, 999983, 65537
+        n = p * q
+        d = _inverse_mod(e, (p - 1) * (q - 1))
+        key = _RsaCrtPrivateKey(dict(modulus=n, publicExponent=e,
+                                     privateExponent=d,
+                                     prime1=p, prime2=q))
+        for message in (2, 12345, n - 1):
+            self.assertEqual(key._private_operation(message),
+                             pow(message, d, n))
+
+    def test_crt_key_of_parsed_key_is_derived_once(self):
+        p, q, e = 1000003, 999983, 65537
+        n = p * q
+
+        class FakeParsedKey(object):
+            key_info = dict(modulus=n, publicExponent=e,
+                            privateExponent=_inverse_mod(e, (p - 1) * (q - 1)),
+                            prime1=p, prime2=q)
+
+        RSA_KEY_CACHE.clear()
+        parsed_key = FakeParsedKey()
+        key = _parse_rsa_key(parsed_key, _RSA_CRT_PRIVATE_KEY)
+        self.assertTrue(isinstance(key, _RsaCrtPrivateKey))
+        self.assertTrue(_parse_rsa_key(parsed_key, _RSA_CRT_PRIVATE_KEY)
+                        is key)
+        self.assertEqual(RSA_KEY_CACHE.hits, 1)
+        self.assertTrue(_parse_rsa_key(key, _RSA_CRT_PRIVATE_KEY) is key)
+        RSA_KEY_CACHE.clear()
+
 
 class Test_generate_plaintext_signature(unittest2.TestCase):
     def setUp(self):
@@ -404,6 +1253,30 @@ class Test_generate_base_string(unittest2.TestCase):
                      "oauth_timestamp%3D137131201%26"\
                      "oauth_token%3Dkkk9d7dh3k39sjv7"))
 
+    def test_user_query_values_are_not_memoized(self):
+        url = b("http://example.com/search?q=term%20")
+        generate_base_string(HTTP_GET, url + b("0"), self.oauth_params)
+        size = len(PERCENT_ENCODE_CACHE)
+        for i in range(1, 20):
+            generate_base_string(HTTP_GET, url + b(str(i)),
+                                 self.oauth_params)
+            generate_base_string_query(b("cursor=page%20") + b(str(i)),
+                                       self.oauth_params)
+        self.assertEqual(len(PERCENT_ENCODE_CACHE), size)
+
+    def test_body_hash_and_verifier_are_not_memoized(self):
+        PERCENT_ENCODE_CACHE.clear()
+        for i in range(3):
+            oauth_params = dict(self.oauth_params)
+            oauth_params[OAUTH_PARAM_BODY_HASH] = generate_body_hash(
+                b("body ") + b(str(i)))
+            oauth_params[OAUTH_PARAM_VERIFIER] = b("verifier ") + b(str(i))
+            generate_base_string(b("PUT"), b("http://example.com/request"),
+                                 oauth_params)
+            generate_authorization_header(oauth_params)
+            for name in (OAUTH_PARAM_BODY_HASH, OAUTH_PARAM_VERIFIER):
+                self.assertFalse(oauth_params[name] in PERCENT_ENCODE_CACHE)
+
     def test_InvalidHttpMethodError_when_invalid_http_method(self):
         self.assertRaises(InvalidHttpMethodError,
                           generate_base_string, b("TypO"),
@@ -443,6 +1316,232 @@ class Test_generate_base_string(unittest2.TestCase):
         )
 
 
+class Test_BaseStringBuilder(unittest2.TestCase):
+    _urls = (
+        b("http://example.com/request?"
+          "b5=%3D%253D&a3=a&c%40=&a2=r%20b&c2&a3=2+q"),
+        b("http://example.com/request?oauth_signature=foobar&realm=something"),
+        b("HTTP://Social.Yahooapis.com:80/v1/user/6677/connections"
+          ";start=0;count=20?format=json#fragment"),
+        b("https://photos.example.net:8443/photos?"
+          "file=vacation.jpg&size=original"),
+        b("http://example.com/"),
+    )
+
+    def setUp(self):
+        self.oauth_params = dict(
+            oauth_consumer_key=b("9djdj82h48djs9d2"),
+            oauth_token=b("kkk9d7dh3k39sjv7"),
+            oauth_signature_method=SIGNATURE_METHOD_HMAC_SHA1,
+            oauth_timestamp=b("137131201"),
+            oauth_nonce=b("7d8f3e4a"),
+            oauth_signature=b("bYT5CMsGcbgUdFHObYMEfcx6bsw%3D"),
+            realm=b("example.com"),
+        )
+
+    def test_same_as_generate_base_string(self):
+        for url in self._urls:
+            for method in (HTTP_POST, b("get")):
+                for oauth_params in (self.oauth_params, {}):
+                    self.assertEqual(
+                        BaseStringBuilder(method, url).build(oauth_params),
+                        generate_base_string(method, url, oauth_params))
+
+    def test_parsed_urls(self):
+        for url in self._urls:
+            self.assertEqual(
+                BaseStringBuilder(HTTP_POST, ParsedUrl.parse(url)).build(
+                    self.oauth_params),
+                generate_base_string(HTTP_POST, url, self.oauth_params))
+            self.assertEqual(
+                generate_base_string(HTTP_POST, ParsedUrl.parse(url),
+                                     self.oauth_params),
+                generate_base_string(HTTP_POST, url, self.oauth_params))
+
+    def test_rfc_examples(self):
+        for example in Test_generate_hmac_sha1_signature._examples:
+            self.assertEqual(
+                BaseStringBuilder(example["method"],
+                                  example["url"]).build(
+                                      example["oauth_params"]),
+                generate_base_string(example["method"], example["url"],
+                                     example["oauth_params"]))
+
+    def test_reuse(self):
+        builder = BaseStringBuilder(HTTP_POST, self._urls[0])
+        for nonce in (b("1"), b("2 3"), b("4/5")):
+            self.oauth_params[OAUTH_PARAM_NONCE] = nonce
+            self.assertEqual(builder.build(self.oauth_params),
+                             generate_base_string(HTTP_POST, self._urls[0],
+                                                  self.oauth_params))
+
+    def test_errors(self):
+        self.assertRaises(InvalidHttpMethodError, BaseStringBuilder,
+                          b("TypO"), b("http://example.com/request"))
+        self.assertRaises(InvalidUrlError, BaseStringBuilder, HTTP_POST,
+                          b(""))
+        builder = BaseStringBuilder(HTTP_POST, b("http://www.google.com/"))
+        self.assertRaises(InvalidOAuthParametersError, builder.build, None)
+        self.assertRaises(InvalidOAuthParametersError, builder.build,
+                          dict(oauth_nonce=[b("1"), b("2")]))
+        self.assertRaises(InsecureOAuthParametersError, builder.build,
+                          dict(oauth_token_secret=b("secret")))
+
+
+class Test_BaseStringTemplate(unittest2.TestCase):
+    url = b("http://example.com/search?") + \
+          b("&").join([b("q%02d=v+%d") % (i, i) for i in range(40)])
+
+    def setUp(self):
+        self.static_params = dict(
+            oauth_consumer_key=b("9djdj82h48djs9d2"),
+            oauth_token=b("kkk9d7dh3k39sjv7"),
+            oauth_signature_method=SIGNATURE_METHOD_HMAC_SHA1,
+            oauth_version=OAUTH_VERSION_1,
+        )
+
+    def test_same_as_generate_base_string(self):
+        template = BaseStringTemplate(HTTP_GET, self.url, self.static_params)
+        for nonce, timestamp in ((b("7d8f3e4a"), b("137131201")),
+                                 (b("a b/c"), b("1")),
+                                 (b("zzz"), b("99999999999"))):
+            dynamic_params = dict(oauth_nonce=nonce,
+                                  oauth_timestamp=timestamp)
+            oauth_params = dict(self.static_params)
+            oauth_params.update(dynamic_params)
+            self.assertEqual(template.build(dynamic_params),
+                             generate_base_string(HTTP_GET, self.url,
+                                                  oauth_params))
+
+    def test_dynamic_query_params(self):
+        template = BaseStringTemplate(HTTP_GET, self.url, self.static_params)
+        dynamic_params = dict(oauth_nonce=b("7d8f3e4a"),
+                              oauth_timestamp=b("137131201"))
+        query_params = {b("q05"): b("v 55"), b("page"): [b("2"), b("3")],
+                        b("oauth_ignored"): b("x")}
+        oauth_params = dict(self.static_params)
+        oauth_params.update(dynamic_params)
+        url = self.url + b("&q05=v+55&page=2&page=3")
+        self.assertEqual(template.build(dynamic_params, query_params),
+                         generate_base_string(HTTP_GET, url, oauth_params))
+
+    def test_no_static_params(self):
+        template = BaseStringTemplate(HTTP_POST, self.url)
+        self.assertEqual(template.build(self.static_params),
+                         generate_base_string(HTTP_POST, self.url,
+                                              self.static_params))
+        self.assertEqual(template.build(),
+                         generate_base_string(HTTP_POST, self.url, {}))
+
+    def test_repeated_protocol_params_are_rejected(self):
+        template = BaseStringTemplate(HTTP_GET, self.url, self.static_params)
+        self.assertRaises(InvalidOAuthParametersError, template.build,
+                          dict(oauth_token=b("another")))
+        self.assertRaises(InvalidOAuthParametersError, template.build,
+                          [(b("oauth_nonce"), b("1"))])
+        self.assertRaises(InvalidOAuthParametersError, BaseStringTemplate,
+                          HTTP_GET, self.url, [])
+
+
+class Test_FormBodyBaseStringBuilder(unittest2.TestCase):
+    url = b("http://example.com/request?b5=%3D%253D&a3=a&oauth_token=x")
+    body = b("&").join([b("p%03d=v+%d&a3=%%2F%d") % (i % 97, i, i)
+                        for i in range(500)]) + \
+           b("&c%40=&c2&oauth_nonce=ignored&z=%7E")
+
+    def setUp(self):
+        self.oauth_params = dict(
+            oauth_consumer_key=b("9djdj82h48djs9d2"),
+            oauth_token=b("kkk9d7dh3k39sjv7"),
+            oauth_signature_method=SIGNATURE_METHOD_HMAC_SHA1,
+            oauth_timestamp=b("137131201"),
+            oauth_nonce=b("7d8f3e4a"),
+        )
+        self.expected = generate_base_string(
+            HTTP_POST, self.url + b("&") + self.body, self.oauth_params)
+
+    def test_same_as_generate_base_string(self):
+        builder = FormBodyBaseStringBuilder(HTTP_POST, self.url)
+        self.assertEqual(
+            b("").join(builder.iter_chunks(self.oauth_params, self.body)),
+            self.expected)
+
+    def test_spills_to_temporary_files(self):
+        builder = FormBodyBaseStringBuilder(HTTP_POST, self.url,
+                                            max_memory=2048)
+        chunks = builder.iter_chunks(self.oauth_params,
+                                     io.BytesIO(self.body))
+        self.assertEqual(b("").join(chunks), self.expected)
+
+    def test_logs_ignored_protocol_parameters_once(self):
+        builder = FormBodyBaseStringBuilder(HTTP_POST, b("http://example.com/"))
+        body = b("a=1&oauth_nonce=x&oauth_foo=y&oauth_nonce=z")
+        with self.assertLogs(level="WARNING") as logs:
+            b("").join(builder.iter_chunks(self.oauth_params, body))
+        self.assertEqual(len(logs.output), 2)
+        self.assertTrue("oauth_nonce" in logs.output[0])
+        self.assertTrue("oauth_foo" in logs.output[1])
+
+    def test_query_params(self):
+        builder = FormBodyBaseStringBuilder(HTTP_POST, b("http://example.com/"))
+        chunks = builder.iter_chunks(self.oauth_params, b("a=1"),
+                                     {b("b"): [b("2"), b("3")]})
+        self.assertEqual(
+            b("").join(chunks),
+            generate_base_string(HTTP_POST,
+                                 b("http://example.com/?a=1&b=2&b=3"),
+                                 self.oauth_params))
+
+
+class Test_ExternalPairSorter(unittest2.TestCase):
+    def test_merges_sorted_runs(self):
+        rng = random.Random(19)
+        pairs = [(b("n%d") % rng.randrange(50), b("v%d") % rng.randrange(50))
+                 for _ in range(1000)]
+        sorter = _ExternalPairSorter(max_memory=4096)
+        for name, value in pairs:
+            sorter.add(name, value)
+        self.assertTrue(sorter.runs > 1)
+        self.assertEqual(list(sorter), sorted(pairs))
+        sorter.close()
+        self.assertEqual(sorter.runs, 0)
+
+    def test_in_memory(self):
+        sorter = _ExternalPairSorter()
+        sorter.add(b("b"), b("1"))
+        sorter.add(b("a-"), b("2"))
+        sorter.add(b("a"), b("3"))
+        self.assertEqual(list(sorter), [(b("a"), b("3")), (b("a-"), b("2")),
+                                        (b("b"), b("1"))])
+        self.assertEqual(sorter.runs, 0)
+
+
+class Test_generate_chunked_signature(unittest2.TestCase):
+    chunks = [b("POST&http%3A%2F%2Fexample.com%2F&"), b("a%3D1"), b("%26b%3D2")]
+
+    def test_same_as_signing_joined_base_string(self):
+        base_string = b("").join(self.chunks)
+        for sign_func in (generate_hmac_sha1_signature,
+                          generate_hmac_sha256_signature,
+                          generate_hmac_sha512_signature,
+                          generate_plaintext_signature):
+            self.assertEqual(
+                generate_chunked_signature(sign_func, iter(self.chunks),
+                                           b("secret"), b("token")),
+                sign_func(base_string, b("secret"), b("token")))
+
+    def test_other_functions_get_joined_base_string(self):
+        seen = []
+
+        def sign(base_string, client_shared_secret, token_shared_secret):
+            seen.append(base_string)
+            return b("signature")
+
+        self.assertEqual(generate_chunked_signature(sign, self.chunks,
+                                                    b("secret")),
+                         b("signature"))
+        self.assertEqual(seen, [b("").join(self.chunks)])
+
 
 class Test_generate_signature_base_string_query(unittest2.TestCase):
     def setUp(self):
@@ -664,6 +1763,52 @@ realm="http://example.com/"\
 
 
 
+class Test_AuthorizationHeaderTemplate(unittest2.TestCase):
+    def setUp(self):
+        self.constant_params = {
+            OAUTH_PARAM_CONSUMER_KEY: b('0685bd9184jfhq22'),
+            OAUTH_PARAM_SIGNATURE_METHOD: b('HMAC-SHA1'),
+            OAUTH_PARAM_VERSION: OAUTH_VERSION_1,
+        }
+        self.request_params = {
+            OAUTH_PARAM_NONCE: b('4572616e48616d6d65724c61686176'),
+            OAUTH_PARAM_TIMESTAMP: b('137131200'),
+            OAUTH_PARAM_TOKEN: b('ad180jjd733klru7'),
+            OAUTH_PARAM_SIGNATURE: b('wOJIO9A2W5mFwDgiDvZbTSMK/PY='),
+            'oauth_something': [b(' Some Example')],
+            'oauth_empty': b(''),
+            OAUTH_PARAM_REALM: b('ignored'),
+        }
+        self.all_params = dict(self.constant_params)
+        self.all_params.update(self.request_params)
+
+    def test_same_as_generate_authorization_header(self):
+        for realm in (None, b("http://example.com/"), "Photos"):
+            for param_delimiter in (",", b("&")):
+                template = AuthorizationHeaderTemplate(self.constant_params,
+                                                       realm,
+                                                       param_delimiter)
+                self.assertEqual(
+                    template.build(self.request_params),
+                    generate_authorization_header(self.all_params, realm,
+                                                  param_delimiter))
+
+    def test_without_constant_params(self):
+        template = AuthorizationHeaderTemplate(realm=b("Photos"))
+        self.assertEqual(template.build(self.all_params),
+                         generate_authorization_header(self.all_params,
+                                                       b("Photos")))
+        self.assertEqual(template.build(),
+                         generate_authorization_header({}, b("Photos")))
+
+    def test_repeated_protocol_params_are_rejected(self):
+        template = AuthorizationHeaderTemplate(self.constant_params)
+        self.assertRaises(InvalidOAuthParametersError, template.build,
+                          {OAUTH_PARAM_CONSUMER_KEY: b("another")})
+        self.assertRaises(InsecureOAuthParametersError, template.build,
+                          dict(oauth_token_secret=b("secret")))
+
+
 class Test_parse_authorization_header(unittest2.TestCase):
     def test_InvalidOAuthParametersError_when_multiple_values(self):
         test_value = '''OAuth realm="Examp%20le",\
@@ -795,6 +1940,54 @@ class Test_parse_authorization_header(unittest2.TestCase):
                           parse_authorization_header, header)
 
 
+class Test_parse_authorization_header_limits(unittest2.TestCase):
+    header = b('OAuth realm="Examp%20le",'
+               'oauth_consumer_key="0685bd9184jfhq22",'
+               'oauth_nonce="4572616e48616d6d65724c61686176",'
+               'oauth_something="%20Some+Example"')
+    expected = ({
+        OAUTH_PARAM_CONSUMER_KEY: ['0685bd9184jfhq22'],
+        OAUTH_PARAM_NONCE: ['4572616e48616d6d65724c61686176'],
+        'oauth_something': [' Some Example'],
+    }, 'Examp%20le')
+
+    def test_buffers(self):
+        self.assertEqual(parse_authorization_header(memoryview(self.header)),
+                         self.expected)
+        self.assertEqual(parse_authorization_header(bytearray(self.header)),
+                         self.expected)
+
+    def test_max_length(self):
+        self.assertEqual(parse_authorization_header(
+            self.header, max_length=len(self.header)), self.expected)
+        self.assertRaises(InvalidAuthorizationHeaderError,
+                          parse_authorization_header, self.header,
+                          max_length=len(self.header) - 1)
+        self.assertRaises(InvalidAuthorizationHeaderError,
+                          parse_authorization_header,
+                          b("OAuth ") + b("a") * 10000)
+
+    def test_max_params(self):
+        self.assertEqual(parse_authorization_header(self.header, max_params=4),
+                         self.expected)
+        self.assertRaises(InvalidAuthorizationHeaderError,
+                          parse_authorization_header, self.header,
+                          max_params=3)
+        header = b("OAuth ") + b(",").join([b('oauth_p%d="1"') % i
+                                             for i in range(33)])
+        self.assertRaises(InvalidAuthorizationHeaderError,
+                          parse_authorization_header, header)
+        self.assertEqual(len(parse_authorization_header(
+            header, max_params=None, max_length=None)[0]), 33)
+
+    def test_yahoo_delimiter(self):
+        header = self.header.replace(b(","), b("&\n  "))
+        self.assertEqual(parse_authorization_header(header,
+                                                    param_delimiter=b("&"),
+                                                    strict=False),
+                         self.expected)
+
+
 class Test__auth_header_strip_scheme(unittest2.TestCase):
     def test_strips_auth_scheme_from_header(self):
         header = 'OAuth realm="example.com"'
@@ -805,6 +1998,10 @@ class Test__auth_header_strip_scheme(unittest2.TestCase):
         self.assertRaises(ValueError, _authorization_header_strip_scheme,
                           'auth realm="example.com"')
 
+    def test_strips_auth_scheme_from_bytes(self):
+        self.assertEqual(_authorization_header_strip_scheme(
+            b('oauth \t realm="example.com"')), b('realm="example.com"'))
+
 
 class Test__auth_header_parse_param(unittest2.TestCase):
     def test_parses_param(self):
@@ -18,7 +18,9 @@
 
 
 from __future__ import absolute_import
+import io
 import logging
+import random
 
 import unittest2
 
@@ -26,7 +28,7 @@ from mom.builtins import b, is_bytes
 from mom.codec.text import utf8_encode_if_unicode, \
     utf8_decode_if_bytes, utf8_encode
 
-from pyoauth._compat import urlparse
+from pyoauth._compat import urlparse, quote, unquote_plus
 from pyoauth.constants import \
     OAUTH_PARAM_TOKEN, OAUTH_PARAM_SIGNATURE_METHOD, \
     OAUTH_PARAM_TIMESTAMP, OAUTH_PARAM_NONCE, OAUTH_PARAM_SIGNATURE, \
@@ -41,7 +43,14 @@ from pyoauth.error import InvalidUrlError, \
 from pyoauth.url import \
     percent_decode, \
     percent_encode, \
+    percent_encode_memoized, \
+    PERCENT_ENCODE_CACHE, \
+    URL_NORMALIZE_CACHE, \
+    ParsedUrl, \
+    QueryParams, \
     parse_qs, \
+    parse_qsl, \
+    parse_qsl_stream, \
     urlencode_s, \
     urlencode_sl, \
     query_unflatten, \
@@ -50,6 +59,7 @@ from pyoauth.url import \
     url_add_query, \
     query_remove_oauth, \
     request_query_remove_non_oauth, \
+    query_partition_oauth, \
     oauth_url_sanitize, \
     url_append_query, \
     query_append, \
@@ -139,6 +149,77 @@ class Test_parse_qs(unittest2.TestCase):
                  b('c@'): [b('')],
                  b('c2'): [b('')]})
 
+    def test_unescaped_names_and_values_are_not_decoded(self):
+        qs = b('oauth_token=hh5s93j4hdidpola'
+               '&oauth_token_secret=hdhd0244k9j7ao03'
+               '&a=&b&&oauth_callback_confirmed=true')
+        self.assertDictEqual(parse_qs(qs), {
+            b('oauth_token'): [b('hh5s93j4hdidpola')],
+            b('oauth_token_secret'): [b('hdhd0244k9j7ao03')],
+            b('a'): [b('')],
+            b('b'): [b('')],
+            b('oauth_callback_confirmed'): [b('true')],
+        })
+        self.assertEqual(parse_qsl(qs)[:2], [
+            (b('oauth_token'), b('hh5s93j4hdidpola')),
+            (b('oauth_token_secret'), b('hdhd0244k9j7ao03')),
+        ])
+
+    def test_non_ascii_escapes_are_decoded_to_bytes(self):
+        self.assertDictEqual(parse_qs('a=%C3%A9&%E2%82%AC=1'), {
+            b('a'): [b('\xc3\xa9')],
+            b('\xe2\x82\xac'): [b('1')],
+        })
+
+    def test_stream_matches(self):
+        for qs in ('b5=%3D%253D&a3=a&c%40=&a2=r%20b&c2&a3=2+q',
+                   '?a=1&a=2&b=c', 'a=1&&b', ''):
+            self.assertDictEqual(parse_qs(qs, stream=True), parse_qs(qs))
+            self.assertEqual(list(parse_qsl(qs, stream=True)), parse_qsl(qs))
+        qs = b('b5=%3D%253D&a3=a&c%40=&a2=r%20b&c2&a3=2+q')
+        self.assertDictEqual(parse_qs(io.BytesIO(qs), stream=True),
+                             parse_qs(qs))
+
+
+class Test_parse_qsl_stream(unittest2.TestCase):
+    qs = b('b5=%3D%253D&a3=a&c%40=&a2=r%20b&c2&a3=2+q&&d=%zz%4')
+
+    def test_matches_parse_qsl(self):
+        expected = [(utf8_encode(n), utf8_encode(v))
+                    for n, v in parse_qsl(self.qs)]
+        for chunk_size in (1, 2, 3, 7, 64):
+            self.assertEqual(list(parse_qsl_stream(self.qs, chunk_size)),
+                             expected)
+
+    def test_reads_files_and_iterators(self):
+        expected = list(parse_qsl_stream(self.qs))
+        self.assertEqual(list(parse_qsl_stream(io.BytesIO(self.qs), 5)),
+                         expected)
+        chunks = [self.qs[i:i + 4] for i in range(0, len(self.qs), 4)]
+        self.assertEqual(list(parse_qsl_stream(iter(chunks))), expected)
+        self.assertEqual(list(parse_qsl_stream(memoryview(self.qs), 6)),
+                         expected)
+
+    def test_pair_spanning_many_chunks(self):
+        value = b("x") * 1000
+        qs = b("a=") + value + b("&b=1")
+        self.assertEqual(list(parse_qsl_stream(qs, 10)),
+                         [(b("a"), value), (b("b"), b("1"))])
+
+    def test_decodes_to_bytes(self):
+        self.assertEqual(list(parse_qsl_stream(b("a=%FF%E2%82%AC"))),
+                         [(b("a"), b("\xff\xe2\x82\xac"))])
+
+    def test_empty_body(self):
+        self.assertEqual(list(parse_qsl_stream(b(""))), [])
+        self.assertEqual(list(parse_qsl_stream(io.BytesIO())), [])
+
+
+def _random_bytes(rng, alphabet, max_length=16):
+    alphabet = bytearray(alphabet)
+    return bytes(bytearray([rng.choice(alphabet)
+                            for _ in range(rng.randrange(max_length))]))
+
 
 class Test_percent_encode(unittest2.TestCase):
     # TODO:
@@ -244,6 +325,45 @@ class Test_percent_encode(unittest2.TestCase):
         self.assertEqual(percent_encode(True), b("True"))
         self.assertEqual(percent_encode(5), b("5"))
 
+    def test_fuzz_matches_quote(self):
+        rng = random.Random(5849)
+        alphabet = bytes(bytearray(range(256)))
+        for _ in range(5000):
+            value = _random_bytes(rng, alphabet)
+            self.assertEqual(percent_encode(value),
+                             quote(value, safe="~").encode("ascii"))
+
+    def test_unreserved_value_is_returned_as_is(self):
+        value = b("oauth_consumer_key")
+        self.assertTrue(percent_encode(value) is value)
+
+
+class Test_percent_encode_memoized(unittest2.TestCase):
+    def setUp(self):
+        PERCENT_ENCODE_CACHE.clear()
+
+    def test_same_as_percent_encode(self):
+        for value, _ in constants.percent_encode_test_cases:
+            self.assertEqual(percent_encode_memoized(value),
+                             percent_encode(value))
+            self.assertEqual(percent_encode_memoized(value),
+                             percent_encode(value))
+        self.assertEqual(percent_encode_memoized(5), b("5"))
+
+    def test_memoizes_values_that_need_escaping(self):
+        url = b("http://photos.example.net/photos")
+        percent_encode_memoized(url)
+        percent_encode_memoized(url)
+        self.assertEqual(PERCENT_ENCODE_CACHE.hits, 1)
+        self.assertEqual(PERCENT_ENCODE_CACHE.misses, 1)
+        self.assertEqual(PERCENT_ENCODE_CACHE.stats()["hit_rate"], 0.5)
+
+    def test_unreserved_and_long_values_are_not_memoized(self):
+        percent_encode_memoized(b("oauth_consumer_key"))
+        percent_encode_memoized(b("/") * 513)
+        self.assertEqual(len(PERCENT_ENCODE_CACHE), 0)
+        self.assertEqual(PERCENT_ENCODE_CACHE.misses, 0)
+
 
 class Test_percent_decode(unittest2.TestCase):
     _unsafe_characters = [
@@ -295,6 +415,32 @@ class Test_percent_decode(unittest2.TestCase):
         for decoded, encoded in ex:
             self.assertEqual(percent_decode(encoded), decoded)
 
+    def test_fuzz_matches_unquote_plus(self):
+        rng = random.Random(5849)
+        alphabet = b("%%%%++aAfFgG09 ~/")
+        for _ in range(5000):
+            value = _random_bytes(rng, alphabet)
+            try:
+                expected = utf8_decode_if_bytes(unquote_plus(value))
+            except UnicodeDecodeError:
+                self.assertRaises(UnicodeDecodeError, percent_decode, value)
+            else:
+                self.assertEqual(percent_decode(value), expected)
+
+    def test_fuzz_round_trip(self):
+        rng = random.Random(5849)
+        alphabet = b("abc ~-._+%&=/?").decode("ascii") + \
+                   constants.test_unicode_string
+        for _ in range(2000):
+            value = "".join([rng.choice(alphabet)
+                             for _ in range(rng.randrange(16))])
+            self.assertEqual(percent_decode(percent_encode(value)), value)
+
+    def test_invalid_escapes_are_left_alone(self):
+        self.assertEqual(percent_decode(b("100%")), "100%")
+        self.assertEqual(percent_decode(b("%zz%4")), "%zz%4")
+        self.assertEqual(percent_decode(b("%4a%4A")), "JJ")
+
             
 class Test_urlencode_s(unittest2.TestCase):
     def test_valid_query_string(self):
@@ -384,6 +530,19 @@ class Test_urlencode_sl(unittest2.TestCase):
         ]
         self.assertEqual(urlencode_sl(params), valid_params_list)
 
+    def test_memoize_skips_volatile_values(self):
+        PERCENT_ENCODE_CACHE.clear()
+        params = {
+            OAUTH_PARAM_CALLBACK: "http://example.com/a b",
+            "q": "search term",
+            OAUTH_PARAM_NONCE: "7d8f 3e4a",
+            OAUTH_PARAM_TIMESTAMP: "137131201",
+            OAUTH_PARAM_SIGNATURE: "MdpQcU8iPSUjWoN/UDMsK2sui9I=",
+        }
+        self.assertEqual(urlencode_sl(params, memoize=True),
+                         urlencode_sl(params))
+        self.assertEqual(len(PERCENT_ENCODE_CACHE), 1)
+        self.assertTrue(b("http://example.com/a b") in PERCENT_ENCODE_CACHE)
 
 
 class Test_url_add_query(unittest2.TestCase):
@@ -573,6 +732,146 @@ class Test_urlparse_normalized(unittest2.TestCase):
         self.assertEqual(urlparse_normalized(url), result)
 
 
+class Test_URL_NORMALIZE_CACHE(unittest2.TestCase):
+    def setUp(self):
+        URL_NORMALIZE_CACHE.clear()
+
+    def tearDown(self):
+        URL_NORMALIZE_CACHE.clear()
+
+    def test_queries_share_one_entry(self):
+        base = b("HTTP://Example.COM:80/a;p")
+        self.assertEqual(urlparse_normalized(base + b("?x=1#f")),
+                         (b("http"), b("example.com"), b("/a"), b("p"),
+                          b("x=1"), b("f")))
+        self.assertEqual(urlparse_normalized(base + b("?y=2")),
+                         (b("http"), b("example.com"), b("/a"), b("p"),
+                          b("y=2"), b("")))
+        self.assertEqual(urlparse_normalized(base + b("#g")),
+                         (b("http"), b("example.com"), b("/a"), b("p"),
+                          b(""), b("g")))
+        self.assertEqual(len(URL_NORMALIZE_CACHE), 1)
+        self.assertEqual(URL_NORMALIZE_CACHE.hits, 2)
+
+    def test_sanitize_and_add_query_use_cache(self):
+        url = b("http://Example.com:8080?b=2&oauth_nonce=x&a=1")
+        self.assertEqual(oauth_url_sanitize(url, force_secure=False),
+                         b("http://example.com:8080/?a=1&b=2"))
+        self.assertEqual(url_add_query(url, {"c": "3"}),
+                         b("http://example.com:8080/"
+                           "?a=1&b=2&c=3&oauth_nonce=x"))
+        self.assertEqual(oauth_url_sanitize(b("http://Example.com:8080"),
+                                            force_secure=False),
+                         b("http://example.com:8080/"))
+        self.assertEqual(len(URL_NORMALIZE_CACHE), 1)
+
+
+class Test_ParsedUrl(unittest2.TestCase):
+    url = b("HTTP://Example.COM:80/a;p?b=2&oauth_nonce=x&a=1#frag")
+
+    def test_components(self):
+        parsed = ParsedUrl.parse(self.url)
+        self.assertEqual((parsed.scheme, parsed.netloc, parsed.path,
+                          parsed.params, parsed.query_string, parsed.fragment),
+                         urlparse_normalized(self.url))
+        self.assertEqual(parsed.base_url, b("http://example.com/a;p"))
+        self.assertEqual(parsed.query, {b("a"): [b("1")], b("b"): [b("2")],
+                                        b("oauth_nonce"): [b("x")]})
+        self.assertEqual(parsed.geturl(),
+                         b("http://example.com/a;p?b=2&oauth_nonce=x&a=1#frag"))
+        self.assertTrue(ParsedUrl.parse(parsed) is parsed)
+
+    def test_immutable(self):
+        parsed = ParsedUrl.parse(self.url)
+        self.assertRaises(AttributeError, setattr, parsed, "_query", b(""))
+        self.assertRaises(AttributeError, setattr, parsed, "scheme", b("ftp"))
+        self.assertRaises(AttributeError, setattr, parsed, "other", 1)
+
+    def test_same_as_string_functions(self):
+        parsed = ParsedUrl.parse(self.url)
+        self.assertEqual(parsed.add_query({"c": "3"}).geturl(),
+                         url_add_query(self.url, {"c": "3"}))
+        self.assertEqual(parsed.append_query({"c": "3"}).geturl(),
+                         url_append_query(self.url, {"c": "3"}))
+        self.assertEqual(parsed.sanitize(False).geturl(),
+                         oauth_url_sanitize(self.url, False))
+        self.assertRaises(InsecureOAuthUrlError, parsed.sanitize)
+        self.assertEqual(url_add_query(parsed, {"c": "3"}),
+                         url_add_query(self.url, {"c": "3"}))
+
+    def test_equality_and_hashing(self):
+        first = ParsedUrl.parse(self.url)
+        second = ParsedUrl.parse(b("http://example.com/a;p?b=2&oauth_nonce=x"
+                                   "&a=1#frag"))
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+        self.assertNotEqual(first, first.append_query({"c": "3"}))
+
+
+class Test_QueryParams(unittest2.TestCase):
+    qs = b("b5=%3D%253D&a3=a&c%40=&a2=r%20b&c2&a3=2+q")
+
+    def test_same_as_dictionary_functions(self):
+        params = QueryParams(self.qs)
+        self.assertEqual(params.to_dict(), query_unflatten(self.qs))
+        self.assertEqual(query_unflatten(params), parse_qs(self.qs))
+        self.assertEqual(list(params.encoded()), urlencode_sl(parse_qs(self.qs)))
+        self.assertEqual(params.urlencode(), urlencode_s(parse_qs(self.qs)))
+        self.assertEqual(urlencode_s(params), urlencode_s(parse_qs(self.qs)))
+        self.assertEqual(query_add(params, {"d": "1"}),
+                         query_add(self.qs, {"d": "1"}))
+
+    def test_query_string_is_parsed_lazily(self):
+        params = QueryParams(self.qs)
+        self.assertEqual(params._names, [])
+        self.assertEqual(len(params), 6)
+        self.assertEqual(params[b("a3")], [b("a"), b("2 q")])
+        self.assertEqual(params.get(b("missing")), None)
+        self.assertRaises(KeyError, params.__getitem__, b("missing"))
+
+    def test_extend_keeps_order(self):
+        params = QueryParams({"a": ["1", "2"]})
+        params.extend(b("b=3&a=4"))
+        params.extend(QueryParams({"c": "5"}))
+        params.add("a", "6")
+        self.assertEqual(params.pairs(), [("a", "1"), ("a", "2"),
+                                          (b("b"), b("3")), (b("a"), b("4")),
+                                          ("c", "5"), ("a", "6")])
+
+    def test_encoded_view_is_cached_until_changed(self):
+        params = QueryParams({"b": "2", "a": "1"})
+        encoded = params.encoded()
+        self.assertTrue(params.encoded() is encoded)
+        params.add("c", "3")
+        self.assertEqual(params.urlencode(), b("a=1&b=2&c=3"))
+        copy = params.copy()
+        copy.add("d", "4")
+        self.assertEqual(params.urlencode(), b("a=1&b=2&c=3"))
+
+    def test_filters_in_place(self):
+        params = QueryParams(b("a=1&oauth_nonce=x&b=2&a=3"))
+        params.remove_oauth()
+        self.assertEqual(params.urlencode(), b("a=1&a=3&b=2"))
+        params.filter(lambda name, values: len(values) == 1)
+        self.assertEqual(params.urlencode(), b("b=2"))
+        self.assertEqual(
+            QueryParams(b("a=1&oauth_nonce=x")).urlencode(
+                lambda name, _: name != b("a")),
+            b("oauth_nonce=x"))
+
+    def test_protocol_parameter_checks(self):
+        self.assertEqual(
+            request_query_remove_non_oauth(
+                QueryParams(b("a=1&oauth_nonce=x"))),
+            {b("oauth_nonce"): [b("x")]})
+        self.assertRaises(InvalidOAuthParametersError,
+                          request_query_remove_non_oauth,
+                          QueryParams(b("oauth_nonce=x&oauth_nonce=y")))
+
+    def test_invalid_query(self):
+        self.assertRaises(InvalidQueryParametersError, QueryParams, 5)
+
+
 class Test_query_unflatten(unittest2.TestCase):
     def test_unflattens_dict(self):
         params = {
@@ -825,6 +1124,68 @@ class Test_request_protocol_params_sanitize(unittest2.TestCase):
         self.assertRaises(InsecureOAuthParametersError,
                           request_query_remove_non_oauth, params2)
 
+
+class Test_query_partition_oauth(unittest2.TestCase):
+    def setUp(self):
+        self.params = {
+            "a2": ["r b"],
+            "b5": ["=%3D"],
+            "a3": ["a", "2 q"],
+            "c@": [""],
+            "c2": [""],
+            OAUTH_PARAM_CONSUMER_KEY: "9djdj82h48djs9d2",
+            OAUTH_PARAM_TOKEN: ["kkk9d7dh3k39sjv7"],
+            OAUTH_PARAM_SIGNATURE_METHOD: ("HMAC-SHA1", ),
+            OAUTH_PARAM_TIMESTAMP: ["137131201"],
+            OAUTH_PARAM_NONCE: ["7d8f3e4a"],
+            OAUTH_PARAM_SIGNATURE: ["djosJKDKJSD8743243%2Fjdk33klY%3D"],
+        }
+
+    def test_matches_remove_functions(self):
+        expected = (urlencode_sl(request_query_remove_non_oauth(self.params)),
+                    urlencode_sl(query_remove_oauth(self.params)))
+        self.assertEqual(query_partition_oauth(self.params), expected)
+        self.assertEqual(query_partition_oauth(self.params, memoize=True),
+                         expected)
+        query_string = urlencode_s(self.params)
+        self.assertEqual(query_partition_oauth(query_string), expected)
+        self.assertEqual(query_partition_oauth(QueryParams(query_string)),
+                         expected)
+
+    def test_drops_sides(self):
+        oauth_pairs, non_oauth_pairs = query_partition_oauth(self.params)
+        self.assertEqual(query_partition_oauth(self.params, oauth=False),
+                         ([], non_oauth_pairs))
+        self.assertEqual(query_partition_oauth(self.params, non_oauth=False),
+                         (oauth_pairs, []))
+
+    def test_empty(self):
+        self.assertEqual(query_partition_oauth(None), ([], []))
+        self.assertEqual(query_partition_oauth(""), ([], []))
+
+    def test_InvalidOAuthParametersError_got_multiple_oauth_param_values(self):
+        self.params[OAUTH_PARAM_TOKEN] = ["kkk9d7dh3k39sjv7",
+                                          "ahdsa7hd3uhadasd"]
+        self.assertRaises(InvalidOAuthParametersError,
+                          query_partition_oauth, self.params)
+        self.assertRaises(InvalidOAuthParametersError,
+                          query_partition_oauth, urlencode_s(self.params))
+        # Protocol parameters that are dropped are not checked.
+        self.assertEqual(
+            query_partition_oauth(self.params, oauth=False)[1],
+            urlencode_sl(query_remove_oauth(self.params)))
+
+    def test_InsecureProtocolParametersError_got_confidential_params(self):
+        for name in (OAUTH_PARAM_CONSUMER_SECRET, OAUTH_PARAM_TOKEN_SECRET):
+            params = dict(self.params)
+            params[name] = ["something"]
+            self.assertRaises(InsecureOAuthParametersError,
+                              query_partition_oauth, params)
+            self.assertRaises(InsecureOAuthParametersError,
+                              query_partition_oauth, params, non_oauth=False)
+            query_partition_oauth(params, oauth=False)
+
+
 class Test_url_append_query(unittest2.TestCase):
     def test_does_not_prefix_with_ampersand_when_url_has_no_query_params(self):
         url = b("https://www.example.com/authorize")
@@ -18,7 +18,7 @@
 
 
 from __future__ import absolute_import
-from pyoauth.http import ResponseAdapter
+from pyoauth.http import ResponseAdapter, read_body
 
 
 class HttpClient(object):
@@ -31,6 +31,9 @@ class HttpClient(object):
 
         :param request:
             An instance of type :class:`pyoauth.http.RequestProxy`.
+            urlfetch takes byte strings only, so buffer, file and iterator
+            bodies are read into memory with
+            :func:`pyoauth.http.read_body`.
         :param async_callback:
             ``None`` by default. Unused on App Engine. Useful when your request
             fetching method is asynchronous. Set to a callback function which
@@ -70,7 +73,7 @@ class HttpClient(object):
 #            try:
             response = urlfetch.fetch(
                 url=request.url,
-                payload=request.body,
+                payload=read_body(request.body),
                 method=request.method,
                 headers=request.headers,
                 deadline=10)
@@ -25,10 +25,23 @@ Percent-encoding
 ----------------
 .. autofunction:: percent_encode
 .. autofunction:: percent_decode
+.. autofunction:: percent_encode_memoized
+
+Values that need escaping and recur from request to request (endpoint
+URLs, parameter names, protocol parameter values such as consumer keys) can
+be memoized. The memo is an LRU cache of at most 4096 values, each at most
+512 bytes long. Call ``PERCENT_ENCODE_CACHE.stats()`` to see how well it is
+doing. Values that may change with every request (nonces, timestamps,
+signatures, body hashes, verification codes and the values of non-protocol
+query parameters) are never memoized.
+
+.. autodata:: PERCENT_ENCODE_CACHE
 
 Query string parsing and construction
 -------------------------------------
 .. autofunction:: parse_qs
+.. autofunction:: parse_qsl
+.. autofunction:: parse_qsl_stream
 .. autofunction:: urlencode_s
 .. autofunction:: urlencode_sl
 
@@ -39,16 +52,39 @@ URL parsing and convenience utilities
 .. autofunction:: url_add_query
 .. autofunction:: oauth_url_sanitize
 
+Clients send many requests to few endpoints. Parsing a URL, lowercasing
+its host name and dropping its default port are done once per endpoint:
+the results are memoized in an LRU cache of at most 4096 entries, keyed on
+the URL up to its query string. Query strings and fragments are sliced off
+the URL and handled on every call.
+
+.. autodata:: URL_NORMALIZE_CACHE
+
+A request URL is sanitized, extended with query parameters, signed and
+serialized. A parsed URL object carries the normalized components through
+all of these steps.
+
+.. autoclass:: ParsedUrl
+   :members:
+
 Query parameters
 ----------------
 .. autofunction:: query_add
 .. autofunction:: query_select
 .. autofunction:: query_unflatten
 
+The functions above take and return un-flattened dictionaries. The request
+pipeline keeps its parameters in a multi-dictionary instead, which the
+functions of this module accept as well.
+
+.. autoclass:: QueryParams
+   :members:
+
 Parameter sanitization
 ----------------------
 .. autofunction:: request_query_remove_non_oauth
 .. autofunction:: query_remove_oauth
+.. autofunction:: query_partition_oauth
 
 """
 
@@ -56,17 +92,18 @@ import logging
 
 from mom.builtins import is_sequence, bytes, is_bytes_or_unicode, is_bytes
 from mom.codec.text import utf8_encode_if_unicode, \
-    utf8_encode, utf8_decode_if_bytes
+    utf8_encode, utf8_decode, utf8_decode_if_bytes
 from mom.functional import select_dict, map_dict
 
 from mom.builtins import b
-from pyoauth._compat import urlparse, urlunparse, parse_qs as _parse_qs, \
-    quote, \
-    unquote_plus
+from pyoauth._compat import urlparse, urlunparse, BUFFER_TYPES
+from pyoauth.cache import LRUCache
 from pyoauth.constants import SYMBOL_QUESTION_MARK, \
     SYMBOL_AMPERSAND, SYMBOL_EQUAL, OAUTH_PARAM_PREFIX, \
     OAUTH_VALUE_CALLBACK_OOB, OAUTH_PARAM_CONSUMER_SECRET, \
-    OAUTH_PARAM_TOKEN_SECRET, SYMBOL_EMPTY_BYTES
+    OAUTH_PARAM_TOKEN_SECRET, SYMBOL_EMPTY_BYTES, OAUTH_PARAM_NONCE, \
+    OAUTH_PARAM_TIMESTAMP, OAUTH_PARAM_SIGNATURE, OAUTH_PARAM_BODY_HASH, \
+    OAUTH_PARAM_VERIFIER
 from pyoauth.error import InvalidQueryParametersError, \
     InsecureOAuthParametersError, \
     InvalidOAuthParametersError, \
@@ -80,7 +117,15 @@ try:
 except NameError:
     pass
 
-def parse_qs(query_string):
+_PERCENT = b("%")
+_PLUS = b("+")
+_SPACE = b(" ")
+_HASH = b("#")
+# Bytes read from a streamed query string at a time.
+_STREAM_CHUNK_SIZE = 65536
+
+
+def parse_qs(query_string, stream=False):
     """
     Parses a query parameter string according to the OAuth spec.
 
@@ -91,13 +136,186 @@ def parse_qs(query_string):
     :param query_string:
         Query string to parse. If ``query_string`` starts with a ``?`` character
         it will be ignored for convenience.
+    :param stream:
+        ``True`` to parse the query string lazily with
+        :func:`parse_qsl_stream` instead of splitting it all at once. The
+        query string may then also be a file object or an iterable of byte
+        strings. Default ``False``.
+    :returns:
+        A dictionary of byte string names and lists of byte string values.
+    """
+    query_d = {}
+    for name, value in parse_qsl(query_string, stream):
+        values = query_d.get(name)
+        if values is None:
+            query_d[name] = [value]
+        else:
+            values.append(value)
+    return query_d
+
+
+def parse_qsl(query_string, stream=False):
+    """
+    Parses a query parameter string according to the OAuth spec into a list
+    of ``(name, value)`` pairs in the order they appear.
+
+    Use only with OAuth query strings.
+
+    Most query strings contain no ``%`` or ``+`` characters. These are split
+    into names and values without decoding them; otherwise, each name and
+    value is percent-decoded. Names and values are byte strings.
+
+    :see: Parameter Sources
+        (http://tools.ietf.org/html/rfc5849#section-3.4.1.3.1)
+    :param query_string:
+        Query string to parse. If ``query_string`` starts with a ``?`` character
+        it will be ignored for convenience.
+    :param stream:
+        ``True`` to return a generator from :func:`parse_qsl_stream`
+        instead of a list. See :func:`parse_qs`. Default ``False``.
     """
+    if stream and not is_bytes_or_unicode(query_string):
+        return parse_qsl_stream(query_string)
     query_string = utf8_encode_if_unicode(query_string) or SYMBOL_EMPTY_BYTES
     if query_string.startswith(SYMBOL_QUESTION_MARK):
         logging.warning(
             "Ignoring `?` query string prefix -- `%r`", query_string)
         query_string = query_string[1:]
-    return _parse_qs(query_string, keep_blank_values=True)
+    if stream:
+        return parse_qsl_stream(query_string)
+    return _parse_fields(query_string.split(SYMBOL_AMPERSAND),
+                         _PERCENT not in query_string and \
+                         _PLUS not in query_string)
+
+
+def parse_qsl_stream(body, chunk_size=_STREAM_CHUNK_SIZE):
+    """
+    Parses a form-encoded entity body into ``(name, value)`` pairs in the
+    order they appear, reading it a chunk at a time.
+
+    Only the chunk being read and the pair being parsed are held in
+    memory, so this can be used with bodies too large for :func:`parse_qsl`.
+    Pairs are separated by ``&``. A pair without ``=`` has an empty value,
+    and empty pairs are skipped. Like :func:`parse_qsl`, names and values
+    are returned as percent-decoded byte strings and are never decoded as
+    UTF-8.
+
+    :see: Parameter Sources
+        (http://tools.ietf.org/html/rfc5849#section-3.4.1.3.1)
+    :param body:
+        A byte string, :class:`bytearray` or :class:`memoryview`; a file
+        object read from its current position; or an iterable of byte
+        strings.
+    :param chunk_size:
+        Bytes read from the body at a time. Default 64 KiB.
+    :returns:
+        A generator of ``(name, value)`` byte string pairs.
+    """
+    if hasattr(body, "read"):
+        read = body.read
+        chunks = iter(lambda: read(chunk_size), SYMBOL_EMPTY_BYTES)
+    elif is_bytes_or_unicode(body) or isinstance(body, BUFFER_TYPES):
+        body = utf8_encode_if_unicode(body)
+        chunks = (bytes(body[i:i + chunk_size])
+                  for i in range(0, len(body), chunk_size))
+    else:
+        chunks = body
+    # Pieces of a pair that spans several chunks.
+    pending = []
+    for chunk in chunks:
+        if SYMBOL_AMPERSAND not in chunk:
+            pending.append(chunk)
+            continue
+        fields = chunk.split(SYMBOL_AMPERSAND)
+        if pending:
+            pending.append(fields[0])
+            fields[0] = SYMBOL_EMPTY_BYTES.join(pending)
+        pending = [fields.pop()]
+        if _PERCENT in chunk or _PLUS in chunk:
+            pairs = _parse_fields(fields, False)
+        else:
+            # Only the first field may have escapes, from earlier chunks.
+            pairs = _parse_fields(fields[:1], False) + \
+                    _parse_fields(fields[1:], True)
+        for pair in pairs:
+            yield pair
+    field = SYMBOL_EMPTY_BYTES.join(pending)
+    if field:
+        yield _parse_field(field)
+
+
+def _parse_fields(fields, plain):
+    """
+    Splits ``name=value`` fields into pairs, skipping empty fields.
+
+    :param fields:
+        A list of fields.
+    :param plain:
+        ``True`` if no field contains ``%`` or ``+``, so that nothing needs
+        to be percent-decoded.
+    :returns:
+        A list of ``(name, value)`` byte string pairs.
+    """
+    if not plain:
+        return [_parse_field(field) for field in fields if field]
+    pairs = []
+    for field in fields:
+        if field:
+            name, _, value = field.partition(SYMBOL_EQUAL)
+            pairs.append((name, value))
+    return pairs
+
+
+def _parse_field(field):
+    """
+    Splits a ``name=value`` field and percent-decodes both parts to bytes.
+    """
+    name, _, value = field.partition(SYMBOL_EQUAL)
+    return _percent_decode_bytes(name), _percent_decode_bytes(value)
+
+
+# Characters that are never percent-encoded (RFC 5849 section 3.6).
+_UNRESERVED_BYTES = b("ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+                      "abcdefghijklmnopqrstuvwxyz"
+                      "0123456789-._~")
+# Translation table that maps every byte onto itself; used with
+# ``translate`` to delete the unreserved bytes from a value.
+_IDENTITY_TABLE = bytes(bytearray(range(256)))
+# Byte value -> percent-encoded byte string.
+_PERCENT_ENCODE_TABLE = []
+for _i in range(256):
+    _byte = bytes(bytearray([_i]))
+    if _byte in _UNRESERVED_BYTES:
+        _PERCENT_ENCODE_TABLE.append(_byte)
+    else:
+        _PERCENT_ENCODE_TABLE.append(("%%%02X" % _i).encode("ascii"))
+# Two hexadecimal digits in any case -> the decoded byte.
+_PERCENT_DECODE_TABLE = {}
+for _i in range(256):
+    _byte = bytes(bytearray([_i]))
+    for _hex in set(["%02x" % _i, "%02X" % _i,
+                     "%x%X" % divmod(_i, 16), "%X%x" % divmod(_i, 16)]):
+        _PERCENT_DECODE_TABLE[_hex.encode("ascii")] = _byte
+del _i, _byte, _hex
+
+# Memoized percent-encoded values.
+PERCENT_ENCODE_CACHE = LRUCache(4096)
+# Normalized (scheme, netloc, path, params, base URL) tuples indexed by the
+# part of the URL before the query string.
+URL_NORMALIZE_CACHE = LRUCache(4096)
+# Values longer than this many bytes are not memoized.
+_PERCENT_ENCODE_CACHE_MAX_LENGTH = 512
+# Only values of parameters whose names begin with this are memoized.
+_OAUTH_PARAM_PREFIX = b(OAUTH_PARAM_PREFIX)
+# Percent-encoded names of protocol parameters whose values are not memoized
+# because they differ between requests or authorizations.
+_PERCENT_ENCODE_VOLATILE_NAMES = frozenset([
+    b(OAUTH_PARAM_NONCE),
+    b(OAUTH_PARAM_TIMESTAMP),
+    b(OAUTH_PARAM_SIGNATURE),
+    b(OAUTH_PARAM_BODY_HASH),
+    b(OAUTH_PARAM_VERIFIER),
+])
 
 
 def percent_encode(value):
@@ -121,7 +339,66 @@ def percent_encode(value):
     # Escapes '/' too
     if not is_bytes(value):
         value = utf8_encode(str(value))
-    return quote(value, safe="~").encode("ascii")
+    if not value.translate(_IDENTITY_TABLE, _UNRESERVED_BYTES):
+        # Nothing to escape.
+        return value
+    return _percent_escape(value)
+
+
+def percent_encode_memoized(value, _cache=PERCENT_ENCODE_CACHE):
+    """
+    Percent-encodes like :func:`percent_encode`, but remembers the
+    encoded forms of values that needed escaping.
+
+    Only use this for values that are likely to recur, such as endpoint
+    URLs and consumer keys. Values longer than 512 bytes are encoded
+    without being memoized.
+
+    :param value:
+        Query string parameter value to escape.
+    :returns:
+        Percent-encoded string.
+    """
+    if not is_bytes(value):
+        value = utf8_encode(str(value))
+    if not value.translate(_IDENTITY_TABLE, _UNRESERVED_BYTES):
+        # Nothing to escape, so nothing worth remembering.
+        return value
+    if len(value) > _PERCENT_ENCODE_CACHE_MAX_LENGTH:
+        return _percent_escape(value)
+    encoded = _cache.get(value)
+    if encoded is None:
+        encoded = _percent_escape(value)
+        _cache.set(value, encoded)
+    return encoded
+
+
+def _memoized_value_encoder(encoded_name):
+    """
+    Returns the function that percent-encodes values of a parameter when
+    memoizing: :func:`percent_encode_memoized` for protocol parameters
+    whose values recur, :func:`percent_encode` for everything else.
+
+    :param encoded_name:
+        Percent-encoded parameter name.
+    """
+    if encoded_name in _PERCENT_ENCODE_VOLATILE_NAMES or \
+       not encoded_name.startswith(_OAUTH_PARAM_PREFIX):
+        return percent_encode
+    return percent_encode_memoized
+
+
+def _percent_escape(value):
+    """
+    Percent-encodes every reserved byte in a byte string.
+
+    :param value:
+        Byte string.
+    :returns:
+        Percent-encoded byte string.
+    """
+    table = _PERCENT_ENCODE_TABLE
+    return SYMBOL_EMPTY_BYTES.join([table[byte] for byte in bytearray(value)])
 
 
 def percent_decode(value):
@@ -136,10 +413,34 @@ def percent_decode(value):
     :returns:
         Percent-decoded value.
     """
-    return utf8_decode_if_bytes(unquote_plus(value))
+    return utf8_decode(_percent_decode_bytes(utf8_encode_if_unicode(value)))
 
 
-def urlencode_s(query_params, predicate=None):
+def _percent_decode_bytes(value):
+    """
+    Percent-decodes a byte string to a byte string. '+' is treated as a
+    ' ' character and invalid escape sequences are left as they are.
+    """
+    value = value.replace(_PLUS, _SPACE)
+    chunks = value.split(_PERCENT)
+    if len(chunks) == 1:
+        # Nothing to unescape.
+        return chunks[0]
+    table = _PERCENT_DECODE_TABLE
+    decoded = [chunks[0]]
+    for chunk in chunks[1:]:
+        byte = table.get(chunk[:2])
+        if byte is None:
+            # Not an escape sequence; keep the ``%`` as it is.
+            decoded.append(_PERCENT)
+            decoded.append(chunk)
+        else:
+            decoded.append(byte)
+            decoded.append(chunk[2:])
+    return SYMBOL_EMPTY_BYTES.join(decoded)
+
+
+def urlencode_s(query_params, predicate=None, memoize=False):
     """
     Serializes a dictionary of query parameters into a string of query
     parameters, ``name=value`` pairs separated by ``&``, sorted first by
@@ -149,7 +450,7 @@ def urlencode_s(query_params, predicate=None):
     Behaves like :func:`urllib.urlencode` with ``doseq=1``.
 
     :param query_params:
-        Dictionary of query parameters.
+        Dictionary of query parameters or :class:`QueryParams`.
     :param predicate:
         A callback that will be called for each query parameter and should
         return ``False`` or a falsy value if that parameter should not be
@@ -158,6 +459,9 @@ def urlencode_s(query_params, predicate=None):
 
             def predicate(name, value):
                 return is_name_allowed(name) and is_value_allowed(value)
+    :param memoize:
+        ``True`` to percent-encode with :func:`percent_encode_memoized`.
+        See :func:`urlencode_sl`. Default ``False``.
     :returns:
         A string of query parameters, ``name=value`` pairs separated by ``&``,
         sorted first by ``name`` and then by ``value`` based on the OAuth
@@ -165,10 +469,10 @@ def urlencode_s(query_params, predicate=None):
     """
     return SYMBOL_AMPERSAND.join(
         key + SYMBOL_EQUAL + value
-        for key, value in urlencode_sl(query_params, predicate))
+        for key, value in urlencode_sl(query_params, predicate, memoize))
 
 
-def urlencode_sl(query_params, predicate=None):
+def urlencode_sl(query_params, predicate=None, memoize=False):
     """
     Serializes a dictionary of query parameters into a list of query
     parameters, ``(name, value)`` pairs, sorted first by ``name`` then by
@@ -177,7 +481,7 @@ def urlencode_sl(query_params, predicate=None):
     Behaves like :func:`urllib.urlencode` with ``doseq=1``.
 
     :param query_params:
-        Dictionary of query parameters.
+        Dictionary of query parameters or :class:`QueryParams`.
     :param predicate:
         A callback that will be called for each query parameter and should
         return ``False`` or a falsy value if that parameter should not be
@@ -186,32 +490,47 @@ def urlencode_sl(query_params, predicate=None):
 
             def predicate(name, value):
                 return is_name_allowed(name) and is_value_allowed(value)
+    :param memoize:
+        ``True`` to percent-encode names and protocol parameter values with
+        :func:`percent_encode_memoized`. Values of other parameters and of
+        ``oauth_nonce``, ``oauth_timestamp``, ``oauth_signature``,
+        ``oauth_body_hash`` and ``oauth_verifier`` are never memoized.
+        Default ``False``.
     :returns:
         A list of query parameters, ``(name, value)`` pairs, sorted first by
         ``name`` and then by ``value`` based on the OAuth percent-encoding rules
         and specification.
     """
+    if isinstance(query_params, QueryParams):
+        if not memoize:
+            return list(query_params.encoded(predicate))
+        query_params = query_params.to_dict()
     query_params = query_params or {}
     encoded_pairs = []
     for k, value in query_params.items():
         # Keys are also percent-encoded according to OAuth spec.
-        key = percent_encode(k)
+        if memoize:
+            key = percent_encode_memoized(k)
+            encode = _memoized_value_encoder(key)
+        else:
+            key = percent_encode(k)
+            encode = percent_encode
         if predicate and not predicate(k, value):
             continue
         elif is_bytes_or_unicode(value):
-            encoded_pairs.append((key, percent_encode(value),))
+            encoded_pairs.append((key, encode(value),))
         elif is_sequence(value):
             # Loop over the sequence.
             if len(value) > 0:
                 for i in value:
-                    encoded_pairs.append((key, percent_encode(i), ))
+                    encoded_pairs.append((key, encode(i), ))
             # ``urllib.urlencode()`` doesn't preserve blank lists.
             # Therefore, we're discarding them.
             #else:
             #    # Preserve blank list values.
             #    encoded_pairs.append((k, "", ))
         else:
-            encoded_pairs.append((key, percent_encode(value),))
+            encoded_pairs.append((key, encode(value),))
     # Sort after encoding according to the OAuth spec.
     return sorted(encoded_pairs)
 
@@ -221,7 +540,8 @@ def urlparse_normalized(url):
     Like :func:`urlparse.urlparse` but also normalizes scheme, netloc, port,
     and the path.
 
-    Use with OAuth URLs.
+    Use with OAuth URLs. The normalized scheme, netloc, path and parameters
+    are memoized in :data:`URL_NORMALIZE_CACHE`.
 
     :see: Base String URI (http://tools.ietf.org/html/rfc5849#section-3.4.1.2)
     :param url:
@@ -230,9 +550,61 @@ def urlparse_normalized(url):
         Tuple that contains these elements:
         ``(scheme, netloc, path, params, query, fragment)``
     """
+    (scheme, netloc, path, matrix_params, _), query, fragment = \
+        _urlsplit_normalized(url)
+    return scheme, netloc, path, matrix_params, query, fragment
+
+
+def _urlsplit_normalized(url, _cache=URL_NORMALIZE_CACHE):
+    """
+    Splits a URL into its memoized normalized part, its query and its
+    fragment.
+
+    The part of the URL before the query string is the cache key; the query
+    and the fragment are sliced off the URL without parsing it.
+
+    :param url:
+        The URL to split and normalize.
+    :returns:
+        A tuple of ``((scheme, netloc, path, params, base_url), query,
+        fragment)`` where ``base_url`` is the normalized URL without query
+        and fragment.
+    """
+    if isinstance(url, ParsedUrl):
+        return url._normalized, url._query, url._fragment
     if not url:
         raise InvalidUrlError("Invalid URL `%r`" % (url,))
+    url = utf8_encode_if_unicode(url)
+    key, _, fragment = url.partition(_HASH)
+    key, _, query = key.partition(SYMBOL_QUESTION_MARK)
+    normalized = _cache.get(key)
+    if normalized is None:
+        normalized = _urlparse_normalized(url)
+        _cache.set(key, normalized)
+    return normalized, query, fragment
+
+
+def _urlunsplit_normalized(base_url, query, fragment=None):
+    """
+    Joins a normalized URL without query and fragment to a query string
+    and fragment, like :func:`urlparse.urlunparse`.
+    """
+    if query:
+        base_url = base_url + SYMBOL_QUESTION_MARK + query
+    if fragment:
+        base_url = base_url + _HASH + fragment
+    return base_url
+
+
+def _urlparse_normalized(url):
+    """
+    Parses and normalizes the scheme, netloc, path and parameters of a URL.
 
+    :param url:
+        The URL to parse.
+    :returns:
+        A tuple of ``(scheme, netloc, path, params, base_url)``.
+    """
     parts = urlparse(url)
 
     scheme      = parts.scheme.lower()
@@ -261,10 +633,10 @@ def urlparse_normalized(url):
     # and http://www.w3.org/Protocols/rfc2616/rfc2616-sec3.html#sec3.2.2
     path          = parts.path or b("/")
     matrix_params = parts.params or SYMBOL_EMPTY_BYTES
-    fragment      = parts.fragment or SYMBOL_EMPTY_BYTES
-    query         = parts.query or SYMBOL_EMPTY_BYTES
+    base_url      = urlunparse((scheme, netloc, path, matrix_params,
+                                None, None))
 
-    return scheme, netloc, path, matrix_params, query, fragment
+    return scheme, netloc, path, matrix_params, base_url
 
 
 #TODO: Add test to ensure url_add_query uses OAuth param sort order.
@@ -292,11 +664,7 @@ def url_add_query(url, query, predicate=None):
         A normalized URL with the fragment and existing query parameters
         preserved and with the extra query parameters added.
     """
-    scheme, netloc, path, params, query_s, fragment = urlparse_normalized(url)
-
-    query_d = query_add(query_s, query)
-    query_s = urlencode_s(query_d, predicate)
-    return urlunparse((scheme, netloc, path, params, query_s, fragment))
+    return ParsedUrl.parse(url).add_query(query, predicate).geturl()
 
 
 def url_append_query(url, query):
@@ -322,10 +690,262 @@ def url_append_query(url, query):
     """
     if not query:
         return url
-    scheme, netloc, path, params, query_s, fragment = urlparse_normalized(url)
-    query_s = (query_s + SYMBOL_AMPERSAND) if query_s else query_s
-    query_s = query_s + urlencode_s(query_unflatten(query))
-    return urlunparse((scheme, netloc, path, params, query_s, fragment))
+    return ParsedUrl.parse(url).append_query(query).geturl()
+
+
+class QueryParams(object):
+    """
+    An ordered multi-dictionary of query parameters.
+
+    Names and values are kept in two parallel lists, in the order they were
+    added, so merging is a list extension and a parameter that occurs once
+    needs no list of its own. A query string is parsed only when the
+    parameters are first looked at. The sorted, percent-encoded pairs used
+    to serialize the parameters are computed once and kept until the
+    parameters change.
+
+    Instances are accepted wherever a query parameter dictionary or a query
+    string is accepted.
+
+    :param query:
+        A query string, a query parameter dictionary whose values may be
+        sequences, another :class:`QueryParams` or ``None``.
+    """
+    __slots__ = ("_names", "_values", "_raw", "_encoded")
+
+    def __init__(self, query=None):
+        self._names = []
+        self._values = []
+        self._raw = None
+        self._encoded = None
+        if query is not None:
+            self.extend(query)
+
+    def _decode(self):
+        """Parses the query string the parameters were created from."""
+        raw = self._raw
+        if raw is not None:
+            self._raw = None
+            names = self._names
+            values = self._values
+            for name, value in parse_qsl(raw):
+                names.append(name)
+                values.append(value)
+
+    def extend(self, query):
+        """
+        Appends query parameters after the existing ones.
+
+        :param query:
+            A query string, a query parameter dictionary or another
+            :class:`QueryParams`.
+        """
+        if isinstance(query, QueryParams):
+            self._decode()
+            query._decode()
+            self._names.extend(query._names)
+            self._values.extend(query._values)
+        elif is_bytes_or_unicode(query):
+            if not query:
+                return
+            if self._raw is None and not self._names:
+                # Parsed on first use.
+                self._raw = query
+            else:
+                self._decode()
+                for name, value in parse_qsl(query):
+                    self._names.append(name)
+                    self._values.append(value)
+        elif isinstance(query, dict):
+            self._decode()
+            names = self._names
+            values = self._values
+            for name, value in query.items():
+                if isinstance(value, list) or isinstance(value, tuple):
+                    for item in value:
+                        names.append(name)
+                        values.append(item)
+                else:
+                    names.append(name)
+                    values.append(value)
+        elif query is None:
+            return
+        else:
+            raise InvalidQueryParametersError(
+                "Dictionary or query string required: got `%r` instead" \
+                % (query, ))
+        self._encoded = None
+
+    def add(self, name, value):
+        """
+        Appends a single parameter.
+
+        :param name:
+            Parameter name.
+        :param value:
+            Parameter value.
+        """
+        self._decode()
+        self._names.append(name)
+        self._values.append(value)
+        self._encoded = None
+
+    def filter(self, predicate):
+        """
+        Removes parameters in place.
+
+        :param predicate:
+            Called once for each parameter name with the name and the list
+            of its values, like the predicate of :func:`query_select`.
+            Parameters for which it returns a falsy value are removed.
+        """
+        keep = {}
+        for name, values in self.items():
+            keep[name] = predicate(name, values)
+        self._retain([keep[name] for name in self._names])
+
+    def remove_oauth(self):
+        """
+        Removes protocol parameters in place, logging each name once, like
+        :func:`query_remove_oauth`.
+        """
+        self._decode()
+        prefix = OAUTH_PARAM_PREFIX
+        removed = set()
+        keep = []
+        for name in self._names:
+            text_name = utf8_decode_if_bytes(name)
+            if text_name.startswith(prefix):
+                if text_name not in removed:
+                    removed.add(text_name)
+                    logging.warning(
+                        "Protocol parameter ignored from URL query "
+                        "parameters: `%r`", text_name)
+                keep.append(False)
+            else:
+                keep.append(True)
+        if removed:
+            self._retain(keep)
+
+    def _retain(self, keep):
+        """Keeps the pairs whose flag in ``keep`` is true."""
+        self._names = [name for name, flag in zip(self._names, keep) if flag]
+        self._values = [value for value, flag in zip(self._values, keep)
+                        if flag]
+        self._encoded = None
+
+    def __len__(self):
+        self._decode()
+        return len(self._names)
+
+    def __contains__(self, name):
+        self._decode()
+        return name in self._names
+
+    def __getitem__(self, name):
+        self._decode()
+        values = [value for key, value in zip(self._names, self._values)
+                  if key == name]
+        if not values:
+            raise KeyError(name)
+        return values
+
+    def get(self, name, default=None):
+        """
+        Returns the list of values of a parameter or ``default``.
+        """
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def pairs(self):
+        """
+        Returns the ``(name, value)`` pairs in the order they were added.
+        """
+        self._decode()
+        return list(zip(self._names, self._values))
+
+    def items(self):
+        """
+        Returns ``(name, list of values)`` pairs, like the items of an
+        un-flattened query parameter dictionary, in the order the names
+        were first added.
+        """
+        self._decode()
+        grouped = {}
+        order = []
+        for name, value in zip(self._names, self._values):
+            values = grouped.get(name)
+            if values is None:
+                grouped[name] = values = []
+                order.append(name)
+            values.append(value)
+        return [(name, grouped[name]) for name in order]
+
+    def to_dict(self):
+        """
+        Returns an un-flattened query parameter dictionary; see
+        :func:`query_unflatten`.
+        """
+        return dict(self.items())
+
+    def copy(self):
+        """
+        Returns a copy that can be changed independently.
+        """
+        params = self.__class__()
+        params._names = self._names[:]
+        params._values = self._values[:]
+        params._raw = self._raw
+        params._encoded = self._encoded
+        return params
+
+    def encoded(self, predicate=None):
+        """
+        Returns the percent-encoded ``(name, value)`` pairs sorted as the
+        OAuth specification requires; see :func:`urlencode_sl`.
+
+        :param predicate:
+            See :meth:`filter`. The result without a predicate is cached
+            until the parameters change.
+        :returns:
+            A tuple of pairs.
+        """
+        if predicate is not None:
+            return tuple(urlencode_sl(self.to_dict(), predicate))
+        encoded = self._encoded
+        if encoded is None:
+            self._decode()
+            encoded = tuple(sorted(
+                [(percent_encode(name), percent_encode(value))
+                 for name, value in zip(self._names, self._values)]))
+            self._encoded = encoded
+        return encoded
+
+    def urlencode(self, predicate=None):
+        """
+        Serializes the parameters into a query string; see
+        :func:`urlencode_s`.
+        """
+        return SYMBOL_AMPERSAND.join(
+            name + SYMBOL_EQUAL + value
+            for name, value in self.encoded(predicate))
+
+    def __eq__(self, other):
+        if isinstance(other, QueryParams):
+            return self.to_dict() == other.to_dict()
+        return NotImplemented
+
+    def __ne__(self, other):
+        if isinstance(other, QueryParams):
+            return not self == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.pairs())
 
 
 def query_add(*queries):
@@ -402,8 +1022,9 @@ def query_unflatten(query):
         a=1&b=1&b=2&c=              ->   dict(a[1], b=[1, 2], c=[""])
 
     :param query:
-        A query parameter dictionary or a query string.
-        If this argument is ``None`` an empty dictionary will be returned.
+        A query parameter dictionary, a :class:`QueryParams` or a query
+        string. If this argument is ``None`` an empty dictionary will be
+        returned.
         Any other value will raise a
         :class:`pyoauth.errors.InvalidQueryParametersError` exception.
     :returns:
@@ -411,6 +1032,8 @@ def query_unflatten(query):
     """
     if is_bytes_or_unicode(query):
         return parse_qs(query)
+    elif isinstance(query, QueryParams):
+        return query.to_dict()
     elif isinstance(query, dict):
         # Un-flatten the dictionary.
         def _choose(key, value):
@@ -526,6 +1149,87 @@ def query_remove_oauth(query):
     return query_select(query, predicate)
 
 
+def query_partition_oauth(query, oauth=True, non_oauth=True, memoize=False):
+    """
+    Splits query parameters into protocol parameters and non-protocol
+    parameters and percent-encodes both in a single pass.
+
+    Equivalent to, but faster than::
+
+        (urlencode_sl(request_query_remove_non_oauth(query)),
+         urlencode_sl(query_remove_oauth(query)))
+
+    Protocol parameters are checked like
+    :func:`request_query_remove_non_oauth` does; ``oauth_signature`` is
+    kept.
+
+    :param query:
+        Query string, query parameter dictionary or :class:`QueryParams`.
+    :param oauth:
+        ``False`` to drop protocol parameters, with a warning, like
+        :func:`query_remove_oauth` does. They are then not checked.
+        Default ``True``.
+    :param non_oauth:
+        ``False`` to drop non-protocol parameters, with a warning, like
+        :func:`request_query_remove_non_oauth` does. Default ``True``.
+    :param memoize:
+        ``True`` to percent-encode with :func:`percent_encode_memoized`.
+        See :func:`urlencode_sl`. Default ``False``.
+    :returns:
+        A tuple of two lists of percent-encoded ``(name, value)`` pairs,
+        each sorted like :func:`urlencode_sl` sorts them: the protocol
+        parameters and the non-protocol parameters.
+    """
+    if isinstance(query, QueryParams):
+        items = query.items()
+    else:
+        items = query_unflatten(query).items()
+    oauth_pairs = []
+    non_oauth_pairs = []
+    for name, value in items:
+        if isinstance(value, tuple):
+            value = list(value)
+        elif not isinstance(value, list):
+            value = [value]
+        text_name = utf8_decode_if_bytes(name)
+        if text_name.startswith(OAUTH_PARAM_PREFIX):
+            if not oauth:
+                logging.warning(
+                    "Protocol parameter ignored from URL query parameters: "
+                    "`%r`", text_name)
+                continue
+            if len(value) > 1:
+                # See request_query_remove_non_oauth.
+                raise InvalidOAuthParametersError(
+                    "Multiple protocol parameter values found %r=%r" \
+                    % (text_name, value))
+            elif text_name in (OAUTH_PARAM_CONSUMER_SECRET,
+                               OAUTH_PARAM_TOKEN_SECRET, ):
+                raise InsecureOAuthParametersError(
+                    "[SECURITY-ISSUE] Client attempting to transmit "\
+                    "confidential protocol parameter `%r`. Communication "\
+                    "is insecure if this is in your server logs." % \
+                    (text_name, ))
+            pairs = oauth_pairs
+        elif non_oauth:
+            pairs = non_oauth_pairs
+        else:
+            logging.warning("Invalid protocol parameter ignored: `%r`",
+                            text_name)
+            continue
+        if memoize:
+            key = percent_encode_memoized(name)
+            encode = _memoized_value_encoder(key)
+        else:
+            key = percent_encode(name)
+            encode = percent_encode
+        for item in value:
+            pairs.append((key, encode(item)))
+    oauth_pairs.sort()
+    non_oauth_pairs.sort()
+    return oauth_pairs, non_oauth_pairs
+
+
 def oauth_url_sanitize(url, force_secure=True):
     """
     Normalizes an OAuth URL and cleans up protocol-specific parameters
@@ -539,17 +1243,170 @@ def oauth_url_sanitize(url, force_secure=True):
     :returns:
         Normalized sanitized URL.
     """
-    scheme, netloc, path, params, query, _ = urlparse_normalized(url)
-    query = urlencode_s(query_remove_oauth(query))
-    if force_secure and scheme != b("https"):
-        raise InsecureOAuthUrlError(
-            "OAuth specification requires the use of SSL/TLS for "\
-            "inter-server communication.")
-    elif not force_secure and scheme != b("https"):
-        logging.warning(
-            "INSECURE URL: OAuth specification requires the use of SSL/TLS "\
-            "for credential requests.")
-    return urlunparse((scheme, netloc, path, params, query, None))
+    return ParsedUrl.parse(url).sanitize(force_secure).geturl()
+
+
+class ParsedUrl(object):
+    """
+    An immutable, normalized URL.
+
+    A URL is parsed and normalized once, when the object is created; see
+    :func:`urlparse_normalized`. The methods that change the query string
+    return new objects that share the normalized scheme, netloc, path and
+    parameters, so a URL can go through sanitizing, signing and request
+    building with a single serialization, by :meth:`geturl`, at the end.
+    The functions of this module and the base string functions in
+    :mod:`pyoauth.oauth1.protocol` accept these objects wherever they
+    accept URLs.
+
+    Create instances with :meth:`parse`.
+    """
+    __slots__ = ("_normalized", "_query", "_fragment")
+
+    def __init__(self, normalized, query, fragment):
+        self._normalized = normalized
+        self._query = query or SYMBOL_EMPTY_BYTES
+        self._fragment = fragment or SYMBOL_EMPTY_BYTES
+
+    @classmethod
+    def parse(cls, url):
+        """
+        Parses and normalizes a URL.
+
+        :param url:
+            The URL. If this is a :class:`ParsedUrl` already, it is returned
+            as it is.
+        :returns:
+            A :class:`ParsedUrl`.
+        """
+        if isinstance(url, cls):
+            return url
+        normalized, query, fragment = _urlsplit_normalized(url)
+        return cls(normalized, query, fragment)
+
+    @property
+    def scheme(self):
+        """The lowercase scheme."""
+        return self._normalized[0]
+
+    @property
+    def netloc(self):
+        """The netloc with a lowercase host name and no default port."""
+        return self._normalized[1]
+
+    @property
+    def path(self):
+        """The path; ``/`` if the URL has none."""
+        return self._normalized[2]
+
+    @property
+    def params(self):
+        """The matrix parameters of the last path segment."""
+        return self._normalized[3]
+
+    @property
+    def query_string(self):
+        """The query string as it will be serialized."""
+        return self._query
+
+    @property
+    def query(self):
+        """
+        The decoded query parameters, a new un-flattened dictionary on
+        every access.
+        """
+        return parse_qs(self._query)
+
+    @property
+    def fragment(self):
+        """The fragment."""
+        return self._fragment
+
+    @property
+    def base_url(self):
+        """The normalized URL without query string and fragment."""
+        return self._normalized[4]
+
+    def add_query(self, query, predicate=None):
+        """
+        Adds query parameters while preserving existing ones. See
+        :func:`url_add_query`.
+
+        :returns:
+            A new :class:`ParsedUrl` with all the query parameters sorted.
+        """
+        params = QueryParams(self._query)
+        params.extend(query)
+        return self.__class__(self._normalized, params.urlencode(predicate),
+                              self._fragment)
+
+    def append_query(self, query):
+        """
+        Appends query parameters to the existing query string. See
+        :func:`url_append_query`.
+
+        :returns:
+            A new :class:`ParsedUrl`.
+        """
+        if not query:
+            return self
+        query_s = (self._query + SYMBOL_AMPERSAND) if self._query \
+                  else self._query
+        query_s = query_s + QueryParams(query).urlencode()
+        return self.__class__(self._normalized, query_s, self._fragment)
+
+    def sanitize(self, force_secure=True):
+        """
+        Removes protocol-specific parameters from the query string and the
+        fragment. See :func:`oauth_url_sanitize`.
+
+        :returns:
+            A new :class:`ParsedUrl`.
+        """
+        query = self._query
+        if query:
+            params = QueryParams(query)
+            params.remove_oauth()
+            query = params.urlencode()
+        if force_secure and self.scheme != b("https"):
+            raise InsecureOAuthUrlError(
+                "OAuth specification requires the use of SSL/TLS for "\
+                "inter-server communication.")
+        elif not force_secure and self.scheme != b("https"):
+            logging.warning(
+                "INSECURE URL: OAuth specification requires the use of "\
+                "SSL/TLS for credential requests.")
+        return self.__class__(self._normalized, query, None)
+
+    def geturl(self):
+        """
+        Serializes the URL.
+
+        :returns:
+            The URL as a byte string.
+        """
+        return _urlunsplit_normalized(self._normalized[4],
+                                      self._query, self._fragment)
+
+    def __setattr__(self, name, value):
+        if hasattr(self, "_fragment"):
+            raise AttributeError("ParsedUrl objects are immutable")
+        object.__setattr__(self, name, value)
+
+    def __eq__(self, other):
+        return isinstance(other, ParsedUrl) and \
+               self._normalized[4] == other._normalized[4] and \
+               self._query == other._query and \
+               self._fragment == other._fragment
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self._normalized[4], self._query, self._fragment))
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.geturl())
 
 
 def is_valid_callback_url(url):